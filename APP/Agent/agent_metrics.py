@@ -0,0 +1,235 @@
+# agent_metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agents import RunHooks
+
+AGENT_METRICS_PORT = int(os.getenv("AGENT_METRICS_PORT", "0"))  # 0 = no HTTP endpoint
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+# ============================================================
+# Prometheus text format (counters + histograms, labelled)
+# ============================================================
+class _Metric:
+    def __init__(self, name: str, help: str, kind: str, labels: Sequence[str], buckets: Sequence[float] = ()) -> None:
+        self.name, self.help, self.kind = name, help, kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # counter: [value]; histogram: bucket counts + [+Inf, sum]
+
+    def _slot(self, labels: Dict[str, Any]) -> List[float]:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        size = 1 if self.kind == "counter" else len(self.buckets) + 2
+        return self._values.setdefault(key, [0.0] * size)
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        with self._lock:
+            self._slot(labels)[0] += value
+
+    def observe(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            slot = self._slot(labels)
+            slot[bisect_left(self.buckets, value)] += 1
+            slot[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, slot in sorted(self._values.items()):
+                if self.kind == "counter":
+                    lines.append(f"{self.name}{_labels(self.labels, key)} {_num(slot[0])}")
+                    continue
+                cumulative = 0.0
+                for bound, n in zip(list(self.buckets) + ["+Inf"], slot[:-1]):
+                    cumulative += n
+                    le = 'le="%s"' % (bound if isinstance(bound, str) else _num(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {_num(cumulative)}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(slot[-1])}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {_num(cumulative)}")
+        return lines
+
+
+# same label escaping and number format as APP/Server/metrics.py (the agent does not import the server)
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+TURNS = _Metric("agent_turns_total", "Agent turns by source (llm, cache, error).", "counter", ("source",))
+TURN_SECONDS = _Metric("agent_turn_seconds", "Wall time of an agent turn.", "histogram", ("source",), LATENCY_BUCKETS)
+LLM_SECONDS = _Metric("agent_llm_seconds", "Time spent in LLM calls per turn.", "histogram", (), LATENCY_BUCKETS)
+LLM_CALLS = _Metric("agent_llm_calls_total", "LLM calls.", "counter", ())
+TOOL_SECONDS = _Metric("agent_tool_seconds", "Wall time of a tool call seen from the agent.", "histogram", ("tool",), LATENCY_BUCKETS)
+TOKENS = _Metric("agent_tokens_total", "LLM tokens by kind (input, output).", "counter", ("kind",))
+FIRST_TOKEN_SECONDS = _Metric(
+    "agent_first_token_seconds", "Time until the first answer token of a streamed turn.", "histogram", ("source",), LATENCY_BUCKETS
+)
+
+_ALL = (TURNS, TURN_SECONDS, FIRST_TOKEN_SECONDS, LLM_SECONDS, LLM_CALLS, TOOL_SECONDS, TOKENS)
+
+
+def render() -> str:
+    return "\n".join(line for metric in _ALL for line in metric.render()) + "\n"
+
+
+def record_turn(source: str, seconds: float) -> None:
+    TURNS.inc(source=source)
+    TURN_SECONDS.observe(seconds, source=source)
+
+
+# ============================================================
+# Per-turn hooks
+# ============================================================
+class TurnMetrics(RunHooks):
+    """
+    Times the LLM and tool calls of one `Runner.run` and sums the token usage.
+    All hooks are forwarded to `inner` (e.g. the benchmark's own hooks).
+    """
+
+    def __init__(self, inner: Optional[RunHooks] = None) -> None:
+        self.inner = inner
+        self.started = time.perf_counter()
+        self.llm_seconds = 0.0
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.tool_ms: Dict[str, float] = {}  # call_id -> ms
+        self.first_token_seconds: Optional[float] = None  # streamed turns only
+        self._llm_t0: Optional[float] = None
+        self._tool_t0: Dict[str, float] = {}
+
+    # ---------- hooks ----------
+    async def on_agent_start(self, context: Any, agent: Any) -> None:
+        if self.inner is not None:
+            await self.inner.on_agent_start(context, agent)
+
+    async def on_agent_end(self, context: Any, agent: Any, output: Any) -> None:
+        if self.inner is not None:
+            await self.inner.on_agent_end(context, agent, output)
+
+    async def on_handoff(self, context: Any, from_agent: Any, to_agent: Any) -> None:
+        if self.inner is not None:
+            await self.inner.on_handoff(context, from_agent, to_agent)
+
+    async def on_llm_start(self, context: Any, agent: Any, system_prompt: Any, input_items: Any) -> None:
+        self._llm_t0 = time.perf_counter()
+        if self.inner is not None:
+            await self.inner.on_llm_start(context, agent, system_prompt, input_items)
+
+    async def on_llm_end(self, context: Any, agent: Any, response: Any) -> None:
+        if self._llm_t0 is not None:
+            self.llm_seconds += time.perf_counter() - self._llm_t0
+            self._llm_t0 = None
+        self.llm_calls += 1
+        usage = getattr(response, "usage", None)
+        self.input_tokens += int(getattr(usage, "input_tokens", 0) or 0)
+        self.output_tokens += int(getattr(usage, "output_tokens", 0) or 0)
+        if self.inner is not None:
+            await self.inner.on_llm_end(context, agent, response)
+
+    async def on_tool_start(self, context: Any, agent: Any, tool: Any) -> None:
+        self._tool_t0[_call_key(context, tool)] = time.perf_counter()
+        if self.inner is not None:
+            await self.inner.on_tool_start(context, agent, tool)
+
+    async def on_tool_end(self, context: Any, agent: Any, tool: Any, result: Any) -> None:
+        key = _call_key(context, tool)
+        t0 = self._tool_t0.pop(key, None)
+        if t0 is not None:
+            seconds = time.perf_counter() - t0
+            self.tool_ms[key] = round(seconds * 1000, 1)
+            TOOL_SECONDS.observe(seconds, tool=getattr(tool, "name", "unknown_tool"))
+        if self.inner is not None:
+            await self.inner.on_tool_end(context, agent, tool, result)
+
+    def mark_first_token(self) -> None:
+        """Called by the streaming runner when the first answer text arrives."""
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+
+    # ---------- results ----------
+    def finish(self, trace: List[Dict[str, Any]], source: str = "llm") -> Dict[str, Any]:
+        """
+        Add per-call `ms` to the tool steps (entries that already carry `ms`, e.g. cache
+        replays, are kept), append the turn summary to the trace and export the counters.
+        """
+        tool_ms = 0.0
+        for entry in trace:
+            if entry.get("type") != "tool_call":
+                continue
+            ms = self.tool_ms.get(entry.get("call_id") or "")
+            if ms is not None:
+                entry["ms"] = ms
+            tool_ms += entry.get("ms") or 0.0
+        summary = {
+            "type": "metrics",
+            "source": source,
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "llm_seconds": round(self.llm_seconds, 3),
+            "tool_seconds": round(tool_ms / 1000, 3),
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+        if self.first_token_seconds is not None:
+            summary["first_token_seconds"] = round(self.first_token_seconds, 3)
+            FIRST_TOKEN_SECONDS.observe(self.first_token_seconds, source=source)
+        trace.append(summary)
+        record_turn(source, summary["total_seconds"])
+        LLM_SECONDS.observe(self.llm_seconds)
+        LLM_CALLS.inc(self.llm_calls)
+        TOKENS.inc(self.input_tokens, kind="input")
+        TOKENS.inc(self.output_tokens, kind="output")
+        return summary
+
+
+def _call_key(context: Any, tool: Any) -> str:
+    return getattr(context, "tool_call_id", None) or f"{getattr(tool, 'name', '')}:{id(context)}"
+
+
+# ============================================================
+# Optional HTTP endpoint (the Streamlit process has no routes of its own)
+# ============================================================
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802 (http.server API)
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(port: int = AGENT_METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on `port` in a daemon thread (None if port is 0 or already taken)."""
+    if not port:
+        return None
+    try:
+        httpd = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    except OSError:
+        return None
+    threading.Thread(target=httpd.serve_forever, name="agent-metrics", daemon=True).start()
+    return httpd
@@ -1,11 +1,19 @@
 # agent_runtime.py
+import asyncio
+import atexit
 import os
-from typing import Any, Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple, Union
 
-from agents import Agent, Runner, SQLiteSession, RunConfig
+from agents import Agent, Model, RunHooks, Runner, Session, RunConfig
 from agents.mcp import MCPServerStreamableHttp
 from agents.model_settings import ModelSettings
 
+from agent_metrics import TurnMetrics, record_turn, start_metrics_server
+from answer_cache import SemanticAnswerCache
+
 DEFAULT_INSTRUCTIONS = """
 Du bist ein Assistent für ÖPNV-Zeitreihen in Neo4j (Non-technical Nutzer).
 
@@ -14,16 +22,46 @@ Grundprinzip:
 - wenn die frage komplex ist kannst du sie in schritte teilen und führe mehere queries aus bis du auf die Antwort kommst
 - nutze get-schema um das schema zu erkennen
 - bei jeder Frage schaue mal das schema nach bevor du Query bildest
+- get_schema enthält Anzahlen, Indexe, den Datumsbereich der Trips und Index-Hinweise: nur Zeiträume innerhalb
+  dieses Bereichs abfragen und große Labels (Trip) immer über indizierte Properties filtern
 - Verwende MCP-Tools, wann immer du Fakten/Zahlen brauchst.
 - Antworte kurz und verständlich. Keine Cypher im Output, außer der User fragt explizit.
 - antworte immer auf die Sprache des userinputs
-- für daten nutze folgende Format: YYYY-MM-DD als String deswegen bitte bei der suche Datum in echtes Date umwandeln
-  Beispiel: WHERE date(t.date) >= date('2022-01-01') AND date(t.date) <= date('2022-01-31')
+- Datumswerte (t.date usw.) sind Strings im Format YYYY-MM-DD; direkt als String vergleichen (nutzt den Index),
+  nicht in date() einpacken. Beispiel: WHERE t.date >= '2022-01-01' AND t.date <= '2022-01-31'
+- Uhrzeitfilter an einem Tag: WHERE t.date = '2022-03-17' AND t.from_time >= datetime('2022-03-17T07:00')
+- unabhängige Teilfragen (z.B. Kennzahlen für 2022 und 2023, mehrere Kennzahlen eines Tages) in EINEM
+  run_queries-Aufruf bündeln statt nacheinander run_query aufzurufen; nur Queries, die auf Ergebnissen
+  einer vorherigen aufbauen, einzeln ausführen. snapshot=True, wenn die Zahlen exakt zusammenpassen müssen
+- für Tagesberichte, Route-Health-Cards und Monats-/Zeitraumberichte zuerst daily_brief, route_health
+  bzw. period_report nutzen (vorberechnet, sehr schnell); nur fehlende Teile mit run_query ergänzen
+- Median/p90, Ausreißer-Listen ("ungewöhnlich lange Trips") und Vergleiche von Zeiträumen (Woche vs.
+  Vorwoche, 2022 vs. 2023, welche Routen sich verbessert/verschlechtert haben) mit snapshot_percentiles,
+  snapshot_top_k bzw. snapshot_compare rechnen statt mit run_query; bei {"error": "snapshot_unavailable"}
+  auf run_query / period_report ausweichen. Ist "snapshot.stale" true, darauf hinweisen
+- Ortsfragen ("Stops in der Nähe von ...", "Stops/Segmente in diesem Gebiet") mit nearest_stops bzw.
+  stops_within beantworten (Koordinaten in WGS-84 Grad); Geschwindigkeit eines Segments steht als
+  HAS_SEGMENT.segment_mean_speed_mps (m/s), seine Länge als TravelSegment.length_m (Meter, Luftlinie)
+- große Ergebnisse liefert run_query als {"handle", "row_count", "column_stats", "preview"} statt aller Zeilen;
+  Rückfragen dazu (Top-N, Filter, Summen je Gruppe) mit result_slice / result_aggregate auf dem handle
+  beantworten statt die Query erneut auszuführen. Die vollständige Tabelle sieht der User in der UI
+- liefert ein Tool {"error": "query_too_expensive"} oder {"error": "query_timeout"}, die Query enger fassen
+  (Datum/Route/Stop filtern, Pfade begrenzen, vorberechnete Tools nutzen) und erneut ausführen
 - Liste kurz die verwendeten Tools + Parameter (ohne interne Fehlerdetails, außer es ist relevant).
 
 
 """
 
+# Cache hits: the tool calls are replayed, the model only writes the answer from their results
+CACHE_ANSWER_INSTRUCTIONS = """
+Du bist ein Assistent für ÖPNV-Zeitreihen. Du bekommst eine Frage, die Ergebnisse der dafür gerade
+ausgeführten Tool-Aufrufe und eine frühere Antwort auf eine gleichartige Frage.
+- beantworte die Frage nur anhand der Ergebnisse; Zahlen aus der früheren Antwort nie übernehmen
+- die frühere Antwort nur als Vorlage für Aufbau und Länge nutzen
+- antworte immer auf die Sprache der Frage, kurz und verständlich, keine Cypher
+- passen die Ergebnisse nicht zur Frage, sage das kurz statt zu raten
+"""
+
 def _get_call_id(obj: Any) -> Optional[str]:
     """Versucht call_id aus raw_item oder item zu holen (Objekt oder dict)."""
     if obj is None:
@@ -60,83 +98,433 @@ def _tool_args_from_raw(raw: Any) -> Any:
         return raw.function.arguments
     return None
 
+# ============================================================
+# Persistent runtime (MCP connections + agents reused across turns)
+# ============================================================
+class _ServerHandle:
+    """
+    One connected MCP client. The connection is entered and exited by a
+    dedicated owner task, because the underlying anyio scopes must be closed
+    in the task that opened them; tool calls from other tasks are fine.
+    """
+
+    def __init__(self, server: MCPServerStreamableHttp) -> None:
+        self.server = server
+        self.ready = asyncio.Event()
+        self.stop = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_ok = 0.0
+
+    async def start(self) -> None:
+        self.task = asyncio.create_task(self._own(), name=f"mcp:{self.server.name}")
+        await self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        self.last_ok = time.monotonic()
+
+    async def _own(self) -> None:
+        try:
+            async with self.server:
+                self.ready.set()
+                await self.stop.wait()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.ready.set()
+
+    async def healthy(self, max_age_seconds: float) -> bool:
+        if self.task is None or self.task.done():
+            return False
+        if time.monotonic() - self.last_ok < max_age_seconds:
+            return True
+        session = getattr(self.server, "session", None)
+        if session is None:
+            return False
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=5)
+        except Exception:
+            return False
+        self.last_ok = time.monotonic()
+        return True
+
+    async def close(self) -> None:
+        self.stop.set()
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.task, timeout=10)
+            except Exception:
+                self.task.cancel()
+
+
+class AgentRuntime:
+    """
+    Long-lived agent runtime: one background event loop, one MCP connection
+    per server URL and cached `Agent` objects, shared by all chat sessions.
+
+    Connections are health-checked (MCP ping) when they have been idle longer
+    than `health_check_seconds` and reconnected if the ping fails. With an
+    `answer_cache`, repeated questions are answered by replaying the tool calls
+    of a matching earlier turn; the model only phrases the answer.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: int = 60,
+        health_check_seconds: float = 30.0,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.health_check_seconds = health_check_seconds
+        self.answer_cache = answer_cache
+        self._servers: Dict[str, _ServerHandle] = {}
+        self._agents: Dict[Tuple[str, Union[str, Model], str], Agent] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-runtime", daemon=True)
+        self._thread.start()
+
+    # ---------- sync entry points (Streamlit) ----------
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the runtime loop and block until it is done."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def stream(self, agen: AsyncIterator[Any], timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Iterate an async generator on the runtime loop from sync code. `timeout`
+        applies per item; leaving the loop early (break, Streamlit rerun) cancels the generator.
+        """
+        items: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in agen:
+                    items.put(("item", item))
+            except Exception as exc:
+                items.put(("error", exc))
+            else:
+                items.put(("done", None))
+            finally:
+                await agen.aclose()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                kind, value = items.get(timeout=timeout)
+                if kind == "error":
+                    raise value
+                if kind == "done":
+                    return
+                yield value
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+        try:
+            self.run(self.aclose(), timeout=15)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # ---------- async API (runtime loop only) ----------
+    async def get_server(self, mcp_url: str) -> MCPServerStreamableHttp:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            handle = self._servers.get(mcp_url)
+            if handle is not None and not await handle.healthy(self.health_check_seconds):
+                self._servers.pop(mcp_url, None)
+                self._agents = {k: v for k, v in self._agents.items() if k[0] != mcp_url}
+                await handle.close()
+                handle = None
+            if handle is None:
+                handle = _ServerHandle(_make_mcp_server(mcp_url, self.timeout_seconds))
+                await handle.start()
+                self._servers[mcp_url] = handle
+            return handle.server
+
+    def get_agent(
+        self,
+        mcp_url: str,
+        server: MCPServerStreamableHttp,
+        model: Union[str, Model],
+        instructions: str,
+    ) -> Agent:
+        key = (mcp_url, model, instructions)
+        agent = self._agents.get(key)
+        if agent is None:
+            agent = _make_agent(server, model, instructions)
+            self._agents[key] = agent
+        return agent
+
+    def mark_unhealthy(self, mcp_url: str) -> None:
+        """Force a ping before the next reuse (e.g. after a failed turn)."""
+        handle = self._servers.get(mcp_url)
+        if handle is not None:
+            handle.last_ok = 0.0
+
+    async def aclose(self) -> None:
+        handles = list(self._servers.values())
+        self._servers.clear()
+        self._agents.clear()
+        for handle in handles:
+            await handle.close()
+
+
+_runtime: Optional[AgentRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AgentRuntime:
+    """Process-wide runtime (created on first use, closed at interpreter exit)."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AgentRuntime(answer_cache=SemanticAnswerCache.from_env())
+            atexit.register(_runtime.close)
+            start_metrics_server()  # only if AGENT_METRICS_PORT is set
+        return _runtime
+
+
+# Sent as X-Tenant-Id; the MCP server limits concurrent tool calls per tenant
+MCP_TENANT_ID = os.getenv("MCP_TENANT_ID")
+
+
+def _make_mcp_server(mcp_url: str, timeout_seconds: int) -> MCPServerStreamableHttp:
+    params: Dict[str, Any] = {
+        "url": mcp_url,
+        "timeout": timeout_seconds,
+    }
+    if MCP_TENANT_ID:
+        params["headers"] = {"X-Tenant-Id": MCP_TENANT_ID}
+    return MCPServerStreamableHttp(
+        name="Neo4j MCP",
+        params=params,
+        cache_tools_list=True,
+        max_retry_attempts=3,
+        use_structured_content=True,
+    )
+
+
+def _make_agent(server: MCPServerStreamableHttp, model: Union[str, Model], instructions: str) -> Agent:
+    return Agent(
+        name="Transit Analyst",
+        instructions=instructions,
+        mcp_servers=[server],
+        model=model,
+        model_settings=ModelSettings(tool_choice="auto"),
+    )
+
+
 async def run_agent_turn(
     user_text: str,
-    session: SQLiteSession,
+    session: Session,
     mcp_url: str,
-    model: str = "gpt-5.1",
+    model: Union[str, Model] = "gpt-5.1",
     instructions: str = DEFAULT_INSTRUCTIONS,
     timeout_seconds: int = 60,
+    runtime: Optional[AgentRuntime] = None,
+    hooks: Optional[RunHooks] = None,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """
+    With `runtime`, the MCP connection and the agent are reused (must be awaited
+    on the runtime's loop, e.g. via `runtime.run(...)`); without it a connection
+    is opened for this turn only. `model` may also be a `Model` instance
+    (e.g. the scripted model of the benchmark runner). If the runtime has an
+    answer cache, a matching earlier question is answered from replayed tool calls
+    phrased by one model call (trace entries carry "cached": True), and every new
+    turn is offered to the cache.
+    `hooks` are called alongside the runtime's own timing hooks.
+
     Returns:
       - final assistant text
-      - trace list: [{"type": "...", "name": "...", "args": ..., "output": ...}, ...]
+      - trace list: [{"type": "...", "name": "...", "args": ..., "output": ..., "ms": ...}, ...]
+        ending with {"type": "metrics", ...} (LLM/tool seconds, LLM calls, tokens of the turn)
     """
-    trace: List[Dict[str, Any]] = []
+    metrics = TurnMetrics(hooks)
+    if runtime is not None:
+        server = await runtime.get_server(mcp_url)
+        cache = runtime.answer_cache
+        cached = await _answer_from_cache(cache, server, user_text, session, model, metrics)
+        if cached is not None:
+            final_text, trace = cached
+            metrics.finish(trace, source="cache")
+            return final_text, trace
 
-    async with MCPServerStreamableHttp(
-        name="Neo4j MCP",
-        params={
-            "url": mcp_url,
-            "timeout": timeout_seconds,
-        },
-        cache_tools_list=True,
-        max_retry_attempts=3,
-        use_structured_content=True,
-    ) as server:
-        agent = Agent(
-            name="Transit Analyst",
-            instructions=instructions,
-            mcp_servers=[server],
-            model=model,
-            model_settings=ModelSettings(tool_choice="auto"),
-        )
+        agent = runtime.get_agent(mcp_url, server, model, instructions)
+        try:
+            result = await Runner.run(
+                agent,
+                user_text,
+                session=session,
+                hooks=metrics,
+                run_config=RunConfig(tracing_disabled=True)
+            )
+        except Exception:
+            runtime.mark_unhealthy(mcp_url)
+            record_turn("error", time.perf_counter() - metrics.started)
+            raise
+        final_text, trace = str(result.final_output), _build_trace(result.new_items)
+        summary = metrics.finish(trace)
+        if cache is not None:
+            cache.store(user_text, trace, final_text, summary["total_seconds"])
+        return final_text, trace
 
-        result = await Runner.run(
-            agent,
-            user_text,
-            session=session,
-            run_config=RunConfig(tracing_disabled=True)
-        )
+    async with _make_mcp_server(mcp_url, timeout_seconds) as server:
+        agent = _make_agent(server, model, instructions)
+
+        try:
+            result = await Runner.run(
+                agent,
+                user_text,
+                session=session,
+                hooks=metrics,
+                run_config=RunConfig(tracing_disabled=True)
+            )
+        except Exception:
+            record_turn("error", time.perf_counter() - metrics.started)
+            raise
+
+    trace = _build_trace(result.new_items)
+    metrics.finish(trace)
+    return str(result.final_output), trace
+
+
+async def stream_agent_turn(
+    user_text: str,
+    session: Session,
+    mcp_url: str,
+    runtime: AgentRuntime,
+    model: Union[str, Model] = "gpt-5.1",
+    instructions: str = DEFAULT_INSTRUCTIONS,
+    hooks: Optional[RunHooks] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of `run_agent_turn` (runtime only; consume it via
+    `runtime.stream(...)`). Yields events as the run progresses:
+
+      - {"type": "text_delta", "delta": str}      answer text as it is generated
+      - {"type": "tool_call", "entry": {...}}     a tool call was issued (no output yet)
+      - {"type": "tool_output", "entry": {...}}   the same trace entry with output and ms
+      - {"type": "done", "text": str, "trace": [...]}  final text and the full trace (as run_agent_turn)
+
+    Text generated before a tool call is a preamble of that step; the final
+    answer is the text of "done". Cache hits yield their replayed steps and the whole answer at once.
+    The metrics entry of the trace additionally carries `first_token_seconds`.
+    """
+    metrics = TurnMetrics(hooks)
+    server = await runtime.get_server(mcp_url)
+    cache = runtime.answer_cache
+    cached = await _answer_from_cache(cache, server, user_text, session, model, metrics)
+    if cached is not None:
+        final_text, trace = cached
+        metrics.mark_first_token()
+        metrics.finish(trace, source="cache")
+        for entry in trace:
+            if entry.get("type") == "tool_call":
+                yield {"type": "tool_output", "entry": entry}
+        yield {"type": "text_delta", "delta": final_text}
+        yield {"type": "done", "text": final_text, "trace": trace}
+        return
+
+    agent = runtime.get_agent(mcp_url, server, model, instructions)
+    builder = _TraceBuilder()
+    result = Runner.run_streamed(
+        agent,
+        user_text,
+        session=session,
+        hooks=metrics,
+        run_config=RunConfig(tracing_disabled=True)
+    )
+    try:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                if getattr(event.data, "type", None) == "response.output_text.delta":
+                    metrics.mark_first_token()
+                    yield {"type": "text_delta", "delta": event.data.delta}
+                continue
+            if event.type != "run_item_stream_event":
+                continue
+            entry = builder.add(event.item)
+            if entry is None or entry.get("type") != "tool_call":
+                continue
+            if event.name == "tool_called":
+                yield {"type": "tool_call", "entry": entry}
+            elif event.name == "tool_output":
+                ms = metrics.tool_ms.get(entry.get("call_id") or "")
+                if ms is not None:
+                    entry["ms"] = ms
+                yield {"type": "tool_output", "entry": entry}
+    except Exception:
+        runtime.mark_unhealthy(mcp_url)
+        record_turn("error", time.perf_counter() - metrics.started)
+        raise
+    finally:
+        if not result.is_complete:
+            result.cancel()  # consumer went away (e.g. Streamlit rerun)
+
+    final_text, trace = str(result.final_output), builder.trace
+    summary = metrics.finish(trace)
+    if cache is not None:
+        cache.store(user_text, trace, final_text, summary["total_seconds"])
+    yield {"type": "done", "text": final_text, "trace": trace}
+
+
+async def _answer_from_cache(
+    cache: Optional[SemanticAnswerCache],
+    server: MCPServerStreamableHttp,
+    user_text: str,
+    session: Session,
+    model: Union[str, Model],
+    hooks: RunHooks,
+) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Answer from replayed tool calls if the cache has a matching question (None = run the agent).
+    The model writes the answer from the replayed results in one call without tools.
+    """
+    hit = cache.lookup(user_text) if cache is not None else None
+    if hit is None:
+        return None
+
+    async def _phrase(prompt: str) -> str:
+        agent = Agent(name="Cache Answer", instructions=CACHE_ANSWER_INSTRUCTIONS, model=model)
+        result = await Runner.run(agent, prompt, hooks=hooks, run_config=RunConfig(tracing_disabled=True))
+        return str(result.final_output)
 
-        # Trace aus new_items bauen (Tool calls/outputs/messages)
-    #     last_tool_name: Optional[str] = None
-    #     for item in result.new_items:
-    #         t = getattr(item, "type", None)
-
-    #         if t == "tool_call_item":
-    #             raw = getattr(item, "raw_item", None)
-    #             last_tool_name = _tool_name_from_raw(raw)
-    #             trace.append({
-    #                 "type": "tool_call",
-    #                 "tool_name": last_tool_name,
-    #                 "args": _tool_args_from_raw(raw),
-    #             })
-
-    #         elif t == "tool_call_output_item":
-    #             out = getattr(item, "output", None)
-    #             trace.append({
-    #                 "type": "tool_output",
-    #                 "tool_name": last_tool_name,
-    #                 "output": out,
-    #             })
-
-    #         elif t == "message_output_item":
-    #             # Optional fürs Debugging
-    #             trace.append({
-    #                 "type": "message",
-    #                 "output": str(getattr(item, "raw_item", ""))[:5000],
-    #             })
-
-    trace: List[Dict[str, Any]] = []
-    pending: Dict[str, Dict[str, Any]] = {}  # call_id -> trace entry
-    fallback_last_entry: Optional[Dict[str, Any]] = None  # nur falls call_id fehlt
-
-  
-
-
-    for item in result.new_items:
+    try:
+        final_text, trace = await cache.answer(user_text, hit, server, _phrase)
+    except Exception:
+        cache.record_failure()  # fall back to the LLM
+        return None
+    await session.add_items([
+        {"role": "user", "content": user_text},
+        {"role": "assistant", "content": final_text},
+    ])
+    return final_text, trace
+
+
+def _build_trace(new_items: List[Any]) -> List[Dict[str, Any]]:
+    """Trace aus new_items bauen (Tool calls/outputs/messages)."""
+    builder = _TraceBuilder()
+    for item in new_items:
+        builder.add(item)
+    return builder.trace
+
+
+class _TraceBuilder:
+    """Baut den Trace Item für Item auf (auch während eines gestreamten Runs)."""
+
+    def __init__(self) -> None:
+        self.trace: List[Dict[str, Any]] = []
+        self.pending: Dict[str, Dict[str, Any]] = {}  # call_id -> trace entry
+        self.fallback_last_entry: Optional[Dict[str, Any]] = None  # nur falls call_id fehlt
+
+    def add(self, item: Any) -> Optional[Dict[str, Any]]:
+        """Item übernehmen; gibt den neuen/aktualisierten Trace-Eintrag zurück (None bei anderen Items)."""
         t = getattr(item, "type", None)
 
         if t == "tool_call_item":
@@ -151,27 +539,29 @@ async def run_agent_turn(
                 "tool_name": tool_name,
                 "args": args,
                 "tool_output": None,
+                "call_id": call_id,
             }
-            trace.append(entry)
+            self.trace.append(entry)
 
             if call_id:
-                pending[call_id] = entry
+                self.pending[call_id] = entry
             else:
                 # Fallback, falls in deiner Umgebung kein call_id vorhanden ist
-                fallback_last_entry = entry
+                self.fallback_last_entry = entry
+            return entry
 
-        elif t == "tool_call_output_item":
+        if t == "tool_call_output_item":
             raw = getattr(item, "raw_item", None)
             call_id = _get_call_id(raw) or _get_call_id(item)
 
             tool_output = getattr(item, "output", None)
 
             # 1) sauber über call_id matchen
-            entry = pending.get(call_id) if call_id else None
+            entry = self.pending.get(call_id) if call_id else None
 
             # 2) Fallback: zuletzt gesehener Tool-Call
             if entry is None:
-                entry = fallback_last_entry
+                entry = self.fallback_last_entry
 
             # 3) Wenn immer noch nichts gefunden: “orphan output” als eigener entry
             if entry is None:
@@ -181,18 +571,21 @@ async def run_agent_turn(
                     "args": None,
                     "tool_output": None,
                 }
-                trace.append(entry)
+                self.trace.append(entry)
 
             entry["tool_output"] = tool_output
 
             # Optional: wenn pro call_id genau ein Output kommt, kannst du aufräumen
-            if call_id and call_id in pending:
-                pending.pop(call_id, None)
+            if call_id and call_id in self.pending:
+                self.pending.pop(call_id, None)
+            return entry
 
-        elif t == "message_output_item":
-            trace.append({
+        if t == "message_output_item":
+            entry = {
                 "type": "message",
                 "output": str(getattr(item, "raw_item", ""))[:5000],
-            })
+            }
+            self.trace.append(entry)
+            return entry
 
-    return str(result.final_output), trace 
+        return None
@@ -0,0 +1,522 @@
+# answer_cache.py
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# ============================================================
+# Semantic answer cache
+#
+# Questions are reduced to a template ("trips on <date> between <time> and <time>")
+# plus slot values. A new question with the same template, or with the same
+# set of content words (negations and comparisons included, so "pünktlich" vs.
+# "unpünktlich" or "über" vs. "unter" never match), and the same slot kinds
+# re-runs the cached tool calls with the new slot values swapped in; the model
+# only phrases the answer from the fresh results instead of planning the tool
+# calls again. Similarity (character n-gram TF-IDF, cosine) only ranks
+# candidates, it never decides a hit on its own.
+# ============================================================
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")  # optional JSON file, survives restarts
+
+# read-only tools whose calls can be replayed
+REPLAYABLE_TOOLS = {
+    "run_query", "run_queries", "daily_brief", "route_health", "period_report",
+    "nearest_stops", "stops_within", "snapshot_percentiles", "snapshot_top_k", "snapshot_compare",
+}
+
+# tools the model calls for context only; neither stored nor replayed
+CONTEXT_TOOLS = {"get_schema"}
+
+MAX_TABLE_ROWS = 50
+MAX_PROMPT_CHARS = 12000
+NGRAM_SIZES = (3, 4, 5)
+
+# words that do not change the meaning of a question (negations are never in here)
+_FILLER_WORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer", "eines",
+    "bitte", "mal", "mir", "uns", "the", "a", "an", "please", "me",
+}
+
+# ------------------------------------------------------------
+# Slot extraction
+# ------------------------------------------------------------
+_SLOT_PATTERNS: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("date", re.compile(r"\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b")),  # 17.03.2022
+    ("date", re.compile(r"\b\d{4}-\d{2}-\d{2}\b")),
+    ("month", re.compile(r"\b\d{4}-\d{2}\b")),
+    ("time", re.compile(r"\b\d{1,2}:\d{2}\b")),
+    ("trip", re.compile(r"\b[A-Z][A-Z0-9_]*:\d+:\d+\b")),
+    ("line", re.compile(r"\b[A-Z][A-Z0-9_]*:[a-z]\w*\b")),
+    ("stop", re.compile(r"\b[A-Z][A-Z0-9_]*:\d+\b")),
+    ("route", re.compile(r"(?i)(?<=route)(?:_id)?\s*[:=]?\s*(\d+)\b")),
+    ("year", re.compile(r"\b(?:19|20)\d{2}\b")),
+    ("num", re.compile(r"\b\d+(?:\.\d+)?\b")),
+]
+
+# literals in tool arguments that must be explained by a slot for an entry to be reusable
+_ARG_LITERALS = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}(?:\b|(?=T\d))|\b\d{1,2}:\d{2}\b|\b[A-Z][A-Z0-9_]*:[\w:]+"
+)
+
+
+def _normalize_slot(kind: str, m: "re.Match[str]") -> str:
+    if kind == "date" and m.lastindex == 3:
+        d, mo, y = (int(g) for g in m.groups())
+        return date(y, mo, d).isoformat()
+    if kind == "route":
+        return m.group(1)
+    if kind == "time":
+        h, mi = m.group(0).split(":")
+        return f"{int(h):02d}:{mi}"
+    return m.group(0)
+
+
+def extract_slots(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """('which trips start on <date> between <time> and <time>?', [('date', '2022-03-17'), ...])"""
+    found: List[Tuple[int, int, str, str]] = []
+    taken = [False] * len(text)
+    for kind, pattern in _SLOT_PATTERNS:
+        for m in pattern.finditer(text):
+            start, end = (m.start(1), m.end(1)) if kind == "route" else m.span()
+            if any(taken[start:end]):
+                continue
+            try:
+                value = _normalize_slot(kind, m)
+            except ValueError:  # 31.02.2022
+                continue
+            for i in range(start, end):
+                taken[i] = True
+            found.append((start, end, kind, value))
+    found.sort()
+    parts, slots, pos = [], [], 0
+    for start, end, kind, value in found:
+        parts.append(text[pos:start])
+        parts.append(f"<{kind}>")
+        slots.append((kind, value))
+        pos = end
+    parts.append(text[pos:])
+    template = re.sub(r"\s+", " ", "".join(parts)).strip().lower()
+    return template, slots
+
+
+def question_terms(template: str) -> FrozenSet[str]:
+    """Content words and slot kinds of a template (filler words and punctuation dropped)."""
+    return frozenset(w for w in re.findall(r"<\w+>|\w+", template) if w not in _FILLER_WORDS)
+
+
+def _derived(kind: str, value: str) -> List[str]:
+    """Literals a query typically derives from a slot (month -> first day of it and of the next month)."""
+    if kind == "month":
+        y, m = (int(x) for x in value.split("-"))
+        ny, nm = (y + 1, 1) if m == 12 else (y, m + 1)
+        return [f"{y:04d}-{m:02d}-01", f"{ny:04d}-{nm:02d}-01", value]
+    if kind == "year":
+        y = int(value)
+        return [f"{y:04d}-01-01", f"{y + 1:04d}-01-01", value]
+    return [value]
+
+
+# ------------------------------------------------------------
+# TF-IDF over character n-grams
+# ------------------------------------------------------------
+def _ngrams(text: str) -> Counter:
+    padded = f" {text} "
+    grams: Counter = Counter()
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+
+class _TfIdfIndex:
+    def __init__(self) -> None:
+        self.docs: List[Counter] = []
+        self.df: Counter = Counter()
+        self._vectors: Optional[List[Tuple[Dict[str, float], float]]] = None
+
+    def add(self, text: str) -> None:
+        grams = _ngrams(text)
+        self.docs.append(grams)
+        self.df.update(grams.keys())
+        self._vectors = None
+
+    def remove(self, i: int) -> None:
+        self.df.subtract(self.docs.pop(i).keys())
+        self._vectors = None
+
+    def _weigh(self, grams: Counter) -> Tuple[Dict[str, float], float]:
+        n = len(self.docs)
+        vec = {g: (1 + math.log(c)) * (math.log((1 + n) / (1 + self.df.get(g, 0))) + 1) for g, c in grams.items()}
+        return vec, math.sqrt(sum(w * w for w in vec.values())) or 1.0
+
+    def search(self, text: str) -> List[Tuple[int, float]]:
+        """[(doc index, cosine)] sorted by score."""
+        if not self.docs:
+            return []
+        if self._vectors is None:
+            self._vectors = [self._weigh(d) for d in self.docs]
+        q, qn = self._weigh(_ngrams(text))
+        scores = []
+        for i, (vec, norm) in enumerate(self._vectors):
+            dot = sum(w * vec.get(g, 0.0) for g, w in q.items())
+            scores.append((i, dot / (qn * norm)))
+        scores.sort(key=lambda x: -x[1])
+        return scores
+
+
+# ------------------------------------------------------------
+# Cache
+# ------------------------------------------------------------
+class CacheHit:
+    def __init__(self, entry: Dict[str, Any], score: float, calls: List[Dict[str, Any]]) -> None:
+        self.entry = entry
+        self.score = score
+        self.calls = calls  # tool calls with the new slot values
+
+
+class SemanticAnswerCache:
+    """Question -> replayable tool calls; thread-safe, bounded (oldest entries dropped first)."""
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        path: Optional[str] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self._index = _TfIdfIndex()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.replay_failures = 0
+        self.stores = 0
+        self.saved_seconds = 0.0
+        self.replay_seconds = 0.0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for entry in json.load(f).get("entries", []):
+                    self._append(entry)
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticAnswerCache"]:
+        return cls(path=ANSWER_CACHE_PATH) if ANSWER_CACHE_ENABLED else None
+
+    # ---------- lookup ----------
+    def lookup(self, question: str) -> Optional[CacheHit]:
+        """Best entry with the same template or the same content words whose slots line up."""
+        template, slots = extract_slots(question)
+        terms = question_terms(template)
+        with self._lock:
+            self.lookups += 1
+            candidates = {
+                i for i, entry in enumerate(self.entries)
+                if entry["template"] == template or entry["terms"] == terms
+            }
+            if not candidates:
+                return None
+            for i, score in self._index.search(template):
+                if i not in candidates:
+                    continue
+                entry = self.entries[i]
+                calls = _swap_slots(entry, slots)
+                if calls is not None:
+                    return CacheHit(entry, score, calls)
+        return None
+
+    # ---------- store ----------
+    def store(self, question: str, trace: List[Dict[str, Any]], answer: str, seconds: float) -> bool:
+        """Remember a finished turn if all its tool calls are replayable and explained by the question's slots."""
+        template, slots = extract_slots(question)
+        calls = []
+        for item in trace:
+            if item.get("type") != "tool_call":
+                continue
+            if item.get("tool_name") in CONTEXT_TOOLS:
+                continue
+            args = _parse_args(item.get("args"))
+            if item.get("tool_name") not in REPLAYABLE_TOOLS or args is None or _is_error(item.get("tool_output")):
+                return False
+            calls.append({"tool_name": item["tool_name"], "args": args})
+        if not calls or not _explained(calls, slots):
+            return False
+
+        entry = {
+            "question": question,
+            "template": template,
+            "slots": slots,
+            "calls": calls,
+            "answer": answer,
+            "seconds": seconds,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            for i, old in enumerate(self.entries):
+                if old["template"] == template and [k for k, _ in old["slots"]] == [k for k, _ in slots]:
+                    self.entries.pop(i)
+                    self._index.remove(i)
+                    break
+            self._append(entry)
+            self.stores += 1
+            self._save()
+        return True
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        entry["slots"] = [tuple(s) for s in entry["slots"]]
+        entry["calls"] = [c for c in entry["calls"] if c["tool_name"] not in CONTEXT_TOOLS]  # older cache files
+        entry["terms"] = question_terms(entry["template"])
+        self.entries.append(entry)
+        self._index.add(entry["template"])
+        while len(self.entries) > self.max_entries:
+            self.entries.pop(0)
+            self._index.remove(0)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            entries = [{k: v for k, v in e.items() if k != "terms"} for e in self.entries]
+            json.dump({"entries": entries}, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self.path)
+
+    # ---------- metrics ----------
+    def record_hit(self, hit: CacheHit, replay_seconds: float) -> None:
+        with self._lock:
+            self.hits += 1
+            self.replay_seconds += replay_seconds
+            self.saved_seconds += max(0.0, float(hit.entry.get("seconds") or 0.0) - replay_seconds)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.replay_failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.lookups - self.hits,
+                "hit_rate": (self.hits / self.lookups) if self.lookups else 0.0,
+                "replay_failures": self.replay_failures,
+                "stores": self.stores,
+                "latency_saved_seconds": round(self.saved_seconds, 3),
+                "mean_replay_ms": round(1000 * self.replay_seconds / self.hits, 1) if self.hits else None,
+            }
+
+    # ---------- replay ----------
+    async def answer(
+        self,
+        question: str,
+        hit: CacheHit,
+        server: Any,
+        phrase: Callable[[str], Awaitable[str]],
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Re-run the cached tool calls on `server` and let `phrase` (one model call
+        without tools) answer `question` from the fresh results.
+        """
+        t0 = time.perf_counter()
+        trace: List[Dict[str, Any]] = []
+        sections: List[str] = []
+        for call in hit.calls:
+            t_call = time.perf_counter()
+            result = await server.call_tool(call["tool_name"], call["args"])
+            ms = round((time.perf_counter() - t_call) * 1000, 1)
+            if getattr(result, "isError", False):
+                raise RuntimeError(f"{call['tool_name']} failed during cache replay")
+            output = _tool_result(result)
+            if _is_error(output):
+                raise RuntimeError(f"{call['tool_name']} returned an error during cache replay")
+            trace.append({
+                "type": "tool_call",
+                "tool_name": call["tool_name"],
+                "args": json.dumps(call["args"], ensure_ascii=False),
+                "tool_output": output,
+                "ms": ms,
+                "cached": True,
+            })
+            sections.append(f"{call['tool_name']} {json.dumps(call['args'], ensure_ascii=False)}\n\n{render_markdown(output)}")
+        text = await phrase(answer_prompt(question, hit.entry, sections))
+        trace.append({"type": "message", "output": text[:5000], "cached": True})
+        self.record_hit(hit, time.perf_counter() - t0)
+        return text, trace
+
+
+def answer_prompt(question: str, entry: Dict[str, Any], sections: List[str]) -> str:
+    """Input of the phrasing call: the question, the replayed results and the earlier answer as a style example."""
+    results = "\n\n".join(sections)
+    if len(results) > MAX_PROMPT_CHARS:
+        results = results[:MAX_PROMPT_CHARS] + "\n… (gekürzt)"
+    return (
+        f"Frage: {question}\n\n"
+        f"Ergebnisse der Tool-Aufrufe (gerade ausgeführt):\n\n{results}\n\n"
+        f"Frühere Antwort auf die gleichartige Frage „{entry['question']}“ – nur als Vorlage für Aufbau "
+        f"und Stil, ihre Zahlen gelten nicht:\n\n{str(entry.get('answer') or '')[:2000]}"
+    )
+
+
+# ------------------------------------------------------------
+# helpers
+# ------------------------------------------------------------
+def _parse_args(args: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(args, dict):
+        return args
+    if isinstance(args, str):
+        try:
+            parsed = json.loads(args or "{}")
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    return None
+
+
+def _is_error(output: Any) -> bool:
+    text = output if isinstance(output, str) else json.dumps(output, default=str) if output is not None else ""
+    if '"error"' in text[:200] or text.lower().startswith("error"):
+        return True
+    batch = _batch_results(output)
+    return batch is not None and any(isinstance(r, dict) and "error" in r for r in batch.values())
+
+
+def _batch_results(output: Any) -> Optional[Dict[str, Any]]:
+    """Per-statement results of a run_queries output, else None."""
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return None
+    if isinstance(output, dict) and set(output) == {"result"}:
+        output = output["result"]
+    results = output.get("results") if isinstance(output, dict) else None
+    return results if isinstance(results, dict) else None
+
+
+def _strings(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [s for v in value.values() for s in _strings(v)]
+    if isinstance(value, list):
+        return [s for v in value for s in _strings(v)]
+    return [str(value)] if value is not None else []
+
+
+def _explained(calls: List[Dict[str, Any]], slots: List[Tuple[str, str]]) -> bool:
+    """Every date / time / ID literal in the arguments comes from (or is derived from) a slot of the question."""
+    known = {lit for kind, value in slots for lit in _derived(kind, value)}
+    for call in calls:
+        for s in _strings(call["args"]):
+            for lit in _ARG_LITERALS.findall(s):
+                if lit not in known:
+                    return False
+    return True
+
+
+def _swap_slots(entry: Dict[str, Any], slots: List[Tuple[str, str]]) -> Optional[List[Dict[str, Any]]]:
+    """Cached calls with the new slot values, or None if the slots do not line up."""
+    old = entry["slots"]
+    if [k for k, _ in old] != [k for k, _ in slots]:
+        return None
+    mapping: Dict[str, str] = {}
+    for (kind, before), (_, after) in zip(old, slots):
+        for lit_before, lit_after in zip(_derived(kind, before), _derived(kind, after)):
+            if mapping.get(lit_before, lit_after) != lit_after:
+                return None  # same value in the cached question maps to two different new values
+            mapping[lit_before] = lit_after
+
+    changed = {b: a for b, a in mapping.items() if b != a}
+    blob = json.dumps(entry["calls"], ensure_ascii=False)
+    if not changed:
+        return json.loads(blob)
+    # a changed slot that does not occur in the calls would be silently ignored -> no hit
+    for (kind, before), (_, after) in zip(old, slots):
+        if before != after and not any(_literal_re([lit]).search(blob) for lit in _derived(kind, before)):
+            return None
+    return json.loads(_literal_re(list(changed)).sub(lambda m: changed[m.group(1)], blob))
+
+
+def _literal_re(literals: List[str]) -> "re.Pattern[str]":
+    alternatives = "|".join(re.escape(lit) for lit in sorted(literals, key=len, reverse=True))
+    # dates and times may also be the two halves of a datetime literal ('2022-03-17T07:00')
+    return re.compile(r"(?:(?<=\dT)|(?<![\w:.-]))(" + alternatives + r")(?!(?!T\d)[\w:-]|\.\d)")
+
+
+def _tool_result(result: Any) -> Any:
+    structured = getattr(result, "structuredContent", None)
+    if structured is not None:
+        return structured
+    texts = [getattr(c, "text", "") for c in getattr(result, "content", []) or []]
+    text = "".join(texts)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _cell(v: Any) -> str:
+    if isinstance(v, float):
+        v = round(v, 2)
+    if isinstance(v, (dict, list)):
+        v = json.dumps(v, ensure_ascii=False, default=str)
+    return str(v).replace("|", "\\|").replace("\n", " ")
+
+
+def _table(rows: List[Dict[str, Any]]) -> str:
+    columns: List[str] = []
+    for row in rows[:MAX_TABLE_ROWS]:
+        columns.extend(c for c in row if c not in columns)
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for row in rows[:MAX_TABLE_ROWS]:
+        lines.append("| " + " | ".join(_cell(row.get(c)) for c in columns) + " |")
+    if len(rows) > MAX_TABLE_ROWS:
+        lines.append(f"\n… {len(rows) - MAX_TABLE_ROWS} weitere Zeilen")
+    return "\n".join(lines)
+
+
+def render_markdown(output: Any) -> str:
+    """Deterministic markdown for a tool result (rows -> table, report dicts -> sections)."""
+    if isinstance(output, dict) and set(output) == {"result"}:
+        output = output["result"]
+    if isinstance(output, list):
+        if not output:
+            return "_(keine Ergebnisse)_"
+        if all(isinstance(r, dict) for r in output):
+            return _table(output)
+        return ", ".join(_cell(v) for v in output)
+    if isinstance(output, dict) and "handle" in output and "preview" in output:
+        # run_query result kept server-side: first rows only
+        table = render_markdown(output["preview"])
+        rest = output.get("row_count", 0) - len(output["preview"])
+        return table + (f"\n\n… {rest} weitere Zeilen (vollständige Tabelle unten)" if rest > 0 else "")
+    batch = _batch_results(output)
+    if batch is not None:
+        return "\n\n".join(
+            f"**{name}**\n\n" + render_markdown(r.get("rows") if isinstance(r, dict) and "rows" in r else r)
+            for name, r in batch.items()
+        )
+    if isinstance(output, dict):
+        if output.get("format") in ("columnar", "dict") and "columns" in output:
+            lookups = [(output.get("dictionaries") or {}).get(c) for c in output["columns"]]
+            rows = [
+                {c: (lk[v] if lk is not None and isinstance(v, int) else v) for c, lk, v in zip(output["columns"], lookups, vals)}
+                for vals in output.get("data") or []
+            ]
+            return render_markdown(rows)
+        scalars = {k: v for k, v in output.items() if not isinstance(v, (dict, list))}
+        parts = [_table([scalars])] if scalars else []
+        for k, v in output.items():
+            if isinstance(v, dict):
+                parts.append(f"**{k}**\n\n" + _table([v]))
+            elif isinstance(v, list):
+                parts.append(f"**{k}**\n\n" + render_markdown(v))
+        return "\n\n".join(parts)
+    return _cell(output)
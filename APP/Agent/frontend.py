@@ -1,7 +1,10 @@
 import os
 import json
+import math
 import uuid
-import asyncio
+import urllib.error
+import urllib.parse
+import urllib.request
 from typing import Any, Dict, List, Optional
 from pprint import pprint
 
@@ -9,23 +12,16 @@ import pandas as pd
 import streamlit as st
 
 from agents import SQLiteSession
-from agent_runtime import run_agent_turn
+from agent_runtime import MCP_TENANT_ID, get_runtime, stream_agent_turn
+from session_compaction import CompactingSession
 
 st.set_page_config(page_title="Neo4j MCP Chatbot", layout="wide")
 
 
 # ----------------------------
-# async helper
+# async: one persistent runtime (background loop + MCP connection) per process
 # ----------------------------
-def run_async(coro):
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        try:
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
+runtime = get_runtime()
 
 
 # ----------------------------
@@ -57,14 +53,35 @@ def _unwrap(x: Any) -> Any:
     return x
 
 
+def _decode_columnar(x: Any) -> Optional[List[Dict[str, Any]]]:
+    """{"format": "columnar"|"dict", "columns": [...], "data": [[...]]} -> list of dicts."""
+    if not (isinstance(x, dict) and x.get("format") in ("columnar", "dict")):
+        return None
+    columns = x.get("columns") or []
+    data = x.get("data") or []
+    dictionaries = x.get("dictionaries") or {}
+    lookups = [dictionaries.get(c) for c in columns]
+    rows = []
+    for values in data:
+        row = {}
+        for c, lookup, v in zip(columns, lookups, values):
+            row[c] = lookup[v] if lookup is not None and isinstance(v, int) else v
+        rows.append(row)
+    return rows
+
+
 def _extract_rows(x: Any) -> List[Dict[str, Any]]:
     x = _unwrap(x)
 
     if isinstance(x, list) and x and isinstance(x[0], dict):
         return x
 
+    decoded = _decode_columnar(x)
+    if decoded is not None:
+        return decoded
+
     if isinstance(x, dict):
-        for k in ("rows", "data", "result"):
+        for k in ("rows", "data", "result", "preview"):
             v = x.get(k)
             v = _unwrap(v)
             if isinstance(v, list) and v and isinstance(v[0], dict):
@@ -82,6 +99,96 @@ def _extract_rows(x: Any) -> List[Dict[str, Any]]:
     # return None
 
 
+def _render_step(i: int, item: Dict[str, Any]) -> None:
+    label = "step {}: call tool : {} ".format(i, item.get('tool_name'))
+    if item.get("ms") is not None:
+        label += "– {:.0f} ms ".format(item["ms"])
+    if item.get("cached"):
+        label += "(cache)"
+    with st.expander(label):
+        st.write(f"Tool call: {item.get('tool_name')}")
+        if item.get("args") is not None:
+            st.code(str(item["args"]))
+        out = _unwrap(item.get("tool_output"))
+        # If rows -> show table; else show JSON
+        st.markdown("tool outputs:")
+        rows = _extract_rows(out)
+        batch = out.get("results") if isinstance(out, dict) else None
+        if isinstance(batch, dict):
+            # run_queries: one table per named statement
+            for name, res in batch.items():
+                st.markdown(f"**{name}** ({res.get('ms')} ms)")
+                res_rows = _extract_rows(res.get("rows"))
+                if res_rows:
+                    st.dataframe(pd.DataFrame(res_rows), use_container_width=True, hide_index=True)
+                else:
+                    st.code(json.dumps(res, ensure_ascii=False, indent=2))
+        elif rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.code(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+# ----------------------------
+# results kept on the MCP server (run_query handles): fetched page by page, not via the LLM
+# ----------------------------
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "100"))
+
+
+def _stored_results(trace: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    tables = []
+    for item in trace:
+        out = _unwrap(item.get("tool_output")) if item.get("type") == "tool_call" else None
+        if isinstance(out, dict) and out.get("handle") and "preview" in out:
+            tables.append({"handle": out["handle"], "row_count": out.get("row_count", 0), "columns": out.get("columns")})
+    return tables
+
+
+def _results_url(mcp_url: str, handle: str, offset: int, limit: int) -> str:
+    base = mcp_url.rstrip("/")
+    if base.endswith("/mcp"):
+        base = base[: -len("/mcp")]
+    query = urllib.parse.urlencode({"offset": offset, "limit": limit})
+    return f"{base}/results/{urllib.parse.quote(handle)}?{query}"
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _fetch_result_page(mcp_url: str, handle: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+    """One page of a stored result (None once the handle expired on the server)."""
+    try:
+        # handles belong to the tenant that stored them
+        request = urllib.request.Request(
+            _results_url(mcp_url, handle, offset, limit), headers={"X-Tenant-Id": MCP_TENANT_ID} if MCP_TENANT_ID else {}
+        )
+        with urllib.request.urlopen(request, timeout=30) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as exc:
+        if exc.code == 404:
+            return None
+        raise
+
+
+def _render_stored_result(table: Dict[str, Any], key: str) -> None:
+    pages = max(1, math.ceil(table["row_count"] / RESULT_PAGE_SIZE))
+    with st.expander(f"Vollständige Tabelle ({table['row_count']} Zeilen)"):
+        page = 1
+        if pages > 1:
+            page = int(st.number_input(f"Seite (1–{pages})", min_value=1, max_value=pages, value=1, key=f"page_{key}"))
+        try:
+            data = _fetch_result_page(mcp_url, table["handle"], (page - 1) * RESULT_PAGE_SIZE, RESULT_PAGE_SIZE)
+        except (urllib.error.URLError, OSError):  # server down / timeout; not cached, retried on the next rerun
+            st.info("MCP-Server nicht erreichbar – Tabelle kann gerade nicht geladen werden.")
+            return
+        if data is None:
+            st.info("Ergebnis ist auf dem Server abgelaufen – Frage erneut stellen.")
+            return
+        rows = _extract_rows(data)
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.code(json.dumps(data, ensure_ascii=False, indent=2))
+
+
 # ----------------------------
 # UI
 # ----------------------------
@@ -89,6 +196,14 @@ st.sidebar.header("Settings")
 mcp_url = st.sidebar.text_input("MCP Server URL", value=os.getenv("MCP_SERVER_URL", "http://localhost:8000/mcp"))
 model = st.sidebar.text_input("Model", value=os.getenv("OPENAI_MODEL", "gpt-5.1"))
 show_steps = st.sidebar.checkbox("Show tool steps", value=True)
+if runtime.answer_cache is not None:
+    cache_stats = runtime.answer_cache.stats()
+    st.sidebar.caption("Answer cache")
+    st.sidebar.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}", f"{cache_stats['hits']} / {cache_stats['lookups']}")
+    st.sidebar.metric("Latency saved", f"{cache_stats['latency_saved_seconds']:.1f} s")
+if isinstance(st.session_state.get("agent_session"), CompactingSession):
+    st.sidebar.caption("Chat history")
+    st.sidebar.metric("History tokens (est.)", st.session_state.agent_session.stats()["history_tokens"])
 # show_output = st.sidebar.checkbox("Show tool outputs", value=True)
 
 st.title("Neo4j MCP Chatbot")
@@ -96,14 +211,17 @@ st.title("Neo4j MCP Chatbot")
 if "session_id" not in st.session_state:
     st.session_state.session_id = f"ui_{uuid.uuid4().hex}"
 if "agent_session" not in st.session_state:
-    st.session_state.agent_session = SQLiteSession(st.session_state.session_id)
+    # older tool outputs are summarized so long chats do not resend every earlier table
+    st.session_state.agent_session = CompactingSession.from_env(SQLiteSession(st.session_state.session_id))
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # render history
-for msg in st.session_state.messages:
+for n, msg in enumerate(st.session_state.messages):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        for j, table in enumerate(msg.get("tables") or []):
+            _render_stored_result(table, f"{n}_{j}")
 
 user_text = st.chat_input("Frage… (z.B. langsamstes Segment 01.01–07.01.2022)")
 
@@ -113,41 +231,58 @@ if user_text:
         st.markdown(user_text)
 
     with st.chat_message("assistant"):
-        with st.spinner("Agent läuft…"):
-            final_text, trace = run_async(
-                run_agent_turn(
-                    user_text=user_text,
-                    session=st.session_state.agent_session,
-                    mcp_url=mcp_url,
-                    model=model,
-                )
+        # answer text streams into `answer`, tool steps appear as their results arrive
+        answer = st.empty()
+        caption = st.empty()
+        steps = st.expander("Tool steps", expanded=True) if show_steps else None
+        status = st.empty()
+        status.caption("Agent läuft…")
+
+        streamed, final_text, trace, n_steps = "", "", [], 0
+        for event in runtime.stream(
+            stream_agent_turn(
+                user_text=user_text,
+                session=st.session_state.agent_session,
+                mcp_url=mcp_url,
+                model=model,
+                runtime=runtime,
+            )
+        ):
+            kind = event["type"]
+            if kind == "text_delta":
+                streamed += event["delta"]
+                answer.markdown(streamed + "▌")
+            elif kind == "tool_call":
+                streamed = ""  # text before a tool call was only a preamble of that step
+                answer.empty()
+                status.caption(f"Tool {event['entry'].get('tool_name')} läuft…")
+            elif kind == "tool_output":
+                n_steps += 1
+                status.caption("Agent läuft…")
+                if steps is not None:
+                    with steps:
+                        _render_step(n_steps, event["entry"])
+            elif kind == "done":
+                final_text, trace = event["text"], event["trace"]
+        status.empty()
+
+        answer.markdown(final_text)
+        tables = _stored_results(trace)
+        st.session_state.messages.append({"role": "assistant", "content": final_text, "tables": tables})
+        for j, table in enumerate(tables):
+            _render_stored_result(table, f"{len(st.session_state.messages) - 1}_{j}")
+        turn = next((t for t in trace if t.get("type") == "metrics"), None)
+        if turn:
+            text = (
+                "{total_seconds:.1f} s gesamt · LLM {llm_seconds:.1f} s ({llm_calls} Calls) · "
+                "Tools {tool_seconds:.1f} s · Tokens {input_tokens} in / {output_tokens} out".format(**turn)
             )
+            if turn.get("first_token_seconds") is not None:
+                text = "erstes Token nach {:.1f} s · ".format(turn["first_token_seconds"]) + text
+            caption.caption(text)
 
-        st.markdown(final_text)
-        st.session_state.messages.append({"role": "assistant", "content": final_text})
-
-        # Steps (debug)
-        if show_steps:
-            with st.expander("Tool steps"):
-                i = 0
-                # with st.expander("Trace and result"):
-                #     st.code(json.dumps(trace, indent=2, ensure_ascii=False)) 
-                for item in trace:
-                    i+=1
-                    if item.get("type") == "tool_call":          
-                        with st.expander("step {}: call tool : {} ".format(i,item.get('tool_name'))):
-                            st.write(f"Tool call: {item.get('tool_name')}")
-                            if item.get("args") is not None:
-                                st.code(str(item["args"])) 
-                            out = _unwrap(item.get("tool_output"))
-                            # If rows -> show table; else show JSON
-                            st.markdown("tool outputs:")
-                            rows = _extract_rows(out)
-                            if rows:
-                                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
-                            else:
-                                st.code(json.dumps(out, ensure_ascii=False, indent=2))
-                                            
+        # with st.expander("Trace and result"):
+        #     st.code(json.dumps(trace, indent=2, ensure_ascii=False))
 
                     # trace.remove(item)
                     # st.write(f"Tool : {item.get("tool_name")}: {item.get("type")}")
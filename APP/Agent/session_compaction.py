@@ -0,0 +1,203 @@
+# session_compaction.py
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import SQLiteSession
+
+# ============================================================
+# History compaction for long chat sessions
+#
+# Every turn replays the session history into the model. Without compaction
+# the large tool outputs of earlier turns are sent again on every turn, so
+# prompt size (and latency) grows with the length of the chat. The wrapper keeps
+# the last K turns verbatim, replaces older tool outputs with short summaries
+# and drops the oldest turns once the history exceeds a token budget.
+# ============================================================
+SESSION_COMPACTION_ENABLED = os.getenv("SESSION_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "3"))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "24000"))
+SESSION_TOOL_SUMMARY_CHARS = int(os.getenv("SESSION_TOOL_SUMMARY_CHARS", "400"))
+
+COMPACTED_PREFIX = "[compacted] "
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for a budget
+
+
+def estimate_tokens(item: Any) -> int:
+    return len(json.dumps(item, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN + 1
+
+
+# ------------------------------------------------------------
+# Tool output summaries
+# ------------------------------------------------------------
+def _parse(output: Any) -> Any:
+    if isinstance(output, list):  # content parts: [{"type": "input_text", "text": ...}]
+        output = "".join(str(p.get("text", "")) for p in output if isinstance(p, dict))
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return output
+    if isinstance(output, dict) and set(output) == {"result"}:
+        output = output["result"]
+    return output
+
+
+def _clip(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def _rows_summary(rows: List[Any], max_chars: int) -> str:
+    if not rows:
+        return "0 Zeilen"
+    if len(_dumps(rows)) <= max_chars:
+        return _dumps(rows)  # small results (aggregates, key numbers) stay complete
+    columns = list(rows[0]) if isinstance(rows[0], dict) else []
+    head = f"{len(rows)} Zeilen" + (f", Spalten {columns}" if columns else "")
+    return head + ", erste Zeile " + _dumps(rows[0])
+
+
+def summarize_tool_output(tool_name: Optional[str], output: Any, max_chars: int = SESSION_TOOL_SUMMARY_CHARS) -> str:
+    """Short text that replaces an old tool output: row counts, columns, small results / key numbers."""
+    value = _parse(output)
+    if isinstance(value, list):
+        text = _rows_summary(value, max_chars)
+    elif isinstance(value, dict) and "error" in value:
+        text = _dumps({"error": value["error"]})
+    elif isinstance(value, dict) and "handle" in value and "preview" in value:
+        text = f"{value.get('row_count')} Zeilen, Spalten {value.get('columns')}, handle {value['handle']} (evtl. abgelaufen)"
+    elif isinstance(value, dict) and isinstance(value.get("results"), dict):  # run_queries
+        parts = []
+        for name, result in value["results"].items():
+            if isinstance(result, dict) and "error" in result:
+                parts.append(f"{name}: error {result['error']}")
+            elif isinstance(result, dict):
+                parts.append(f"{name}: " + _rows_summary(result.get("rows") or [], max_chars // max(1, len(value["results"]))))
+        text = "; ".join(parts)
+    elif isinstance(value, dict) and "columns" in value and "data" in value:  # columnar / dict format
+        text = f"{len(value['data'])} Zeilen, Spalten {value['columns']}"
+    elif isinstance(value, dict):
+        # reports: keep the top-level numbers, count the nested lists
+        scalars = {k: v for k, v in value.items() if not isinstance(v, (dict, list))}
+        nested = {k: f"{len(v)} Einträge" for k, v in value.items() if isinstance(v, list)}
+        text = _dumps({**scalars, **nested})
+    else:
+        text = str(value)
+    return COMPACTED_PREFIX + (f"{tool_name}: " if tool_name else "") + _clip(text, max_chars)
+
+
+# ------------------------------------------------------------
+# Session wrapper
+# ------------------------------------------------------------
+def _is_user_message(item: Dict[str, Any]) -> bool:
+    return item.get("role") == "user" and item.get("type", "message") == "message"
+
+
+def _split_turns(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Each turn starts with a user message (items before the first one form their own group)."""
+    turns: List[List[Dict[str, Any]]] = []
+    for item in items:
+        if not turns or _is_user_message(item):
+            turns.append([])
+        turns[-1].append(item)
+    return turns
+
+
+class CompactingSession:
+    """
+    Session wrapper (agents `Session` protocol) around a `SQLiteSession`.
+
+    On read, turns older than the last `keep_turns` get their tool outputs
+    replaced by summaries (`summarize_tool_output`); user/assistant messages and
+    the tool calls themselves are kept. If the history is still above
+    `max_tokens`, the oldest turns are dropped whole (tool calls and outputs stay
+    paired). The compacted history is written back to the inner session, so each
+    turn reads and re-sends a bounded history instead of the full chat.
+    """
+
+    def __init__(
+        self,
+        inner: SQLiteSession,
+        keep_turns: int = SESSION_KEEP_TURNS,
+        max_tokens: int = SESSION_MAX_TOKENS,
+        summary_chars: int = SESSION_TOOL_SUMMARY_CHARS,
+    ) -> None:
+        self.inner = inner
+        self.session_id = inner.session_id
+        self.session_settings = getattr(inner, "session_settings", None)
+        self.keep_turns = max(1, int(keep_turns))
+        self.max_tokens = int(max_tokens)
+        self.summary_chars = int(summary_chars)
+
+        self.compactions = 0
+        self.summarized_outputs = 0
+        self.dropped_turns = 0
+        self.last_tokens = 0
+
+    @classmethod
+    def from_env(cls, inner: SQLiteSession) -> Any:
+        """Wrapped session, or `inner` itself if SESSION_COMPACTION_ENABLED is off."""
+        return cls(inner) if SESSION_COMPACTION_ENABLED else inner
+
+    # ---------- Session protocol ----------
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        items = await self.inner.get_items()
+        compacted, changed = self.compact(items)
+        if changed:
+            await self.inner.clear_session()
+            await self.inner.add_items(compacted)
+            self.compactions += 1
+        return compacted[-limit:] if limit else compacted
+
+    async def add_items(self, items: List[Any]) -> None:
+        await self.inner.add_items(items)
+
+    async def pop_item(self) -> Optional[Any]:
+        return await self.inner.pop_item()
+
+    async def clear_session(self) -> None:
+        await self.inner.clear_session()
+
+    # ---------- compaction ----------
+    def compact(self, items: List[Any]) -> Tuple[List[Any], bool]:
+        """(history to send, whether it differs from `items`)."""
+        turns = _split_turns(items)
+        changed = False
+        tool_names: Dict[str, str] = {}
+        for n, turn in enumerate(turns):
+            old = n < len(turns) - self.keep_turns
+            for i, item in enumerate(turn):
+                if item.get("type") == "function_call":
+                    tool_names[item.get("call_id", "")] = item.get("name")
+                    continue
+                if not old or item.get("type") != "function_call_output":
+                    continue
+                output = item.get("output")
+                if isinstance(output, str) and (output.startswith(COMPACTED_PREFIX) or len(output) <= self.summary_chars):
+                    continue
+                summary = summarize_tool_output(tool_names.get(item.get("call_id", "")), output, self.summary_chars)
+                turn[i] = {**item, "output": summary}
+                self.summarized_outputs += 1
+                changed = True
+
+        sizes = [sum(estimate_tokens(item) for item in turn) for turn in turns]
+        total = sum(sizes)
+        while len(turns) > 1 and total > self.max_tokens:
+            total -= sizes.pop(0)
+            turns.pop(0)
+            self.dropped_turns += 1
+            changed = True
+        self.last_tokens = total
+        return [item for turn in turns for item in turn], changed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "history_tokens": self.last_tokens,
+            "compactions": self.compactions,
+            "summarized_outputs": self.summarized_outputs,
+            "dropped_turns": self.dropped_turns,
+        }
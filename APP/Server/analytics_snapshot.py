@@ -0,0 +1,625 @@
+# analytics_snapshot.py
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ============================================================
+# Columnar analytics snapshot
+#
+# Percentiles, outlier lists and period comparisons make Neo4j collect and sort
+# millions of durations per question. The snapshot keeps trips, dwell events and
+# travel events as column files (.npy) next to the server: IDs dictionary-encoded
+# (sorted dictionaries, int32 codes), dates as day numbers, times as epoch
+# seconds. Every table is sorted by day, so a date range is a binary search and
+# a zero-copy slice of memory-mapped arrays; statistics are vectorized NumPy ops.
+# The snapshot is exported from the graph after each ETL run.
+# ============================================================
+FORMAT_VERSION = 1
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics_snapshot")
+META_FILE = "meta.json"
+
+# table -> (export Cypher, dictionary-encoded columns (column -> dictionary), numeric columns)
+TABLES: Dict[str, Tuple[str, Dict[str, str], Tuple[str, ...]]] = {
+    "trips": (
+        """
+        MATCH (t:Trip)
+        RETURN t.trip_id AS trip, t.route_id AS route, t.line AS line, t.date AS date,
+               t.from_time.epochSeconds AS start, t.to_time.epochSeconds AS end,
+               t.travel_time_seconds AS seconds
+        """,
+        {"trip": "trip", "route": "route", "line": "line"},
+        ("start", "end", "seconds"),
+    ),
+    "dwell": (
+        """
+        MATCH (t:Trip)-[d:DWELL_AT]->(:Stop)
+        RETURN d.stop_id AS stop, t.route_id AS route, t.line AS line, d.date AS date,
+               d.from_time.epochSeconds AS start, d.dwell_time_seconds AS seconds
+        """,
+        {"stop": "stop", "route": "route", "line": "line"},
+        ("start", "seconds"),
+    ),
+    "travel": (
+        """
+        MATCH (t:Trip)-[e:TRAVELS_ON]->(seg:TravelSegment)
+        RETURN seg.segment_id AS segment, t.route_id AS route, t.line AS line, e.date AS date,
+               e.from_time.epochSeconds AS start, e.travel_time_seconds AS seconds
+        """,
+        {"segment": "segment", "route": "route", "line": "line"},
+        ("start", "seconds"),
+    ),
+}
+
+# output names of the ID columns (as in the graph)
+ID_NAMES = {"trip": "trip_id", "route": "route_id", "line": "line", "stop": "stop_id", "segment": "segment_id"}
+DERIVED_GROUPS = ("day", "month", "hour", "weekday")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class SnapshotUnavailable(RuntimeError):
+    """No snapshot has been exported yet (or it cannot be read)."""
+
+
+# ------------------------------------------------------------
+# Export (graph -> column files)
+# ------------------------------------------------------------
+def _day_numbers(dates: Sequence[Optional[str]]) -> np.ndarray:
+    return np.array([d[:10] if d else "NaT" for d in dates], dtype="datetime64[D]").astype(np.int64).astype(np.int32)
+
+
+def _encode(values: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(sorted dictionary, int32 codes); None is encoded as ''."""
+    strings = np.array(["" if v is None else str(v) for v in values], dtype=str)
+    dictionary, codes = np.unique(strings, return_inverse=True)
+    return dictionary, codes.astype(np.int32)
+
+
+def _float(values: Sequence[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def export_snapshot(session: Any, path: str = DEFAULT_DIR, data_version: Any = None) -> Dict[str, Any]:
+    """
+    Read trips, dwell and travel events through `session.run(cypher)` (a neo4j
+    session) and write the snapshot to `path`. The new snapshot is written next
+    to the old one and swapped in at the end, so a running server never sees a
+    half-written directory. Returns the snapshot meta data.
+    """
+    started = time.perf_counter()
+    tmp = path.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    tables: Dict[str, Dict[str, Any]] = {}
+    local: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}  # (table, column) -> (dictionary, codes)
+    first_days: List[int] = []
+    last_days: List[int] = []
+    for table, (cypher, id_columns, numeric) in TABLES.items():
+        columns: Dict[str, List[Any]] = {c: [] for c in (*id_columns, "date", *numeric)}
+        for record in session.run(cypher):
+            for c, values in columns.items():
+                values.append(record[c])
+        day = _day_numbers(columns["date"])
+        start = _float(columns["start"])
+        order = np.lexsort((np.nan_to_num(start, nan=-1.0), day))  # by day, then start time
+        np.save(os.path.join(tmp, f"{table}.day.npy"), day[order])
+        for c in numeric:
+            np.save(os.path.join(tmp, f"{table}.{c}.npy"), _float(columns[c])[order])
+        for c in id_columns:
+            dictionary, codes = _encode(columns[c])
+            local[(table, c)] = (dictionary, codes[order])
+        if len(day):
+            first_days.append(int(day[order[0]]))
+            last_days.append(int(day[order[-1]]))
+        tables[table] = {"rows": int(len(day)), "columns": ["day", *numeric, *id_columns], "dictionaries": dict(id_columns)}
+
+    # one shared dictionary per ID kind, so codes compare across tables
+    for name in sorted({n for _, id_columns, _ in TABLES.values() for n in id_columns.values()}):
+        members = [(t, c) for t, (_, id_columns, _) in TABLES.items() for c, n in id_columns.items() if n == name]
+        merged = np.unique(np.concatenate([local[m][0] for m in members]))
+        np.save(os.path.join(tmp, f"dict.{name}.npy"), merged)
+        for table, c in members:
+            dictionary, codes = local.pop((table, c))
+            remap = np.searchsorted(merged, dictionary).astype(np.int32)
+            np.save(os.path.join(tmp, f"{table}.{c}.npy"), remap[codes])
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "data_version": data_version,
+        "exported_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "export_seconds": round(time.perf_counter() - started, 3),
+        "dates": {"min": _iso_day(min(first_days)), "max": _iso_day(max(last_days))} if first_days else None,
+        "tables": tables,
+    }
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    old = path.rstrip("/\\") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)  # open memory maps keep their (unlinked) files
+    return meta
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _iso_day(day: Optional[int]) -> Optional[str]:
+    return None if day is None else str(_EPOCH + np.timedelta64(int(day), "D"))
+
+
+def _iso_time(seconds: float) -> Optional[str]:
+    if seconds is None or np.isnan(seconds):
+        return None
+    return dt.datetime.fromtimestamp(float(seconds), dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _number(v: Any) -> Optional[float]:
+    v = float(v)
+    return None if np.isnan(v) else round(v, 3)
+
+
+def parse_period(date_from: str, date_to: Optional[str] = None) -> Tuple[int, int]:
+    """Inclusive day-number range; 'YYYY', 'YYYY-MM' and 'YYYY-MM-DD' (date_to defaults to date_from)."""
+    def _bounds(value: str) -> Tuple[int, int]:
+        value = str(value).strip()
+        try:
+            if len(value) == 4:
+                first, last = np.datetime64(value, "Y"), np.datetime64(value, "Y") + 1
+            elif len(value) == 7:
+                first, last = np.datetime64(value, "M"), np.datetime64(value, "M") + 1
+            else:
+                first = last = np.datetime64(value[:10], "D")
+                last = last + 1
+        except ValueError:
+            raise ValueError(f"Invalid date {value!r} (expected YYYY, YYYY-MM or YYYY-MM-DD)") from None
+        return int(first.astype("datetime64[D]").astype(np.int64)), int(last.astype("datetime64[D]").astype(np.int64)) - 1
+
+    lo, hi = _bounds(date_from)
+    if date_to:
+        hi = _bounds(date_to)[1]
+    if hi < lo:
+        raise ValueError(f"date_to {date_to!r} is before date_from {date_from!r}")
+    return lo, hi
+
+
+def _percentile_label(p: float) -> str:
+    return f"p{p:g}".replace(".", "_")
+
+
+def group_stats(
+    keys: np.ndarray, values: np.ndarray, percentiles: Sequence[float]
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Per distinct key: count (rows), n (non-NaN values), sum, mean, min, max and the
+    percentiles (linear interpolation, as numpy / Cypher percentileCont).
+    Values are only sorted when percentiles are requested, once for all groups.
+    """
+    labels = [_percentile_label(p) for p in percentiles]
+    if len(keys) == 0:
+        empty = np.empty(0)
+        return keys[:0], {name: empty for name in ("count", "n", "sum", "mean", "min", "max", *labels)}
+    single = keys.min() == keys.max()
+    order: Optional[np.ndarray] = None
+    if not single:
+        # by value (NaN last) if needed, then stable by key; keys narrowed to 16 bit get a radix sort
+        order = np.argsort(values) if labels else None
+        k = keys if order is None else keys[order]
+        low = k.min()
+        narrow = (k - low).astype(np.uint16) if k.max() - low < 2 ** 16 else k
+        by_key = np.argsort(narrow, kind="stable")
+        order = by_key if order is None else order[by_key]
+    k = keys if order is None else keys[order]
+    v = np.asarray(values if order is None else values[order], dtype=np.float64)
+    starts = np.zeros(1, dtype=np.int64) if single else np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    count = np.diff(np.r_[starts, len(k)])
+    valid = ~np.isnan(v)
+    n = np.add.reduceat(valid, starts)
+    total = np.add.reduceat(np.where(valid, v, 0.0), starts)
+    has = n > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats: Dict[str, np.ndarray] = {
+            "count": count,
+            "n": n,
+            "sum": total,
+            "mean": np.where(has, total / n, np.nan),
+            "min": np.fmin.reduceat(v, starts),
+            "max": np.fmax.reduceat(v, starts),
+        }
+    if single and labels:
+        present = v[valid]
+        found = np.percentile(present, [float(p) for p in percentiles]) if len(present) else [np.nan] * len(labels)
+        stats.update({label: np.array([value]) for label, value in zip(labels, found)})
+        return k[starts], stats
+    for label, p in zip(labels, percentiles):
+        pos = (np.maximum(n, 1) - 1) * (float(p) / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, np.maximum(n, 1) - 1)
+        frac = pos - lo
+        value = v[starts + lo] * (1.0 - frac) + v[starts + hi] * frac
+        stats[label] = np.where(has, value, np.nan)
+    return k[starts], stats
+
+
+# ------------------------------------------------------------
+# Snapshot (memory-mapped, read-only)
+# ------------------------------------------------------------
+class AnalyticsSnapshot:
+    """One exported snapshot; opening it only maps the files (no data is read up front)."""
+
+    def __init__(self, path: str) -> None:
+        meta_path = os.path.join(path, META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise SnapshotUnavailable(f"No analytics snapshot in {path} ({exc})") from exc
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise SnapshotUnavailable(f"Snapshot format {self.meta.get('format')} != {FORMAT_VERSION}; export again")
+        self.path = path
+        self.tables: Dict[str, Dict[str, np.ndarray]] = {
+            table: {c: np.load(os.path.join(path, f"{table}.{c}.npy"), mmap_mode="r") for c in info["columns"]}
+            for table, info in self.meta["tables"].items()
+        }
+        names = {name for info in self.meta["tables"].values() for name in info["dictionaries"].values()}
+        self.dictionaries = {name: np.load(os.path.join(path, f"dict.{name}.npy"), mmap_mode="r") for name in names}
+
+    # ---------- lookup ----------
+    def _table(self, table: str) -> Dict[str, np.ndarray]:
+        if table not in self.tables:
+            raise ValueError(f"Unknown table {table!r}; available: {sorted(self.tables)}")
+        return self.tables[table]
+
+    def _dictionary(self, table: str, column: str) -> np.ndarray:
+        return self.dictionaries[self.meta["tables"][table]["dictionaries"][column]]
+
+    def _codes(self, table: str, column: str, values: Any) -> np.ndarray:
+        """Codes of the given IDs (unknown IDs are dropped)."""
+        dictionary = self._dictionary(table, column)
+        # own dtype: casting to the dictionary's fixed width would cut "R1X" down to "R1"
+        wanted = np.array([str(v) for v in (values if isinstance(values, list) else [values])], dtype=str)
+        pos = np.searchsorted(dictionary, wanted)
+        pos = np.minimum(pos, len(dictionary) - 1)
+        return pos[dictionary[pos] == wanted].astype(np.int32) if len(dictionary) else np.empty(0, np.int32)
+
+    def _id_column(self, table: str, name: str) -> str:
+        """Accept 'route' as well as 'route_id'."""
+        for c in self.meta["tables"][table]["dictionaries"]:
+            if name in (c, ID_NAMES.get(c)):
+                return c
+        raise ValueError(
+            f"Unknown column {name!r} for {table}; use one of "
+            f"{[ID_NAMES[c] for c in self.meta['tables'][table]['dictionaries']]} or {list(DERIVED_GROUPS)}"
+        )
+
+    def _select(
+        self, table: str, date_from: str, date_to: Optional[str], filters: Optional[Dict[str, Any]]
+    ) -> Dict[str, np.ndarray]:
+        """Columns of the rows in the period (binary search on the sorted day column) matching `filters`."""
+        columns = self._table(table)
+        lo, hi = parse_period(date_from, date_to)
+        day = columns["day"]
+        a, b = int(np.searchsorted(day, lo, "left")), int(np.searchsorted(day, hi, "right"))
+        selected = {c: array[a:b] for c, array in columns.items()}
+        mask: Optional[np.ndarray] = None
+        for name, value in (filters or {}).items():
+            if name in ("hour", "weekday"):
+                wanted = np.array(value if isinstance(value, list) else [value], dtype=np.int64)
+                test = np.isin(self._derived(selected, name), wanted)
+            else:
+                column = self._id_column(table, name)
+                test = np.isin(selected[column], self._codes(table, column, value))
+            mask = test if mask is None else mask & test
+        if mask is not None:
+            selected = {c: array[mask] for c, array in selected.items()}
+        return selected
+
+    @staticmethod
+    def _derived(columns: Dict[str, np.ndarray], name: str) -> np.ndarray:
+        day = np.asarray(columns["day"], dtype=np.int64)
+        if name == "day":
+            return day
+        if name == "month":
+            return (_EPOCH + day.astype("timedelta64[D]")).astype("datetime64[M]").astype(np.int64)
+        if name == "weekday":
+            return (day + 3) % 7  # 1970-01-01 was a Thursday; 0 = Monday
+        start = np.asarray(columns["start"])
+        # times are stored as the service's local clock time (zone marked UTC), so no conversion
+        return np.where(np.isnan(start), -1, np.floor(np.nan_to_num(start) / 3600.0) % 24).astype(np.int64)
+
+    def _group_keys(self, table: str, columns: Dict[str, np.ndarray], group_by: Optional[str]) -> Tuple[np.ndarray, Any]:
+        if not group_by:
+            return np.zeros(len(columns["day"]), dtype=np.int64), None
+        if group_by in DERIVED_GROUPS:
+            return self._derived(columns, group_by), group_by
+        column = self._id_column(table, group_by)
+        return np.asarray(columns[column]), column
+
+    def _decode_keys(self, table: str, kind: Any, keys: np.ndarray) -> List[Any]:
+        if kind == "day":
+            return [_iso_day(k) for k in keys]
+        if kind == "month":
+            return [str(np.datetime64(int(k), "M")) for k in keys]
+        if kind == "weekday":
+            return [WEEKDAYS[int(k)] for k in keys]
+        if kind == "hour":
+            return [int(k) if k >= 0 else None for k in keys]
+        dictionary = self._dictionary(table, kind)
+        return [str(dictionary[k]) or None for k in keys]
+
+    # ---------- analytics ----------
+    def percentiles(
+        self,
+        table: str,
+        date_from: str,
+        date_to: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        percentiles: Sequence[float] = (50, 90),
+        order_by: str = "count",
+        descending: bool = True,
+        min_count: int = 1,
+        top: int = 20,
+    ) -> Dict[str, Any]:
+        """count / mean / min / max / percentiles of `seconds`, optionally per group."""
+        percentiles = [float(p) for p in percentiles]
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("Percentiles must be between 0 and 100")
+        columns = self._select(table, date_from, date_to, filters)
+        keys, kind = self._group_keys(table, columns, group_by)
+        groups, stats = group_stats(keys, np.asarray(columns["seconds"]), percentiles)
+        names = ["count", "mean", "min", "max", *map(_percentile_label, percentiles)]
+        if order_by not in names and order_by != "key":
+            raise ValueError(f"Unknown order_by {order_by!r}; use one of {names + ['key']}")
+
+        keep = stats["n"] >= max(1, int(min_count)) if group_by else np.ones(len(groups), dtype=bool)
+        idx = np.flatnonzero(keep)
+        if order_by != "key":
+            metric = np.nan_to_num(stats[order_by][idx].astype(np.float64), nan=-np.inf)
+            idx = idx[np.argsort(-metric if descending else metric, kind="stable")]
+        elif descending:
+            idx = idx[::-1]
+        top = max(1, min(int(top), 1000))
+        label = ID_NAMES.get(kind, kind) if kind else None
+        decoded = self._decode_keys(table, kind, groups[idx[:top]]) if kind else [None] * min(len(idx), top)
+        rows = []
+        for key, i in zip(decoded, idx[:top]):
+            row: Dict[str, Any] = {label: key} if label else {}
+            row["count"] = int(stats["count"][i])
+            row.update({name: _number(stats[name][i]) for name in names[1:]})
+            rows.append(row)
+        out: Dict[str, Any] = {
+            "table": table,
+            "period": [_iso_day(d) for d in parse_period(date_from, date_to)],
+            "metric": "seconds",
+            "rows_scanned": int(len(keys)),
+        }
+        if group_by:
+            out.update(group_by=label, groups=int(len(idx)), rows=rows, has_more=len(idx) > top)
+        else:
+            out["stats"] = rows[0] if rows else {"count": 0}
+        return out
+
+    def top_k(
+        self,
+        table: str,
+        date_from: str,
+        date_to: Optional[str] = None,
+        k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        longest: bool = True,
+    ) -> Dict[str, Any]:
+        """The k longest (or shortest) rows of the period, with their distance to the period median."""
+        columns = self._select(table, date_from, date_to, filters)
+        seconds = np.asarray(columns["seconds"])
+        valid = np.flatnonzero(~np.isnan(seconds))
+        k = max(1, min(int(k), 1000))
+        median = float(np.median(seconds[valid])) if len(valid) else None
+        score = seconds[valid] if longest else -seconds[valid]
+        if len(valid) > k:
+            part = np.argpartition(-score, k - 1)[:k]
+        else:
+            part = np.arange(len(valid))
+        chosen = valid[part[np.argsort(-score[part], kind="stable")]]
+
+        id_columns = self.meta["tables"][table]["dictionaries"]
+        rows = []
+        for i in chosen:
+            row: Dict[str, Any] = {ID_NAMES[c]: str(self._dictionary(table, c)[columns[c][i]]) or None for c in id_columns}
+            row["date"] = _iso_day(columns["day"][i])
+            row["start_time"] = _iso_time(columns["start"][i])
+            if "end" in columns:
+                row["end_time"] = _iso_time(columns["end"][i])
+            row["seconds"] = _number(seconds[i])
+            if median is not None:
+                row["delta_vs_median_seconds"] = _number(seconds[i] - median)
+                row["ratio_to_median"] = _number(seconds[i] / median) if median else None
+            rows.append(row)
+        return {
+            "table": table,
+            "period": [_iso_day(d) for d in parse_period(date_from, date_to)],
+            "rows_scanned": int(len(seconds)),
+            "median_seconds": _number(median) if median is not None else None,
+            "rows": rows,
+        }
+
+    def compare(
+        self,
+        table: str,
+        period_a: Sequence[str],
+        period_b: Sequence[str],
+        group_by: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        min_count: int = 5,
+        top: int = 5,
+    ) -> Dict[str, Any]:
+        """
+        Period A (baseline) vs period B: count, mean, median, p90 and their deltas; with
+        `group_by` also the groups whose mean changed most and the slowest groups of each period.
+        """
+        def _period(p: Sequence[str]) -> Tuple[str, Optional[str]]:
+            p = [p] if isinstance(p, str) else list(p)
+            if not 1 <= len(p) <= 2:
+                raise ValueError("A period is [date_from, date_to] or a single 'YYYY' / 'YYYY-MM' / 'YYYY-MM-DD'")
+            return p[0], (p[1] if len(p) > 1 else None)
+
+        (a_from, a_to), (b_from, b_to) = _period(period_a), _period(period_b)
+        sel_a = self._select(table, a_from, a_to, filters)
+        sel_b = self._select(table, b_from, b_to, filters)
+
+        def _totals(sel: Dict[str, np.ndarray]) -> Dict[str, Any]:
+            _, stats = group_stats(np.zeros(len(sel["day"]), dtype=np.int64), np.asarray(sel["seconds"]), (50, 90))
+            if not len(stats["count"]):
+                return {"count": 0, "mean": None, "p50": None, "p90": None}
+            return {"count": int(stats["count"][0]), **{m: _number(stats[m][0]) for m in ("mean", "p50", "p90")}}
+
+        a, b = _totals(sel_a), _totals(sel_b)
+        out: Dict[str, Any] = {
+            "table": table,
+            "period_a": [_iso_day(d) for d in parse_period(a_from, a_to)],
+            "period_b": [_iso_day(d) for d in parse_period(b_from, b_to)],
+            "a": a,
+            "b": b,
+            "delta": {
+                "count": b["count"] - a["count"],
+                **{m: (_number(b[m] - a[m]) if a[m] is not None and b[m] is not None else None)
+                   for m in ("mean", "p50", "p90")},
+            },
+        }
+        if not group_by:
+            return out
+
+        keys_a, kind = self._group_keys(table, sel_a, group_by)
+        keys_b, _ = self._group_keys(table, sel_b, group_by)
+        groups_a, stats_a = group_stats(keys_a, np.asarray(sel_a["seconds"]), ())
+        groups_b, stats_b = group_stats(keys_b, np.asarray(sel_b["seconds"]), ())
+        ok_a = stats_a["n"] >= min_count
+        ok_b = stats_b["n"] >= min_count
+        common, ia, ib = np.intersect1d(groups_a[ok_a], groups_b[ok_b], return_indices=True)
+        ia, ib = np.flatnonzero(ok_a)[ia], np.flatnonzero(ok_b)[ib]
+        delta = stats_b["mean"][ib] - stats_a["mean"][ia]
+        top = max(1, min(int(top), 100))
+        label = ID_NAMES.get(kind, kind)
+
+        def _changes(order: np.ndarray) -> List[Dict[str, Any]]:
+            names = self._decode_keys(table, kind, common[order])
+            return [
+                {label: name, "count_a": int(stats_a["count"][ia[j]]), "count_b": int(stats_b["count"][ib[j]]),
+                 "mean_a": _number(stats_a["mean"][ia[j]]), "mean_b": _number(stats_b["mean"][ib[j]]),
+                 "delta_mean": _number(delta[j])}
+                for name, j in zip(names, order)
+            ]
+
+        def _slowest(groups: np.ndarray, stats: Dict[str, np.ndarray], ok: np.ndarray) -> List[Dict[str, Any]]:
+            idx = np.flatnonzero(ok)
+            idx = idx[np.argsort(-stats["mean"][idx], kind="stable")][:top]
+            names = self._decode_keys(table, kind, groups[idx])
+            return [{label: name, "count": int(stats["count"][i]), "mean": _number(stats["mean"][i])}
+                    for name, i in zip(names, idx)]
+
+        order = np.argsort(delta, kind="stable")
+        out.update(
+            group_by=label,
+            groups_compared=int(len(common)),
+            improved=_changes(order[:top][delta[order[:top]] < 0]),
+            worsened=_changes(order[::-1][:top][delta[order[::-1][:top]] > 0]),
+            slowest_a=_slowest(groups_a, stats_a, ok_a),
+            slowest_b=_slowest(groups_b, stats_b, ok_b),
+        )
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "data_version": self.meta.get("data_version"),
+            "exported_at": self.meta.get("exported_at"),
+            "dates": self.meta.get("dates"),
+            "rows": {t: info["rows"] for t, info in self.meta["tables"].items()},
+        }
+
+
+# ------------------------------------------------------------
+# Holder (picks up a newly exported snapshot without a restart)
+# ------------------------------------------------------------
+class SnapshotStore:
+    """
+    Lazily opens the snapshot in `path` and reopens it when meta.json is replaced
+    (checked with one stat() per call).
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[AnalyticsSnapshot] = None
+        self._stamp: Any = None
+
+        self.loads = 0
+        self.queries = 0
+
+    def get(self) -> AnalyticsSnapshot:
+        try:
+            st = os.stat(os.path.join(self.path, META_FILE))
+        except OSError:
+            raise SnapshotUnavailable(
+                f"No analytics snapshot in {self.path}; export one with `python analytics_snapshot.py`"
+            ) from None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if self._snapshot is None or stamp != self._stamp:
+                self._snapshot = AnalyticsSnapshot(self.path)
+                self._stamp = stamp
+                self.loads += 1
+            self.queries += 1
+            return self._snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {"path": self.path, "loads": self.loads, "queries": self.queries}
+            if self._snapshot is not None:
+                out.update(data_version=self._snapshot.meta.get("data_version"),
+                           exported_at=self._snapshot.meta.get("exported_at"))
+            return out
+
+
+# ------------------------------------------------------------
+# CLI: export after an ETL run
+# ------------------------------------------------------------
+def main() -> None:
+    from dotenv import load_dotenv
+    from neo4j import GraphDatabase
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export the columnar analytics snapshot from Neo4j.")
+    parser.add_argument("--out", default=os.getenv("ANALYTICS_SNAPSHOT_DIR", DEFAULT_DIR))
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+    )
+    try:
+        with driver.session(database=os.getenv("NEO4J_DATABASE")) as session:
+            version = session.run("MATCH (m:EtlMeta {name: 'graph'}) RETURN m.data_version AS v").single()
+            meta = export_snapshot(session, args.out, data_version=version["v"] if version else None)
+    finally:
+        driver.close()
+    rows = ", ".join(f"{t}={info['rows']:,}" for t, info in meta["tables"].items())
+    print(f"Snapshot written to {args.out} ({rows}) in {meta['export_seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# cypher_rewriter.py
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date as _date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Rewrites for LLM-generated Cypher (read queries only)
+#
+#   date(t.date) >= date('2022-01-01')     -> t.date >= $rw_0          (Trip.date etc. are 'YYYY-MM-DD' strings)
+#   date(t.date).year = 2022              -> (t.date >= $rw_1 AND t.date < $rw_2)
+#   toString(t.route_id)                  -> t.route_id                 (route_id is stored as string)
+#   time(t.from_time) >= time('07:00')    -> datetime range on the same service day,
+#                                            only if the query pins t.date = ... and has no OR/XOR/NOT
+#   remaining string / number literals    -> parameters (plan cache hits for "same query, other values");
+#                                            var-length bounds, QPP quantifiers, SHORTEST k, LIMIT/SKIP stay
+#
+# Wrapping an indexed property in a function prevents index seeks; the raw
+# string comparison can use the range index on Trip.date.
+# ------------------------------------------------------------
+PARAM_PREFIX = "rw_"
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TIME_RE = re.compile(r"^\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?$")
+_OPS = r"(<=|>=|<>|=|<|>)"
+_FLIP = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "=": "=", "<>": "<>"}
+
+_DATE_FN_LEFT = re.compile(r"(?i)\bdate\(\s*(\w+)\.date\s*\)\s*" + _OPS + r"\s*date\(\s*\$(\w+)\s*\)")
+_DATE_FN_RIGHT = re.compile(r"(?i)\bdate\(\s*\$(\w+)\s*\)\s*" + _OPS + r"\s*date\(\s*(\w+)\.date\s*\)")
+_DATE_YEAR = re.compile(r"(?i)\bdate\(\s*(\w+)\.date\s*\)\.year\s*=\s*(\d{4})\b")
+_TO_STRING_ROUTE = re.compile(r"(?i)\btoString\(\s*(\w+)\.route_id\s*\)")
+_DATE_EQ = re.compile(r"\b(\w+)\.date\s*=\s*\$(\w+)")
+_TIME_FN = re.compile(r"(?i)\btime\(\s*(\w+)\.(from_time|to_time)\s*\)\s*" + _OPS + r"\s*time\(\s*\$(\w+)\s*\)")
+_BOOL_OPS = re.compile(r"(?i)\b(or|xor|not)\b")
+# numbers Cypher only accepts as literals (or that the planner needs to see): path pattern
+# quantifiers {1,3} / {2,} / {,5}, path selectors SHORTEST 2 / ANY 3, and LIMIT / SKIP
+_LITERAL_NUMBERS = r"\{\s*\d*\s*(?:,\s*\d*\s*)?\}|\b(?:shortest|any|limit|skip)\s+\d+\b"
+_NUMBER = re.compile(r"(?i)(" + _LITERAL_NUMBERS + r")|(?<![\w$.*])(\d+(?:\.\d+)?)(?![\w.])")
+
+_PLACEHOLDER = 0xE000  # private-use code points stand in for hidden comments/identifiers
+
+_ESCAPES = {"\\": "\\", "'": "'", '"': '"', "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class RewriteResult:
+    """Rewritten query plus everything needed to undo or inspect the rewrite."""
+
+    def __init__(
+        self,
+        original_cypher: str,
+        original_parameters: Dict[str, Any],
+        cypher: str,
+        parameters: Dict[str, Any],
+        rules: List[str],
+    ) -> None:
+        self.original_cypher = original_cypher
+        self.original_parameters = original_parameters
+        self.cypher = cypher
+        self.parameters = parameters
+        self.rules = rules
+
+    @property
+    def changed(self) -> bool:
+        return self.cypher != self.original_cypher
+
+    def restore(self) -> Tuple[str, Dict[str, Any]]:
+        """The query exactly as it came in."""
+        return self.original_cypher, self.original_parameters
+
+    def inline(self) -> str:
+        """Rewritten query with the generated parameters written back as literals (for logs/debugging)."""
+        def _sub(m: "re.Match[str]") -> str:
+            name = m.group(1)
+            if not name.startswith(PARAM_PREFIX) or name not in self.parameters:
+                return m.group(0)
+            v = self.parameters[name]
+            if isinstance(v, str):
+                return "'" + v.replace("\\", "\\\\").replace("'", "\\'") + "'"
+            return repr(v)
+
+        return re.sub(r"\$(\w+)", _sub, self.cypher)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rules": self.rules, "original": self.original_cypher, "rewritten": self.inline()}
+
+
+# ------------------------------------------------------------
+# Tokenizer: split into code and string literals (comments/backticks kept verbatim)
+# ------------------------------------------------------------
+def _split_literals(cypher: str) -> List[Tuple[str, str]]:
+    """[(kind, text)] with kind in {"code", "string"}; "string" text is the unescaped value."""
+    parts: List[Tuple[str, str]] = []
+    buf: List[str] = []
+    i, n = 0, len(cypher)
+    while i < n:
+        c = cypher[i]
+        if c in ("'", '"'):
+            j = i + 1
+            value: List[str] = []
+            while j < n and cypher[j] != c:
+                if cypher[j] == "\\" and j + 1 < n:
+                    nxt = cypher[j + 1]
+                    if nxt == "u" and j + 5 < n:
+                        value.append(chr(int(cypher[j + 2:j + 6], 16)))
+                        j += 6
+                        continue
+                    value.append(_ESCAPES.get(nxt, "\\" + nxt))
+                    j += 2
+                    continue
+                value.append(cypher[j])
+                j += 1
+            if j >= n:  # unterminated -> leave as code
+                buf.append(cypher[i:])
+                break
+            parts.append(("code", "".join(buf)))
+            buf = []
+            parts.append(("string", "".join(value)))
+            i = j + 1
+        elif c == "`":
+            j = cypher.find("`", i + 1)
+            j = n - 1 if j < 0 else j
+            buf.append(cypher[i:j + 1])
+            i = j + 1
+        elif cypher.startswith("//", i):
+            j = cypher.find("\n", i)
+            j = n if j < 0 else j
+            buf.append(cypher[i:j])
+            i = j
+        elif cypher.startswith("/*", i):
+            j = cypher.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            buf.append(cypher[i:j])
+            i = j
+        else:
+            buf.append(c)
+            i += 1
+    parts.append(("code", "".join(buf)))
+    return parts
+
+
+def _protect(code: str) -> Tuple[str, List[str]]:
+    """Hide backtick identifiers and comments from the regex rules."""
+    hidden: List[str] = []
+
+    def _hide(m: "re.Match[str]") -> str:
+        hidden.append(m.group(0))
+        return chr(_PLACEHOLDER + len(hidden) - 1)
+
+    code = re.sub(r"`[^`]*`|//[^\n]*|/\*.*?\*/", _hide, code, flags=re.S)
+    return code, hidden
+
+
+def _unprotect(code: str, hidden: List[str]) -> str:
+    return re.sub("[\ue000-\uf8ff]", lambda m: hidden[ord(m.group(0)) - _PLACEHOLDER], code)
+
+
+# ------------------------------------------------------------
+# Rewriter
+# ------------------------------------------------------------
+class _Params:
+    def __init__(self, existing: Dict[str, Any]) -> None:
+        self.values = dict(existing)
+        self._n = 0
+
+    def add(self, value: Any) -> str:
+        while f"{PARAM_PREFIX}{self._n}" in self.values:
+            self._n += 1
+        name = f"{PARAM_PREFIX}{self._n}"
+        self.values[name] = value
+        self._n += 1
+        return name
+
+
+def rewrite_cypher(cypher: str, parameters: Optional[Dict[str, Any]] = None) -> RewriteResult:
+    """Apply the index-friendly rewrites and literal parameterization (see module comment)."""
+    original_params = dict(parameters or {})
+    params = _Params(original_params)
+    rules: List[str] = []
+
+    # 1) string literals -> parameters
+    code_parts: List[str] = []
+    for kind, text in _split_literals(cypher):
+        if kind == "string":
+            code_parts.append("$" + params.add(text))
+        else:
+            code_parts.append(text)
+    code, hidden = _protect("".join(code_parts))
+    if len(params.values) > len(original_params):
+        rules.append("string_literals")
+
+    def _is_date_param(name: str) -> bool:
+        v = params.values.get(name)
+        return isinstance(v, str) and bool(_DATE_RE.match(v))
+
+    # 2) date(x.date) OP date('YYYY-MM-DD') -> x.date OP $p
+    def _date_left(m: "re.Match[str]") -> str:
+        var, op, p = m.group(1), m.group(2), m.group(3)
+        return f"{var}.date {op} ${p}" if _is_date_param(p) else m.group(0)
+
+    def _date_right(m: "re.Match[str]") -> str:
+        p, op, var = m.group(1), m.group(2), m.group(3)
+        return f"{var}.date {_FLIP[op]} ${p}" if _is_date_param(p) else m.group(0)
+
+    new = _DATE_FN_RIGHT.sub(_date_right, _DATE_FN_LEFT.sub(_date_left, code))
+    if new != code:
+        rules.append("date_function_to_string_compare")
+        code = new
+
+    # 3) date(x.date).year = YYYY -> string range
+    def _year(m: "re.Match[str]") -> str:
+        var, year = m.group(1), int(m.group(2))
+        lo = params.add(f"{year:04d}-01-01")
+        hi = params.add(f"{year + 1:04d}-01-01")
+        return f"({var}.date >= ${lo} AND {var}.date < ${hi})"
+
+    new = _DATE_YEAR.sub(_year, code)
+    if new != code:
+        rules.append("date_year_to_range")
+        code = new
+
+    # 4) toString(x.route_id) -> x.route_id
+    new = _TO_STRING_ROUTE.sub(lambda m: f"{m.group(1)}.route_id", code)
+    if new != code:
+        rules.append("drop_tostring_route_id")
+        code = new
+
+    # 5) time(x.from_time) OP time('HH:MM') -> datetime range on the pinned service day
+    if not _BOOL_OPS.search(code):
+        pinned: Dict[str, Optional[str]] = {}
+        for m in _DATE_EQ.finditer(code):
+            var, p = m.group(1), m.group(2)
+            value = params.values.get(p) if _is_date_param(p) else None
+            pinned[var] = value if pinned.get(var, value) == value else None  # conflicting dates -> skip
+
+        # a lower and an upper bound on the same field already stay within the day
+        bounds: Dict[Tuple[str, str], set] = {}
+        for m in _TIME_FN.finditer(code):
+            bounds.setdefault((m.group(1), m.group(2)), set()).add(m.group(3)[0])
+
+        def _time(m: "re.Match[str]") -> str:
+            var, prop, op, p = m.group(1), m.group(2), m.group(3), m.group(4)
+            day = pinned.get(var)
+            t = params.values.get(p)
+            if not day or not isinstance(t, str) or not _TIME_RE.match(t) or op in ("=", "<>"):
+                return m.group(0)
+            field = f"{var}.{prop}"
+            at = params.add(f"{day}T{t}")
+            if bounds[(var, prop)] >= {"<", ">"}:
+                return f"{field} {op} datetime(${at})"
+            if op in (">", ">="):
+                end = params.add((_date.fromisoformat(day) + timedelta(days=1)).isoformat() + "T00:00")
+                return f"{field} {op} datetime(${at}) AND {field} < datetime(${end})"
+            start = params.add(f"{day}T00:00")
+            return f"{field} >= datetime(${start}) AND {field} {op} datetime(${at})"
+
+        new = _TIME_FN.sub(_time, code)
+        if new != code:
+            rules.append("time_function_to_datetime_range")
+            code = new
+
+    # 6) remaining number literals -> parameters (not inside var-length bounds like *1..3,
+    #    quantifiers like {1,3}, SHORTEST 2 or LIMIT 10)
+    def _number(m: "re.Match[str]") -> str:
+        if m.group(1):
+            return m.group(0)
+        text = m.group(2)
+        return "$" + params.add(float(text) if "." in text else int(text))
+
+    new = _NUMBER.sub(_number, code)
+    if new != code:
+        rules.append("number_literals")
+        code = new
+
+    rewritten = _unprotect(code, hidden)
+    used = set(re.findall(r"\$(\w+)", code))
+    final_params = {k: v for k, v in params.values.items() if k in original_params or k in used}
+    result = RewriteResult(cypher, original_params, rewritten, final_params, rules)
+    if result.changed:
+        logger.info("cypher rewrite %s", ",".join(rules))
+        logger.debug("cypher rewrite\n  before: %s\n  after:  %s", cypher, result.inline())
+    return result
@@ -0,0 +1,208 @@
+# metrics.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# ------------------------------------------------------------
+# Minimal Prometheus text-format registry (no extra dependency)
+# ------------------------------------------------------------
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, value: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {_num(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> ([count per bucket] + [+Inf], sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = 'le="%s"' % _num(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+                cumulative += counts[-1]
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, inf)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class _Callback:
+    """Value read at scrape time (e.g. counters kept by the cache)."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Optional[float]], kind: str) -> None:
+        self.name, self.help, self.fn, self.kind = name, help, fn, kind
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {_num(value)}"]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name: str, help: str, fn: Callable[[], Optional[float]], kind: str = "gauge") -> None:
+        self._metrics.append(_Callback(name, help, fn, kind))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ------------------------------------------------------------
+# Tool calls (server.py) and Neo4j executions (neo4j_tools_core.py)
+# ------------------------------------------------------------
+TOOL_CALLS = REGISTRY.counter("mcp_tool_calls_total", "MCP tool calls by outcome (ok, rejected, error).", ("tool", "status"))
+TOOL_SECONDS = REGISTRY.histogram("mcp_tool_duration_seconds", "Wall time of an MCP tool call.", ("tool",))
+TOOL_ROWS = REGISTRY.histogram("mcp_tool_rows", "Rows returned by an MCP tool call.", ("tool",), ROW_BUCKETS)
+TOOL_BYTES = REGISTRY.histogram("mcp_tool_response_bytes", "JSON size of an MCP tool result (estimated from sampled rows).", ("tool",), BYTE_BUCKETS)
+TOOL_SERIALIZE_SECONDS = REGISTRY.histogram(
+    "mcp_tool_serialize_seconds", "Time to JSON-encode a tool result (every METRICS_SERIALIZE_SAMPLE_EVERY-th call).", ("tool",)
+)
+
+# The size of a result is estimated from a few of its rows, so the hot path does not
+# encode every result a second time; a full encode is timed only every N-th call.
+METRICS_SIZE_SAMPLE_ROWS = int(os.getenv("METRICS_SIZE_SAMPLE_ROWS", "16"))
+METRICS_SERIALIZE_SAMPLE_EVERY = int(os.getenv("METRICS_SERIALIZE_SAMPLE_EVERY", "50"))  # 0 = never
+
+NEO4J_QUERIES = REGISTRY.counter("neo4j_queries_total", "Queries executed against Neo4j (cache and single-flight hits excluded).")
+NEO4J_CLIENT_SECONDS = REGISTRY.histogram(
+    "neo4j_query_client_seconds", "Client wall time of a query: send, fetch and convert rows."
+)
+NEO4J_SERVER_SECONDS = REGISTRY.histogram(
+    "neo4j_query_server_seconds",
+    "Neo4j ResultSummary timings: available = until the first record, consumed = streaming the rest.",
+    ("phase",),
+)
+
+
+def observe_summary(summary: Any) -> None:
+    """Record result_available_after / result_consumed_after (milliseconds) of a ResultSummary."""
+    for phase, attr in (("available", "result_available_after"), ("consumed", "result_consumed_after")):
+        ms = getattr(summary, attr, None)
+        if ms is not None:
+            NEO4J_SERVER_SECONDS.observe(ms / 1000.0, phase=phase)
+
+
+def count_rows(result: Any) -> int:
+    """Rows handed to the agent (plain rows, compact formats, pages, result-handle previews, run_queries batches)."""
+    if isinstance(result, list):
+        return len(result)
+    if not isinstance(result, dict):
+        return 0
+    if isinstance(result.get("results"), dict):
+        return sum(r.get("row_count", 0) for r in result["results"].values() if isinstance(r, dict))
+    for key in ("rows", "data", "preview"):
+        if isinstance(result.get(key), list):
+            return len(result[key])
+    return 0
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+def estimate_json_bytes(value: Any, sample_rows: int = METRICS_SIZE_SAMPLE_ROWS) -> int:
+    """Compact JSON size of `value`; lists longer than `sample_rows` are extrapolated from evenly spaced rows."""
+    if isinstance(value, dict):
+        if not value:
+            return 2
+        return 1 + 2 * len(value) + sum(_json_size(str(k)) + estimate_json_bytes(v, sample_rows) for k, v in value.items())
+    if isinstance(value, list) and len(value) > sample_rows > 0:
+        step = len(value) / sample_rows
+        picked = [value[int(i * step)] for i in range(sample_rows)]
+        return 1 + round((_json_size(picked) - 1) * len(value) / sample_rows)
+    return _json_size(value)
+
+
+_tool_results = 0
+
+
+def observe_tool(tool: str, status: str, seconds: float, result: Any = None) -> None:
+    global _tool_results
+    TOOL_CALLS.inc(tool=tool, status=status)
+    TOOL_SECONDS.observe(seconds, tool=tool)
+    if result is None:
+        return
+    _tool_results += 1
+    if METRICS_SERIALIZE_SAMPLE_EVERY > 0 and _tool_results % METRICS_SERIALIZE_SAMPLE_EVERY == 0:
+        t0 = time.perf_counter()
+        size = _json_size(result)
+        TOOL_SERIALIZE_SECONDS.observe(time.perf_counter() - t0, tool=tool)
+    else:
+        size = estimate_json_bytes(result)
+    TOOL_BYTES.observe(size, tool=tool)
+    TOOL_ROWS.observe(count_rows(result), tool=tool)
@@ -1,12 +1,28 @@
 # neo4j_tools_core.py
 from __future__ import annotations
 
+import asyncio
 import os
 import re
-from typing import Any, Dict, List, Optional
+import time
+from datetime import date, time as dt_time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from neo4j import GraphDatabase, Driver
+from neo4j import READ_ACCESS, AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase, Query, unit_of_work
+from neo4j.exceptions import DriverError, Neo4jError
+from neo4j.graph import Node, Path, Relationship
+from neo4j.spatial import Point
+from neo4j.time import Date, DateTime, Time
+
+from analytics_snapshot import DEFAULT_DIR as DEFAULT_SNAPSHOT_DIR, SnapshotStore
+from cypher_rewriter import rewrite_cypher
+from metrics import NEO4J_CLIENT_SECONDS, NEO4J_QUERIES, observe_summary
+from query_cache import QueryResultCache, SingleFlight, is_read_only, make_key
+from query_cursors import CursorRegistry
+from query_guard import QueryPlanGuard, QueryRejected, TenantLimiter, timed_out
+from result_store import ResultStore
+from schema_introspection import SchemaCache, introspect, summarize
 
 # ============================================================
 # ENV / Neo4j (shared)
@@ -18,60 +34,456 @@ NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "movies")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "movies")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE")  # optional
 
+# Connection pool / fetch tuning (shared by the sync and the async driver)
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+NEO4J_READ_ROUTING = os.getenv("NEO4J_READ_ROUTING", "true").lower() in ("1", "true", "yes")
+NEO4J_WARMUP_CONNECTIONS = int(os.getenv("NEO4J_WARMUP_CONNECTIONS", "4"))
+
+_DRIVER_CONFIG: Dict[str, Any] = {
+    "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+    "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+}
+
 _driver: Driver = GraphDatabase.driver(
     NEO4J_URI,
     auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
+    **_DRIVER_CONFIG,
 )
 
 
+def _session_kwargs() -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"fetch_size": NEO4J_FETCH_SIZE}
+    if NEO4J_DATABASE:
+        kwargs["database"] = NEO4J_DATABASE
+    return kwargs
+
+
+# Optional stand-ins for the driver sessions (Benchmarking/ replays recorded results offline)
+_session_factory: Optional[Callable[..., Any]] = None
+_async_session_factory: Optional[Callable[..., Any]] = None
+
+
+def set_session_factories(
+    sync_factory: Optional[Callable[..., Any]] = None,
+    async_factory: Optional[Callable[..., Any]] = None,
+) -> None:
+    """Route get_session()/get_async_session() through the given factories (None = real driver)."""
+    global _session_factory, _async_session_factory
+    _session_factory = sync_factory
+    _async_session_factory = async_factory
+
+
 def get_session():
     """Return a Neo4j session (respects NEO4J_DATABASE if provided)."""
-    if NEO4J_DATABASE:
-        return _driver.session(database=NEO4J_DATABASE)
-    return _driver.session()
+    if _session_factory is not None:
+        return _session_factory()
+    return _driver.session(**_session_kwargs())
+
+
+# The async driver is bound to the event loop it is first used in,
+# so it is created lazily inside the server's loop.
+_async_driver: Optional[AsyncDriver] = None
+
+
+def get_async_driver() -> AsyncDriver:
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
+            **_DRIVER_CONFIG,
+        )
+    return _async_driver
+
+
+def get_async_session(**overrides: Any):
+    """Return an async Neo4j session (respects NEO4J_DATABASE if provided)."""
+    if _async_session_factory is not None:
+        return _async_session_factory(**overrides)
+    return get_async_driver().session(**{**_session_kwargs(), **overrides})
+
+
+async def warm_up_async(connections: int = NEO4J_WARMUP_CONNECTIONS) -> None:
+    """Verify connectivity and open a few pooled connections before the first request."""
+    driver = get_async_driver()
+    await driver.verify_connectivity()
+
+    async def _ping() -> None:
+        async with get_async_session() as session:
+            result = await session.run("RETURN 1")
+            await result.consume()
+
+    await asyncio.gather(*(_ping() for _ in range(max(0, connections))))
+
+
+# Index-aware rewrite of read queries (see cypher_rewriter.py)
+CYPHER_REWRITE_ENABLED = os.getenv("CYPHER_REWRITE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+# ------------------------------------------------------------
+# Cost guard (EXPLAIN pre-flight), transaction timeouts, per-tenant budget
+# ------------------------------------------------------------
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+QUERY_CURSOR_TIMEOUT_SECONDS = float(os.getenv("QUERY_CURSOR_TIMEOUT_SECONDS", "300"))
+
+query_guard = QueryPlanGuard(
+    max_estimated_rows=float(os.getenv("QUERY_GUARD_MAX_ESTIMATED_ROWS", "5000000")),
+    max_depth=int(os.getenv("QUERY_GUARD_MAX_PLAN_DEPTH", "40")),
+    blocked_label_scans=[l.strip() for l in os.getenv("QUERY_GUARD_BLOCKED_LABEL_SCANS", "Trip").split(",") if l.strip()],
+)
+
+tenant_limiter = TenantLimiter(
+    max_concurrent=int(os.getenv("TENANT_MAX_CONCURRENT_CALLS", "4")),
+    wait_seconds=float(os.getenv("TENANT_QUEUE_WAIT_SECONDS", "10")),
+    untagged_max_concurrent=int(os.getenv("UNTAGGED_MAX_CONCURRENT_CALLS", "32")),
+    max_tenants=int(os.getenv("TENANT_MAX_TRACKED", "1000")),
+)
+
+_UNGUARDED_RE = re.compile(r"(?i)\s*(explain|profile|show|cypher)\b")
+
+
+def _needs_guard(cypher: str, guard: bool) -> bool:
+    return guard and QUERY_GUARD_ENABLED and is_read_only(cypher) and _UNGUARDED_RE.match(cypher) is None
+
+
+def _reject_writes(cypher: str) -> None:
+    """With read routing the query runs in a read transaction; refuse writes before they reach Neo4j."""
+    if NEO4J_READ_ROUTING and not is_read_only(cypher):
+        raise QueryRejected(
+            "read_only",
+            "run_query ist nur lesend (NEO4J_READ_ROUTING=true): CREATE/MERGE/SET/DELETE/REMOVE usw. "
+            "werden nicht ausgeführt. Bitte nur MATCH/RETURN-Abfragen verwenden.",
+        )
+
+
+def guard_query(runner: Any, cypher: str, params: Dict[str, Any]) -> None:
+    """EXPLAIN the query on `runner` (session or transaction); raises QueryRejected if it is too expensive."""
+    reasons = query_guard.cached(cypher)
+    if reasons is None:
+        summary = runner.run("EXPLAIN " + cypher, params).consume()
+        reasons = query_guard.check(cypher, summary.plan)
+    query_guard.enforce(reasons)
+
+
+async def guard_query_async(runner: Any, cypher: str, params: Dict[str, Any]) -> None:
+    reasons = query_guard.cached(cypher)
+    if reasons is None:
+        result = await runner.run("EXPLAIN " + cypher, params)
+        summary = await result.consume()
+        reasons = query_guard.check(cypher, summary.plan)
+    query_guard.enforce(reasons)
+
+
+def _is_timeout(exc: Neo4jError) -> bool:
+    return "TransactionTimedOut" in (exc.code or "")
+
+
+# ------------------------------------------------------------
+# Result cache (invalidated when the ETL bumps the data version)
+# ------------------------------------------------------------
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+DATA_VERSION_CYPHER = "MATCH (m:EtlMeta {name: 'graph'}) RETURN m.data_version AS version"
+
+
+def get_data_version() -> Any:
+    """Graph data version written by the ETL (None if the ETL never ran)."""
+    with get_session() as session:
+        record = session.run(DATA_VERSION_CYPHER).single()
+        return record["version"] if record else None
+
+
+async def get_data_version_async() -> Any:
+    async with get_async_session() as session:
+        result = await session.run(DATA_VERSION_CYPHER)
+        record = await result.single()
+        return record["version"] if record else None
+
+
+result_cache = QueryResultCache(
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "600")),
+    version_check_seconds=float(os.getenv("QUERY_CACHE_VERSION_CHECK_SECONDS", "30")),
+)
+
+
+# Identical read queries running at the same time share one execution
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+single_flight = SingleFlight()
+
+
+def _flight_key(cypher: str, params: Dict[str, Any], limit: int, key: Any, guard: bool) -> Any:
+    if not SINGLE_FLIGHT_ENABLED or not is_read_only(cypher):
+        return None
+    return (key or make_key(cypher, params, limit), guard)
+
+
+def refresh_data_version() -> None:
+    if result_cache.version_check_due():
+        try:
+            result_cache.set_data_version(get_data_version())
+        except Exception:
+            # DB not reachable -> keep serving cached rows until their TTL runs out
+            pass
+
+
+async def refresh_data_version_async() -> None:
+    if result_cache.version_check_due():
+        try:
+            result_cache.set_data_version(await get_data_version_async())
+        except Exception:
+            pass
 
 
 # ------------------------------------------------------------
 # JSON-safe conversion (Neo4j temporal etc.)
 # ------------------------------------------------------------
+# One converter per concrete type, resolved on first sight and cached, so the
+# per-value cost is a dict lookup + call instead of isinstance/hasattr chains.
+# Output matches the former `to_json(record.data())`:
+#   Node -> properties, Relationship -> [start, type, end], Path -> [node, type, node, ...],
+#   Point -> [x, y(, z)], temporal -> ISO string.
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {}
+
+
 def to_json(v: Any) -> Any:
-    if v is None or isinstance(v, (str, int, float, bool)):
-        return v
-    if isinstance(v, (list, tuple)):
-        return [to_json(x) for x in v]
-    if isinstance(v, dict):
-        return {k: to_json(val) for k, val in v.items()}
-
-    # neo4j.time.* often provides iso_format()
+    conv = _CONVERTERS.get(type(v))
+    if conv is None:
+        conv = _resolve_converter(type(v))
+    return conv(v)
+
+
+def record_to_json(record) -> Dict[str, Any]:
+    """Convert a whole neo4j Record (no intermediate `record.data()` dict)."""
+    get = _CONVERTERS.get
+    out: Dict[str, Any] = {}
+    for k, v in zip(record.keys(), record):
+        conv = get(type(v))
+        if conv is None:
+            conv = _resolve_converter(type(v))
+        out[k] = conv(v)
+    return out
+
+
+def _identity(v: Any) -> Any:
+    return v
+
+
+def _iso_format(v: Any) -> Any:
+    return v.iso_format()
+
+
+def _isoformat(v: Any) -> Any:
+    return v.isoformat()
+
+
+def _datetime_iso(v: Any) -> Any:
+    # same string as DateTime.iso_format(), built in one %-format (about 1.6x faster)
+    s = "%04d-%02d-%02dT%02d:%02d:%02d.%09d" % (
+        v.year, v.month, v.day, v.hour, v.minute, v.second, v.nanosecond,
+    )
+    off = v.utcoffset()
+    if off is None:
+        return s
+    secs = off.days * 86400 + off.seconds
+    if secs < 0 or secs % 60 or off.microseconds:
+        # rare offsets: leave the exact formatting to the driver
+        return v.iso_format()
+    return s + "+%02d:%02d" % (secs // 3600, secs % 3600 // 60)
+
+
+def _sequence(v: Any) -> List[Any]:
+    get = _CONVERTERS.get
+    out = []
+    for x in v:
+        conv = get(type(x))
+        out.append(x if conv is _identity else to_json(x))
+    return out
+
+
+def _mapping(v: Any) -> Dict[str, Any]:
+    get = _CONVERTERS.get
+    out = {}
+    for k, x in v.items():
+        conv = get(type(x))
+        out[k] = x if conv is _identity else to_json(x)
+    return out
+
+
+def _node(v: Any) -> Dict[str, Any]:
+    return _mapping(v)
+
+
+def _relationship(v: Any) -> List[Any]:
+    return [_mapping(v.start_node), type(v).__name__, _mapping(v.end_node)]
+
+
+def _path(v: Any) -> List[Any]:
+    nodes = v.nodes
+    out: List[Any] = [_mapping(nodes[0])]
+    for i, rel in enumerate(v.relationships):
+        out.append(type(rel).__name__)
+        out.append(_mapping(nodes[i + 1]))
+    return out
+
+
+def _point(v: Any) -> List[Any]:
+    return list(v)
+
+
+def _fallback(v: Any) -> Any:
+    # unknown types: same best-effort chain as before, without caching a fast path
     if hasattr(v, "iso_format") and callable(getattr(v, "iso_format")):
         try:
             return v.iso_format()
         except Exception:
             pass
-
-    # python datetime/date/time
     if hasattr(v, "isoformat") and callable(getattr(v, "isoformat")):
         try:
             return v.isoformat()
         except Exception:
             pass
-
-    # Neo4j Record / Node etc.
     try:
         return to_json(dict(v))
     except Exception:
         return str(v)
 
 
+def _resolve_converter(t: type) -> Callable[[Any], Any]:
+    conv: Callable[[Any], Any]
+    if t is type(None) or issubclass(t, (str, int, float, bool)):
+        conv = _identity
+    elif issubclass(t, Node):
+        conv = _node
+    elif issubclass(t, Relationship):
+        conv = _relationship
+    elif issubclass(t, Path):
+        conv = _path
+    elif issubclass(t, Point):
+        conv = _point
+    elif issubclass(t, DateTime):
+        conv = _datetime_iso
+    elif issubclass(t, (Date, Time)):
+        conv = _iso_format
+    elif issubclass(t, (date, dt_time)):  # datetime is a subclass of date
+        conv = _isoformat
+    elif issubclass(t, timedelta):
+        conv = str
+    elif issubclass(t, (list, tuple)):
+        conv = _sequence
+    elif issubclass(t, dict):
+        conv = _mapping
+    else:
+        conv = _fallback
+    _CONVERTERS[t] = conv
+    return conv
+
+
 def records_to_list(result, limit: int) -> List[Dict[str, Any]]:
     rows: List[Dict[str, Any]] = []
     for i, record in enumerate(result):
         if i >= limit:
             break
-        rows.append(to_json(record.data()))
+        rows.append(record_to_json(record))
+    return rows
+
+
+async def records_to_list_async(result, limit: int) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    async for record in result:
+        if len(rows) >= limit:
+            break
+        rows.append(record_to_json(record))
     return rows
 
 
+# ------------------------------------------------------------
+# Compact response formats (opt-in via run_query(format=...))
+# ------------------------------------------------------------
+RESULT_FORMATS = ("rows", "columnar", "dict")
+
+_ZERO_FRACTION_UTC_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.0+)?(?:\+00:00|Z)$")
+
+
+def _compact_value(v: Any) -> Any:
+    # '2022-03-17T07:38:00.000000000+00:00' -> '2022-03-17T07:38:00Z'
+    if isinstance(v, str) and len(v) >= 20 and v[10:11] == "T":
+        m = _ZERO_FRACTION_UTC_RE.match(v)
+        if m:
+            return m.group(1) + "Z"
+    return v
+
+
+def encode_rows(
+    rows: List[Dict[str, Any]],
+    fmt: str = "rows",
+    columns: Optional[List[str]] = None,
+) -> Any:
+    """
+    Re-shape JSON-safe rows into a compact layout.
+
+    - "rows":     unchanged list of dicts
+    - "columnar": {"format", "columns", "data": [[...], ...]}
+    - "dict":     columnar + repeated string columns replaced by indices into
+                  {"dictionaries": {column: [distinct values]}}
+    Temporal strings without fractional seconds in UTC are shortened in both compact formats.
+    """
+    if fmt == "rows":
+        return rows
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {RESULT_FORMATS}")
+
+    if columns is None:
+        columns = []
+        seen = set()
+        for row in rows:
+            for k in row:
+                if k not in seen:
+                    seen.add(k)
+                    columns.append(k)
+
+    data = [[_compact_value(row.get(c)) for c in columns] for row in rows]
+    out: Dict[str, Any] = {"format": fmt, "columns": columns, "data": data}
+    if fmt == "columnar":
+        return out
+
+    dictionaries: Dict[str, List[str]] = {}
+    for j, col in enumerate(columns):
+        values = [r[j] for r in data]
+        if not values or not all(v is None or isinstance(v, str) for v in values):
+            continue
+        distinct = list(dict.fromkeys(v for v in values if v is not None))
+        if len(distinct) * 2 > len(values):
+            continue  # not repetitive enough to pay off
+        index = {v: i for i, v in enumerate(distinct)}
+        for r in data:
+            if r[j] is not None:
+                r[j] = index[r[j]]
+        dictionaries[col] = distinct
+    out["dictionaries"] = dictionaries
+    return out
+
+
+def encode_page(page: Dict[str, Any], fmt: str = "rows") -> Dict[str, Any]:
+    """Apply `encode_rows` to a cursor page (keeps cursor/offset/has_more)."""
+    if fmt == "rows":
+        return page
+    encoded = encode_rows(page["rows"], fmt, columns=page["columns"])
+    meta = {k: v for k, v in page.items() if k not in ("rows", "columns")}
+    return {**encoded, **meta}
+
+
+def encode_summary(summary: Dict[str, Any], fmt: str = "rows") -> Dict[str, Any]:
+    """Apply `encode_rows` to the preview of a result-handle summary."""
+    if fmt == "rows":
+        return summary
+    return {**summary, "preview": encode_rows(summary["preview"], fmt, columns=summary["columns"])}
+
+
 # ============================================================
 # Core functionality (shared by MCP + LangChain)
 # ============================================================
@@ -80,7 +492,7 @@ def get_schema_core() -> Dict[str, Any]:
     """Static schema description (no Neo4j call)."""
     return {
         "nodes": {
-            "Stop": ["stop_id", "lau", "geometry_wkt"],
+            "Stop": ["stop_id", "lau", "geometry_wkt", "location"],
             "Route": [
                 "route_id", "line", "lau",
                 "trip_sample_count",
@@ -91,7 +503,7 @@ def get_schema_core() -> Dict[str, Any]:
                 "trip_id", "date", "line", "route_id", "lau",
                 "from_time", "to_time", "travel_time_seconds",
             ],
-            "TravelSegment": ["segment_id", "from_stop_id", "to_stop_id", "lau"],
+            "TravelSegment": ["segment_id", "from_stop_id", "to_stop_id", "lau", "length_m"],
         },
         "relationships": {
             "HAS_TRIP": "(:Route)-[:HAS_TRIP]->(:Trip)",
@@ -106,28 +518,713 @@ def get_schema_core() -> Dict[str, Any]:
             "TravelSegment ist global: segment_id = 'from_stop_id|to_stop_id'.",
             "Trip ist eindeutig über (trip_id, date).",
             "Events: DWELL_AT(dwell_time_seconds), TRAVELS_ON(travel_time_seconds).",
-            "Aggregates: SERVES(mean_dwell_time_seconds), HAS_SEGMENT(segment_mean_travel_time_seconds).",
+            "Aggregates: SERVES(mean_dwell_time_seconds), HAS_SEGMENT(segment_mean_travel_time_seconds, "
+            "segment_mean_speed_mps).",
+            "Stop.location ist ein WGS-84 point (Point-Index): point.distance(s.location, point({latitude: $lat, "
+            "longitude: $lon})) < $m bzw. point.withinBBox(...) nutzen den Index. "
+            "TravelSegment.length_m = Luftlinie zwischen den Stops in Metern.",
         ],
     }
 
 
+# Live schema: introspected once per data version (see schema_introspection.py)
+SCHEMA_INTROSPECTION_ENABLED = os.getenv("SCHEMA_INTROSPECTION_ENABLED", "true").lower() in ("1", "true", "yes")
+schema_cache = SchemaCache(ttl_seconds=float(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "3600")))
+
+
+async def get_live_schema_core_async() -> Dict[str, Any]:
+    """
+    Schema summary of the live database: labels with counts and property types,
+    relationship patterns, indexes/constraints, Trip date range, top lines/routes and
+    index-usage hints. Cached until the ETL bumps the data version; falls back to
+    `get_schema_core()` if introspection is disabled or fails.
+    """
+    static = get_schema_core()
+    if not SCHEMA_INTROSPECTION_ENABLED:
+        return {**static, "source": "static"}
+    await refresh_data_version_async()
+    version = result_cache.data_version
+
+    async def _build() -> Dict[str, Any]:
+        overrides: Dict[str, Any] = {"default_access_mode": READ_ACCESS} if NEO4J_READ_ROUTING else {}
+        async with get_async_session(**overrides) as session:
+            async def _run(cypher: str, params: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                result = await session.run(Query(cypher, timeout=QUERY_TIMEOUT_SECONDS), params or {})
+                return await result.data()
+
+            facts = await introspect(_run)
+        return {**summarize(facts, static["notes"]), "source": "live", "data_version": version}
+
+    try:
+        return await schema_cache.get(version, _build)
+    except Exception:
+        return {**static, "source": "static"}
+
+
 def run_query_core(
     cypher: str,
     parameters: Optional[Dict[str, Any]] = None,
     limit: int = 100,
     enforce_limit: bool = True,
+    use_cache: bool = True,
+    rewrite: bool = True,
+    guard: bool = True,
 ) -> List[Dict[str, Any]]:
-    """Execute a Cypher query and return JSON-safe rows."""
-    params = parameters or {}
+    """
+    Execute a Cypher query and return JSON-safe rows (read queries go through the result cache).
+    Concurrent identical read queries share one execution (single-flight).
+    Raises QueryRejected if the EXPLAIN pre-flight rejects the query or it runs into the timeout.
+    """
+    cypher, params, key = _prepare_query(cypher, parameters or {}, limit, enforce_limit, use_cache, rewrite)
+    if key is not None:
+        refresh_data_version()
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def _execute() -> List[Dict[str, Any]]:
+        with get_session() as session:
+            if _needs_guard(cypher, guard):
+                guard_query(session, cypher, params)
+            t0 = time.perf_counter()
+            try:
+                result = session.run(Query(cypher, timeout=QUERY_TIMEOUT_SECONDS), params)
+                rows = records_to_list(result, int(limit))
+                observe_summary(result.consume())
+            except Neo4jError as exc:
+                if _is_timeout(exc):
+                    raise timed_out(QUERY_TIMEOUT_SECONDS) from exc
+                raise
+            _observe_client(t0)
+        if key is not None:
+            result_cache.put(key, rows)
+        return rows
+
+    flight = _flight_key(cypher, params, limit, key, guard)
+    return _execute() if flight is None else single_flight.do(flight, _execute)
+
 
+async def run_query_core_async(
+    cypher: str,
+    parameters: Optional[Dict[str, Any]] = None,
+    limit: int = 100,
+    enforce_limit: bool = True,
+    use_cache: bool = True,
+    rewrite: bool = True,
+    guard: bool = True,
+    max_limit: int = 1000,
+) -> List[Dict[str, Any]]:
+    """
+    Async variant of `run_query_core` on the pooled async driver (used by the MCP server).
+    With NEO4J_READ_ROUTING write queries are rejected up front (QueryRejected "read_only").
+    `max_limit` caps the LIMIT added by `enforce_limit`.
+    """
+    _reject_writes(cypher)
+    cypher, params, key = _prepare_query(cypher, parameters or {}, limit, enforce_limit, use_cache, rewrite, max_limit)
+    if key is not None:
+        await refresh_data_version_async()
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def _execute() -> List[Dict[str, Any]]:
+        checked = _needs_guard(cypher, guard)
+        t0 = time.perf_counter()
+        try:
+            async with get_async_session() as session:
+                if NEO4J_READ_ROUTING:
+                    # managed read transaction: routed to readers in a cluster, retried on transient errors
+                    rows = await session.execute_read(_read_rows_async, cypher, params, int(limit), checked)
+                else:
+                    if checked:
+                        await guard_query_async(session, cypher, params)
+                    result = await session.run(Query(cypher, timeout=QUERY_TIMEOUT_SECONDS), params)
+                    rows = await records_to_list_async(result, int(limit))
+                    observe_summary(await result.consume())
+        except Neo4jError as exc:
+            if _is_timeout(exc):
+                raise timed_out(QUERY_TIMEOUT_SECONDS) from exc
+            raise
+        _observe_client(t0)
+        if key is not None:
+            result_cache.put(key, rows)
+        return rows
+
+    flight = _flight_key(cypher, params, limit, key, guard)
+    return await (_execute() if flight is None else single_flight.do_async(flight, _execute))
+
+
+@unit_of_work(timeout=QUERY_TIMEOUT_SECONDS)
+async def _read_rows_async(tx, cypher: str, params: Dict[str, Any], limit: int, guard: bool = False) -> List[Dict[str, Any]]:
+    if guard:
+        await guard_query_async(tx, cypher, params)
+    result = await tx.run(cypher, params)
+    rows = await records_to_list_async(result, limit)
+    observe_summary(await result.consume())
+    return rows
+
+
+def _observe_client(started: float) -> None:
+    NEO4J_QUERIES.inc()
+    NEO4J_CLIENT_SECONDS.observe(time.perf_counter() - started)
+
+
+# ------------------------------------------------------------
+# Batched statements (run_queries)
+# ------------------------------------------------------------
+RUN_QUERIES_MAX_STATEMENTS = int(os.getenv("RUN_QUERIES_MAX_STATEMENTS", "10"))
+RUN_QUERIES_MAX_CONCURRENCY = int(os.getenv("RUN_QUERIES_MAX_CONCURRENCY", "4"))
+
+
+class _TransactionAborted(Exception):
+    def __init__(self, results: List[Dict[str, Any]]) -> None:
+        super().__init__("transaction aborted")
+        self.results = results
+
+
+def _statement_error(exc: BaseException) -> Dict[str, Any]:
+    if isinstance(exc, QueryRejected):
+        return exc.to_dict()
+    if isinstance(exc, Neo4jError):
+        if _is_timeout(exc):
+            return timed_out(QUERY_TIMEOUT_SECONDS).to_dict()
+        return {"error": "cypher_error", "message": exc.message or str(exc), "code": exc.code}
+    return {"error": type(exc).__name__, "message": str(exc)}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _statement_list(statements: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Validate named statements; missing names become q1, q2, ... (raises ValueError)."""
+    if not statements:
+        raise ValueError("statements is empty")
+    if len(statements) > RUN_QUERIES_MAX_STATEMENTS:
+        raise ValueError(f"at most {RUN_QUERIES_MAX_STATEMENTS} statements per call")
+    items: List[Dict[str, Any]] = []
+    for i, st in enumerate(statements, 1):
+        cypher = st.get("cypher") if isinstance(st, dict) else None
+        if not isinstance(cypher, str) or not cypher.strip():
+            raise ValueError(f"statement {i} has no cypher")
+        name = str(st.get("name") or f"q{i}")
+        if any(item["name"] == name for item in items):
+            raise ValueError(f"duplicate statement name {name!r}")
+        items.append({
+            "name": name,
+            "cypher": cypher,
+            "parameters": st.get("parameters") or {},
+            "limit": int(st.get("limit") or limit),
+        })
+    return items
+
+
+async def run_queries_core_async(
+    statements: List[Dict[str, Any]],
+    limit: int = 100,
+    snapshot: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run several named read statements ({"name", "cypher", "parameters", "limit"}) in one call.
+
+    Default: concurrently on separate sessions (each like `run_query_core_async`, incl. cache and guard).
+    `snapshot=True`: one after another in a single read transaction, i.e. one consistent view of the
+    data (no result cache). A failing statement yields {"error", "message"} under its name only; in
+    snapshot mode a database error aborts the transaction and the remaining statements report
+    "transaction_aborted".
+    """
+    items = _statement_list(statements, int(limit))
+    started = time.perf_counter()
+    if snapshot:
+        results = await _run_snapshot(items)
+    else:
+        sem = asyncio.Semaphore(max(1, RUN_QUERIES_MAX_CONCURRENCY))
+
+        async def _one(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    rows = await run_query_core_async(item["cypher"], item["parameters"], limit=item["limit"])
+                    out: Dict[str, Any] = {"rows": rows, "row_count": len(rows)}
+                except Exception as exc:
+                    out = _statement_error(exc)
+                out["ms"] = _elapsed_ms(t0)
+                return out
+
+        results = await asyncio.gather(*(_one(item) for item in items))
+    return {
+        "mode": "snapshot" if snapshot else "concurrent",
+        "ms": _elapsed_ms(started),
+        "results": {item["name"]: out for item, out in zip(items, results)},
+    }
+
+
+async def _run_snapshot(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    prepared = []
+    for item in items:
+        cypher, params, _ = _prepare_query(item["cypher"], item["parameters"], item["limit"], True, False)
+        prepared.append((cypher, params, item["limit"]))
+    try:
+        async with get_async_session(default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(_run_statements_tx, prepared)
+    except _TransactionAborted as exc:
+        aborted = {"error": "transaction_aborted", "message": "Nicht ausgeführt: eine vorherige Query im selben Snapshot ist fehlgeschlagen."}
+        return exc.results + [dict(aborted) for _ in items[len(exc.results):]]
+    except Exception as exc:
+        return [_statement_error(exc) for _ in items]
+
+
+@unit_of_work(timeout=QUERY_TIMEOUT_SECONDS)
+async def _run_statements_tx(tx, prepared: List[Tuple[str, Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []  # rebuilt on every retry of the managed transaction
+    for cypher, params, limit in prepared:
+        t0 = time.perf_counter()
+        try:
+            if _needs_guard(cypher, True):
+                await guard_query_async(tx, cypher, params)
+            result = await tx.run(cypher, params)
+            rows = await records_to_list_async(result, limit)
+            observe_summary(await result.consume())
+            _observe_client(t0)
+            out: Dict[str, Any] = {"rows": rows, "row_count": len(rows)}
+        except QueryRejected as exc:
+            out = exc.to_dict()  # rejected before it ran, the transaction is still usable
+        except Exception as exc:
+            if isinstance(exc, Neo4jError) and exc.is_retryable():
+                raise
+            results.append({**_statement_error(exc), "ms": _elapsed_ms(t0)})
+            raise _TransactionAborted(results) from exc
+        out["ms"] = _elapsed_ms(t0)
+        results.append(out)
+    return results
+
+
+def _prepare_query(
+    cypher: str,
+    params: Dict[str, Any],
+    limit: int,
+    enforce_limit: bool,
+    use_cache: bool,
+    rewrite: bool = True,
+    max_limit: int = 1000,
+) -> Tuple[str, Dict[str, Any], Optional[Tuple[str, str, int]]]:
+    """Rewrite, apply the LIMIT guard and build the cache key (None if the query is not cacheable)."""
+    if rewrite:
+        cypher, params = rewrite_query(cypher, params)
     if enforce_limit:
         if re.search(r"(?i)\blimit\b", cypher) is None:
-            safe_limit = max(1, min(int(limit), 1000))
+            safe_limit = max(1, min(int(limit), int(max_limit)))
             cypher = cypher.rstrip() + f"\nLIMIT {safe_limit}"
 
-    with get_session() as session:
-        result = session.run(cypher, params)
-        return records_to_list(result, int(limit))
+    cacheable = use_cache and QUERY_CACHE_ENABLED and is_read_only(cypher)
+    return cypher, params, (make_key(cypher, params, limit) if cacheable else None)
+
+
+def rewrite_query(cypher: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Index-friendly rewrite of a read query; writes, SHOW commands and disabled rewriting pass through."""
+    if not CYPHER_REWRITE_ENABLED or not is_read_only(cypher) or re.match(r"(?i)\s*show\b", cypher):
+        return cypher, params
+    rewritten = rewrite_cypher(cypher, params)
+    return rewritten.cypher, rewritten.parameters
+
+
+# ------------------------------------------------------------
+# Materialized statistics (DailyStats / RouteDailyStats / StopDailyStats, ETL step 6)
+# ------------------------------------------------------------
+_DAILY_STATS_CYPHER = "MATCH (ds:DailyStats {date: $date}) RETURN ds {.*} AS stats"
+
+_ROUTE_DAY_TOP_CYPHER = """
+MATCH (rs:RouteDailyStats {date: $date})
+WHERE rs.mean_duration_seconds IS NOT NULL
+RETURN rs.route_id AS route_id, rs.line AS line, rs.trip_count AS trips,
+       rs.mean_duration_seconds AS avg_trip_duration_seconds
+ORDER BY avg_trip_duration_seconds DESC, route_id
+LIMIT $top
+"""
+
+_STOP_DAY_TOP_CYPHER = """
+MATCH (ss:StopDailyStats {date: $date})
+WHERE ss.mean_dwell_seconds IS NOT NULL
+RETURN ss.stop_id AS stop_id, ss.dwell_event_count AS stop_events,
+       ss.mean_dwell_seconds AS avg_stop_time_seconds
+ORDER BY avg_stop_time_seconds DESC, stop_id
+LIMIT $top
+"""
+
+_ROUTE_HEALTH_CYPHER = """
+MATCH (r:Route {route_id: $route_id})
+OPTIONAL MATCH (r)-[:HAS_DAILY_STATS]->(rs:RouteDailyStats {date: $date})
+RETURN r.route_id AS route_id, r.line AS line, rs {.*} AS stats,
+       r.mean_trip_travel_time_seconds AS typical_avg_trip_duration_seconds
+"""
+
+_PERIOD_TOTALS_CYPHER = """
+MATCH (ds:DailyStats)
+WHERE ds.date >= $date_from AND ds.date <= $date_to
+RETURN count(ds) AS days_with_data,
+       sum(ds.trip_count) AS total_trips,
+       CASE WHEN sum(ds.timed_trip_count) > 0
+            THEN toFloat(sum(ds.total_duration_seconds)) / sum(ds.timed_trip_count) END AS avg_trip_duration_seconds,
+       min(ds.date) AS first_day, max(ds.date) AS last_day
+"""
+
+_PERIOD_ROUTES_CYPHER = """
+MATCH (rs:RouteDailyStats)
+WHERE rs.date >= $date_from AND rs.date <= $date_to
+WITH rs.route_id AS route_id, rs.line AS line,
+     sum(rs.trip_count) AS trips,
+     sum(rs.total_duration_seconds) AS total, sum(rs.timed_trip_count) AS timed
+RETURN route_id, line, trips,
+       CASE WHEN timed > 0 THEN toFloat(total) / timed END AS avg_trip_duration_seconds
+ORDER BY trips DESC, route_id
+LIMIT $top
+"""
+
+_PERIOD_STOPS_CYPHER = """
+MATCH (ss:StopDailyStats)
+WHERE ss.date >= $date_from AND ss.date <= $date_to
+WITH ss.stop_id AS stop_id, sum(ss.dwell_event_count) AS observations, sum(ss.total_dwell_seconds) AS total
+WHERE observations > 0
+RETURN stop_id, observations, toFloat(total) / observations AS avg_stop_time_seconds
+ORDER BY avg_stop_time_seconds DESC, stop_id
+LIMIT $top
+"""
+
+
+async def _stats_query(cypher: str, params: Dict[str, Any], limit: int = 1000) -> List[Dict[str, Any]]:
+    return await run_query_core_async(cypher, params, limit=limit, enforce_limit=False, rewrite=False, guard=False)
+
+
+async def daily_brief_core_async(date: str, top: int = 5) -> Dict[str, Any]:
+    """Executive daily brief from the materialized DailyStats (date as 'YYYY-MM-DD')."""
+    top = max(1, min(int(top), 50))
+    day, routes, stops = await asyncio.gather(
+        _stats_query(_DAILY_STATS_CYPHER, {"date": date}),
+        _stats_query(_ROUTE_DAY_TOP_CYPHER, {"date": date, "top": top}, top),
+        _stats_query(_STOP_DAY_TOP_CYPHER, {"date": date, "top": top}, top),
+    )
+    if not day:
+        return {"date": date, "available": False, "message": "Keine Daten für dieses Datum."}
+    return {
+        "date": date,
+        "available": True,
+        "day": day[0]["stats"],
+        "slowest_routes": routes,
+        "longest_stop_times": stops,
+    }
+
+
+async def route_health_core_async(route_id: str, date: str) -> Dict[str, Any]:
+    """Daily health card for one route, compared with its long-term mean trip duration."""
+    rows = await _stats_query(_ROUTE_HEALTH_CYPHER, {"route_id": str(route_id), "date": date})
+    if not rows:
+        return {"route_id": route_id, "date": date, "available": False, "message": "Route nicht gefunden."}
+    row = rows[0]
+    stats = row["stats"]
+    typical = row["typical_avg_trip_duration_seconds"]
+    out: Dict[str, Any] = {
+        "route_id": row["route_id"],
+        "line": row["line"],
+        "date": date,
+        "available": stats is not None,
+        "day": stats,
+        "typical_avg_trip_duration_seconds": typical,
+    }
+    mean = (stats or {}).get("mean_duration_seconds")
+    if mean is not None and typical is not None:
+        delta = mean - typical
+        out["delta_vs_typical_seconds"] = delta
+        out["performance"] = "better" if delta < 0 else ("worse" if delta > 0 else "as_usual")
+    return out
+
+
+async def period_report_core_async(date_from: str, date_to: str, top: int = 10) -> Dict[str, Any]:
+    """
+    Totals, busiest routes and longest stop times for [date_from, date_to] (inclusive).
+    Means are exact (weighted by counts); median/p90 exist only per day.
+    """
+    top = max(1, min(int(top), 50))
+    params = {"date_from": date_from, "date_to": date_to}
+    totals, routes, stops = await asyncio.gather(
+        _stats_query(_PERIOD_TOTALS_CYPHER, params),
+        _stats_query(_PERIOD_ROUTES_CYPHER, {**params, "top": top}, top),
+        _stats_query(_PERIOD_STOPS_CYPHER, {**params, "top": top}, top),
+    )
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": totals[0] if totals else {},
+        "routes_by_volume": routes,
+        "longest_stop_times": stops,
+    }
+
+
+# ------------------------------------------------------------
+# Geo queries on Stop.location (point index stop_location, ETL step 2b)
+# ------------------------------------------------------------
+NEAREST_STOPS_MAX_DISTANCE_M = float(os.getenv("NEAREST_STOPS_MAX_DISTANCE_M", "5000"))
+STOPS_WITHIN_MAX_ROWS = int(os.getenv("STOPS_WITHIN_MAX_ROWS", "2000"))
+
+# the point index only serves range predicates (distance < r, withinBBox), not ORDER BY distance,
+# so nearest_stops seeks growing radii until it has k stops
+_NEAREST_STOPS_CYPHER = """
+WITH point({latitude: $lat, longitude: $lon}) AS here
+MATCH (s:Stop)
+WHERE point.distance(s.location, here) < $radius
+WITH s, point.distance(s.location, here) AS distance
+ORDER BY distance, s.stop_id
+LIMIT $k
+RETURN s.stop_id AS stop_id, s.lau AS lau, s.location.latitude AS lat, s.location.longitude AS lon,
+       round(distance, 1) AS distance_m
+"""
+
+_STOPS_WITHIN_CYPHER = """
+MATCH (s:Stop)
+WHERE point.withinBBox(s.location, point({latitude: $min_lat, longitude: $min_lon}),
+                                   point({latitude: $max_lat, longitude: $max_lon}))
+RETURN s.stop_id AS stop_id, s.lau AS lau, s.location.latitude AS lat, s.location.longitude AS lon
+ORDER BY s.stop_id
+LIMIT $limit
+"""
+
+
+def _check_coordinate(lat: float, lon: float) -> None:
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError(f"Invalid coordinate lat={lat}, lon={lon} (WGS-84 degrees expected)")
+
+
+async def nearest_stops_core_async(
+    lat: float, lon: float, k: int = 5, max_distance_m: float = NEAREST_STOPS_MAX_DISTANCE_M
+) -> Dict[str, Any]:
+    """The k stops closest to (lat, lon) within max_distance_m, nearest first (index-backed distance seeks)."""
+    lat, lon = float(lat), float(lon)
+    _check_coordinate(lat, lon)
+    k = max(1, min(int(k), 100))
+    max_distance_m = max(1.0, min(float(max_distance_m), NEAREST_STOPS_MAX_DISTANCE_M))
+    radius = min(250.0, max_distance_m)
+    while True:
+        rows = await _stats_query(_NEAREST_STOPS_CYPHER, {"lat": lat, "lon": lon, "k": k, "radius": radius}, k)
+        if len(rows) >= k or radius >= max_distance_m:
+            break
+        radius = min(radius * 4, max_distance_m)
+    return {"lat": lat, "lon": lon, "radius_m": radius, "stops": rows}
+
+
+async def stops_within_core_async(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int = 500
+) -> Dict[str, Any]:
+    """Stops inside the bounding box (south-west / north-east corners), index-backed."""
+    min_lat, min_lon, max_lat, max_lon = float(min_lat), float(min_lon), float(max_lat), float(max_lon)
+    _check_coordinate(min_lat, min_lon)
+    _check_coordinate(max_lat, max_lon)
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("Bounding box needs min_lat <= max_lat and min_lon <= max_lon")
+    limit = max(1, min(int(limit), STOPS_WITHIN_MAX_ROWS))
+    params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon, "limit": limit + 1}
+    rows = await _stats_query(_STOPS_WITHIN_CYPHER, params, limit + 1)
+    return {
+        "bbox": [min_lat, min_lon, max_lat, max_lon],
+        "stop_count": min(len(rows), limit),
+        "truncated": len(rows) > limit,
+        "stops": rows[:limit],
+    }
+
+
+# ------------------------------------------------------------
+# Columnar analytics snapshot (analytics_snapshot.py, exported after each ETL run)
+# ------------------------------------------------------------
+snapshot_store = SnapshotStore(os.getenv("ANALYTICS_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR))
+
+
+async def _snapshot_call(method: str, **kwargs: Any) -> Dict[str, Any]:
+    """Run one snapshot query off the event loop; raises SnapshotUnavailable / ValueError."""
+    snapshot = snapshot_store.get()
+    out = await asyncio.to_thread(getattr(snapshot, method), **kwargs)
+    await refresh_data_version_async()
+    version = snapshot.meta.get("data_version")
+    out["snapshot"] = {
+        "data_version": version,
+        "exported_at": snapshot.meta.get("exported_at"),
+        # the graph was reloaded after the export: numbers may miss the latest days
+        "stale": result_cache.data_version is not None and version != result_cache.data_version,
+    }
+    return out
+
+
+async def snapshot_percentiles_core_async(
+    table: str,
+    date_from: str,
+    date_to: Optional[str] = None,
+    group_by: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    percentiles: Optional[List[float]] = None,
+    order_by: str = "count",
+    descending: bool = True,
+    min_count: int = 1,
+    top: int = 20,
+) -> Dict[str, Any]:
+    """count / mean / min / max / percentiles of the durations of a period, optionally per group."""
+    return await _snapshot_call(
+        "percentiles", table=table, date_from=date_from, date_to=date_to, group_by=group_by, filters=filters,
+        percentiles=percentiles or [50, 90], order_by=order_by, descending=descending, min_count=min_count, top=top,
+    )
+
+
+async def snapshot_top_k_core_async(
+    table: str,
+    date_from: str,
+    date_to: Optional[str] = None,
+    k: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    longest: bool = True,
+) -> Dict[str, Any]:
+    """Longest (or shortest) trips / dwell / travel events of a period with their distance to the median."""
+    return await _snapshot_call(
+        "top_k", table=table, date_from=date_from, date_to=date_to, k=k, filters=filters, longest=longest
+    )
+
+
+async def snapshot_compare_core_async(
+    table: str,
+    period_a: List[str],
+    period_b: List[str],
+    group_by: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    min_count: int = 5,
+    top: int = 5,
+) -> Dict[str, Any]:
+    """Period A vs period B (count, mean, median, p90), optionally the groups that changed most."""
+    return await _snapshot_call(
+        "compare", table=table, period_a=period_a, period_b=period_b, group_by=group_by, filters=filters,
+        min_count=min_count, top=top,
+    )
+
+
+# ------------------------------------------------------------
+# Paginated queries (server-side cursors)
+# ------------------------------------------------------------
+cursor_registry = CursorRegistry(
+    row_converter=record_to_json,
+    ttl_seconds=float(os.getenv("QUERY_CURSOR_TTL_SECONDS", "300")),
+    max_open=int(os.getenv("QUERY_CURSOR_MAX_OPEN", "32")),
+    max_page_size=int(os.getenv("QUERY_CURSOR_MAX_PAGE_SIZE", "1000")),
+)
+
+
+async def open_cursor_core_async(
+    cypher: str,
+    parameters: Optional[Dict[str, Any]] = None,
+    page_size: int = 100,
+    tenant: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run a query without the LIMIT guard and return its first page plus a cursor.
+
+    The result is streamed from Neo4j in `page_size` batches; follow-up pages
+    come from `fetch_page_core_async` without re-executing the query. Only
+    `tenant` (the one that opened it) can page through or close the cursor.
+    """
+    _reject_writes(cypher)
+    page_size = cursor_registry.clamp_page_size(page_size)
+    cypher, params = rewrite_query(cypher, parameters or {})
+    overrides: Dict[str, Any] = {"fetch_size": page_size}
+    if NEO4J_READ_ROUTING:
+        overrides["default_access_mode"] = READ_ACCESS
+    session = get_async_session(**overrides)
+    try:
+        if _needs_guard(cypher, True):
+            await guard_query_async(session, cypher, params)
+        result = await session.run(Query(cypher, timeout=QUERY_CURSOR_TIMEOUT_SECONDS), params)
+        return await cursor_registry.open(session, result, page_size, owner=tenant)
+    except (Neo4jError, DriverError) as exc:
+        await session.close()
+        raise _cursor_failed(exc) from exc
+    except BaseException:
+        await session.close()
+        raise
+
+
+async def fetch_page_core_async(cursor: str, page_size: int = 100, tenant: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Next page of an open cursor (raises CursorNotFound once it expired, is exhausted or belongs
+    to another tenant). A driver error closes the cursor and is raised as QueryRejected.
+    """
+    try:
+        return await cursor_registry.fetch(cursor, page_size, owner=tenant)
+    except (Neo4jError, DriverError) as exc:
+        raise _cursor_failed(exc) from exc
+
+
+def _cursor_failed(exc: BaseException) -> QueryRejected:
+    """Structured error of a cursor whose query failed while streaming."""
+    if isinstance(exc, Neo4jError):
+        if _is_timeout(exc):
+            return timed_out(QUERY_CURSOR_TIMEOUT_SECONDS)
+        return QueryRejected("cypher_error", exc.message or str(exc))
+    return QueryRejected("cursor_failed", f"Verbindung zu Neo4j verloren ({type(exc).__name__}); Cursor ist geschlossen. Query neu starten.")
+
+
+async def close_cursor_core_async(cursor: str, tenant: Optional[str] = None) -> bool:
+    return await cursor_registry.close(cursor, owner=tenant)
+
+
+# ------------------------------------------------------------
+# Result handles (full result server-side, summary to the agent)
+# ------------------------------------------------------------
+RESULT_STORE_MAX_ROWS = int(os.getenv("RESULT_STORE_MAX_ROWS", "50000"))
+RESULT_STORE_AUTO_ROWS = int(os.getenv("RESULT_STORE_AUTO_ROWS", "200"))  # 0 = only with store=True
+
+result_store = ResultStore(
+    max_bytes=int(os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+    max_handles=int(os.getenv("RESULT_STORE_MAX_HANDLES", "256")),
+    ttl_seconds=float(os.getenv("RESULT_STORE_TTL_SECONDS", "1800")),
+    preview_rows=int(os.getenv("RESULT_STORE_PREVIEW_ROWS", "20")),
+)
+
+
+def should_store(rows: List[Dict[str, Any]]) -> bool:
+    """Automatic mode: results with more than RESULT_STORE_AUTO_ROWS rows go to a handle."""
+    return 0 < RESULT_STORE_AUTO_ROWS < len(rows)
+
+
+async def run_query_to_handle_core_async(
+    cypher: str,
+    parameters: Optional[Dict[str, Any]] = None,
+    enforce_limit: bool = True,
+    tenant: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run a query with up to RESULT_STORE_MAX_ROWS rows, keep the rows under a handle of `tenant`
+    and return the summary {"handle", "row_count", "columns", "column_stats", "preview", "bytes"}.
+    """
+    rows = await run_query_core_async(
+        cypher=cypher,
+        parameters=parameters,
+        limit=RESULT_STORE_MAX_ROWS,
+        enforce_limit=enforce_limit,
+        max_limit=RESULT_STORE_MAX_ROWS,
+    )
+    return result_store.put(rows, owner=tenant)
+
+
+def get_guard_stats_core() -> Dict[str, Any]:
+    """Counters of the EXPLAIN guard and the per-tenant limiter."""
+    return {"guard": query_guard.stats(), "tenants": tenant_limiter.stats(), "schema": schema_cache.stats()}
+
+
+def get_cache_stats_core() -> Dict[str, Any]:
+    """Hit/miss counters and size of the query result cache, plus single-flight, result-handle and snapshot counters."""
+    return {
+        **result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "result_store": result_store.stats(),
+        "analytics_snapshot": snapshot_store.stats(),
+    }
+
+
+def invalidate_cache_core() -> None:
+    """Drop all cached query results (e.g. after a manual data fix)."""
+    result_cache.invalidate()
 
 
 def close_driver() -> None:
@@ -136,3 +1233,15 @@ def close_driver() -> None:
         _driver.close()
     except Exception:
         pass
+
+
+async def close_async_driver() -> None:
+    """Close open cursors and the async driver (call from the loop that used it)."""
+    global _async_driver
+    await cursor_registry.close_all()
+    if _async_driver is not None:
+        try:
+            await _async_driver.close()
+        except Exception:
+            pass
+        _async_driver = None
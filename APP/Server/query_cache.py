@@ -0,0 +1,248 @@
+# query_cache.py
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# ------------------------------------------------------------
+# Key building
+# ------------------------------------------------------------
+_WS_RE = re.compile(r"\s+")
+_WRITE_RE = re.compile(
+    r"(?i)\b(create|merge|set|delete|detach|remove|drop|load\s+csv|foreach)\b|\bcall\s+apoc\.(periodic|create|merge|refactor)"
+)
+# string literals, `backtick names` and comments - their text is no keyword
+_NON_CODE_RE = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|//[^\n]*|/\*.*?\*/""", re.S)
+
+
+def normalize_cypher(cypher: str) -> str:
+    """Collapse whitespace and strip trailing semicolons (string literals stay as-is)."""
+    return _WS_RE.sub(" ", cypher).strip().rstrip(";").strip()
+
+
+def is_read_only(cypher: str) -> bool:
+    """Cheap check: only read queries are cached (keywords inside strings, names and comments do not count)."""
+    return _WRITE_RE.search(_NON_CODE_RE.sub(" ", cypher)) is None
+
+
+def make_key(cypher: str, parameters: Optional[Dict[str, Any]], limit: int) -> Tuple[str, str, int]:
+    params = json.dumps(parameters or {}, sort_keys=True, default=str, separators=(",", ":"))
+    return normalize_cypher(cypher), params, int(limit)
+
+
+def _estimate_bytes(rows: List[Dict[str, Any]]) -> int:
+    try:
+        return len(json.dumps(rows, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return len(str(rows))
+
+
+# ------------------------------------------------------------
+# LRU / TTL result cache
+# ------------------------------------------------------------
+class QueryResultCache:
+    """
+    Memory-bounded LRU for query results with a per-entry TTL.
+
+    Entries are tagged with the graph data version they were computed for;
+    when the ETL bumps the version the whole cache is dropped.
+    Cached rows are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: int = 2048,
+        ttl_seconds: float = 600.0,
+        version_check_seconds: float = 30.0,
+    ) -> None:
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.version_check_seconds = float(version_check_seconds)
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size_bytes, rows)
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._bytes = 0
+        self._data_version: Any = None
+        self._version_checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # ---------- data version ----------
+    def version_check_due(self) -> bool:
+        """True at most once per `version_check_seconds`; the caller then loads the version."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked_at < self.version_check_seconds:
+                return False
+            self._version_checked_at = now
+            return True
+
+    def set_data_version(self, version: Any) -> None:
+        """Invalidate everything if the graph data version changed."""
+        with self._lock:
+            if version != self._data_version:
+                if self._data_version is not None:
+                    self._clear_locked()
+                    self.invalidations += 1
+                self._data_version = version
+
+    @property
+    def data_version(self) -> Any:
+        return self._data_version
+
+    # ---------- get / put ----------
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, rows = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, key: Hashable, rows: List[Dict[str, Any]], ttl_seconds: Optional[float] = None) -> None:
+        size = _estimate_bytes(rows)
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + ttl, size, rows)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear_locked()
+            self.invalidations += 1
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "data_version": self._data_version,
+            }
+
+
+# ------------------------------------------------------------
+# Single-flight: identical concurrent queries share one execution
+# ------------------------------------------------------------
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Deduplicates in-flight executions by key: the first caller runs the query,
+    callers arriving while it runs wait for it and get the same result (or exception).
+    Works for threads (`do`) and for tasks on an event loop (`do_async`); the shared
+    result must be treated as read-only, like cached rows.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task.get_loop() is loop:
+                self.coalesced += 1
+            else:
+                # own task, so a cancelled caller does not cancel the execution for the others
+                task = loop.create_task(fn())
+                self._tasks[key] = task
+                self.executions += 1
+                task.add_done_callback(lambda t, k=key: self._finished(k, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every caller was cancelled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights) + len(self._tasks),
+            }
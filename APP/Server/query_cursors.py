@@ -0,0 +1,148 @@
+# query_cursors.py
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CursorNotFound(KeyError):
+    """Cursor is unknown, expired or already exhausted."""
+
+
+class _Cursor:
+    __slots__ = ("session", "result", "columns", "expires_at", "rows_returned", "lock", "owner")
+
+    def __init__(self, session: Any, result: Any, columns: List[str], expires_at: float, owner: Optional[str]) -> None:
+        self.session = session
+        self.result = result
+        self.columns = columns
+        self.expires_at = expires_at
+        self.rows_returned = 0
+        self.lock = asyncio.Lock()
+        self.owner = owner
+
+
+class CursorRegistry:
+    """
+    Open Neo4j results that are paged out over several tool calls.
+
+    Each cursor keeps its session + result open; records are pulled from the
+    driver in `fetch_size` batches, so the server never holds more than one
+    batch per cursor. Idle cursors expire after `ttl_seconds`, and at most
+    `max_open` cursors are kept (the least recently used idle one is closed first).
+    A cursor belongs to the tenant that opened it; other tenants get CursorNotFound.
+    A cursor whose fetch fails is closed and the error is raised to the caller.
+    """
+
+    def __init__(
+        self,
+        row_converter: Callable[[Any], Dict[str, Any]],
+        ttl_seconds: float = 300.0,
+        max_open: int = 32,
+        max_page_size: int = 1000,
+    ) -> None:
+        self.row_converter = row_converter
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_open = int(max_open)
+        self.max_page_size = int(max_page_size)
+        self._cursors: "OrderedDict[str, _Cursor]" = OrderedDict()
+
+        self.opened = 0
+        self.expired = 0
+
+    def clamp_page_size(self, page_size: int) -> int:
+        return max(1, min(int(page_size), self.max_page_size))
+
+    async def open(self, session: Any, result: Any, page_size: int, owner: Optional[str] = None) -> Dict[str, Any]:
+        """Register an open result of tenant `owner` and return its first page."""
+        await self.sweep()
+        while len(self._cursors) >= self.max_open:
+            # cursors in the middle of a fetch are skipped; if all are busy the limit is exceeded briefly
+            idle = next((cid for cid, c in self._cursors.items() if not c.lock.locked()), None)
+            if idle is None:
+                break
+            await self._close(self._cursors.pop(idle))
+
+        columns = list(await result.keys())
+        cursor = _Cursor(session, result, columns, time.monotonic() + self.ttl_seconds, owner)
+        cursor_id = uuid.uuid4().hex
+        self._cursors[cursor_id] = cursor
+        self.opened += 1
+        return await self._page(cursor_id, cursor, page_size)
+
+    async def fetch(self, cursor_id: str, page_size: int, owner: Optional[str] = None) -> Dict[str, Any]:
+        """Return the next page of an open cursor of tenant `owner`."""
+        await self.sweep()
+        cursor = self._cursors.get(cursor_id)
+        if cursor is None or cursor.owner != owner:
+            raise CursorNotFound(cursor_id)
+        self._cursors.move_to_end(cursor_id)
+        return await self._page(cursor_id, cursor, page_size)
+
+    async def close(self, cursor_id: str, owner: Optional[str] = None) -> bool:
+        cursor = self._cursors.get(cursor_id)
+        if cursor is None or cursor.owner != owner:
+            return False
+        del self._cursors[cursor_id]
+        await self._close(cursor)
+        return True
+
+    async def sweep(self) -> None:
+        now = time.monotonic()
+        stale = [cid for cid, c in self._cursors.items() if c.expires_at <= now and not c.lock.locked()]
+        for cid in stale:
+            cursor = self._cursors.pop(cid)
+            self.expired += 1
+            await self._close(cursor)
+
+    async def run_sweeper(self, interval_seconds: float = 30.0) -> None:
+        """Background task: release sessions of cursors nobody fetches any more."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.sweep()
+
+    async def close_all(self) -> None:
+        while self._cursors:
+            _, cursor = self._cursors.popitem()
+            await self._close(cursor)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"open": len(self._cursors), "opened": self.opened, "expired": self.expired}
+
+    # ---------- internals ----------
+    async def _page(self, cursor_id: str, cursor: _Cursor, page_size: int) -> Dict[str, Any]:
+        async with cursor.lock:
+            try:
+                records = await cursor.result.fetch(self.clamp_page_size(page_size))
+                rows = [self.row_converter(r) for r in records]
+                cursor.rows_returned += len(rows)
+                has_more = (await cursor.result.peek()) is not None
+            except BaseException:
+                # a failed result (timeout, lost connection) cannot be paged any further
+                self._cursors.pop(cursor_id, None)
+                await self._close(cursor)
+                raise
+            offset = cursor.rows_returned - len(rows)
+            cursor.expires_at = time.monotonic() + self.ttl_seconds
+
+        page: Dict[str, Any] = {
+            "columns": cursor.columns,
+            "rows": rows,
+            "offset": offset,
+            "has_more": has_more,
+            "cursor": cursor_id if has_more else None,
+        }
+        if not has_more:
+            self._cursors.pop(cursor_id, None)
+            await self._close(cursor)
+        return page
+
+    @staticmethod
+    async def _close(cursor: _Cursor) -> None:
+        try:
+            await cursor.session.close()
+        except Exception:
+            pass
@@ -0,0 +1,236 @@
+# query_guard.py
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from query_cache import normalize_cypher
+
+# ------------------------------------------------------------
+# Errors returned to the agent as structured tool results
+# ------------------------------------------------------------
+class QueryRejected(Exception):
+    """Query was not run (or was stopped); `to_dict()` is the tool result for the agent."""
+
+    def __init__(self, error: str, message: str, reasons: Optional[List[str]] = None) -> None:
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.reasons = list(reasons or [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"error": self.error, "message": self.message}
+        if self.reasons:
+            out["reasons"] = self.reasons
+        return out
+
+
+def too_expensive(reasons: List[str]) -> QueryRejected:
+    return QueryRejected(
+        "query_too_expensive",
+        "Query ist zu teuer und wurde nicht ausgeführt. Filter eingrenzen (z.B. t.date, route_id, "
+        "stop_id), Variable-Length-Pfade begrenzen (*1..3) oder vorberechnete Tools/Aggregate nutzen.",
+        reasons,
+    )
+
+
+def timed_out(seconds: float) -> QueryRejected:
+    return QueryRejected(
+        "query_timeout",
+        f"Query wurde nach {seconds:g}s abgebrochen. Zeitraum oder Filter eingrenzen.",
+    )
+
+
+# ------------------------------------------------------------
+# EXPLAIN-based pre-flight check
+# ------------------------------------------------------------
+# [*], [*2..], [r:X*..] - variable-length relationships without an upper bound
+_UNBOUNDED_VAR_LENGTH = re.compile(r"\[[^\[\]]*\*\s*(?:\d*\s*\.\.\s*)?\]")
+_BLOCKED_OPERATORS = ("CartesianProduct", "AllNodesScan")
+
+
+def _operator(plan: Dict[str, Any]) -> str:
+    return str(plan.get("operatorType") or "").split("@", 1)[0]
+
+
+def _arguments(plan: Dict[str, Any]) -> Dict[str, Any]:
+    # raw Bolt metadata uses "args", older driver Plan objects "arguments"
+    return plan.get("args") or plan.get("arguments") or {}
+
+
+class QueryPlanGuard:
+    """
+    Rejects read queries whose EXPLAIN plan is likely to pin the database:
+    CartesianProduct, AllNodesScan, label scans on large labels (Trip), unbounded
+    variable-length paths, estimated rows above `max_estimated_rows` or a plan
+    deeper than `max_depth`. Verdicts are memoized per normalized query text;
+    literals are parameters after the rewrite, so same-shaped queries share one EXPLAIN.
+    """
+
+    def __init__(
+        self,
+        max_estimated_rows: float = 5_000_000,
+        max_depth: int = 40,
+        blocked_label_scans: Iterable[str] = ("Trip",),
+        max_verdicts: int = 1024,
+    ) -> None:
+        self.max_estimated_rows = float(max_estimated_rows)
+        self.max_depth = int(max_depth)
+        self.blocked_label_scans = tuple(blocked_label_scans)
+        self.max_verdicts = int(max_verdicts)
+
+        self._lock = threading.Lock()
+        self._verdicts: "OrderedDict[str, List[str]]" = OrderedDict()
+
+        self.checked = 0
+        self.rejected = 0
+
+    # ---------- verdict memo ----------
+    def cached(self, cypher: str) -> Optional[List[str]]:
+        key = normalize_cypher(cypher)
+        with self._lock:
+            reasons = self._verdicts.get(key)
+            if reasons is not None:
+                self._verdicts.move_to_end(key)
+            return reasons
+
+    def check(self, cypher: str, plan: Optional[Dict[str, Any]]) -> List[str]:
+        """Reasons against running the query (empty = ok); raises nothing, remembers the verdict."""
+        reasons = self.check_text(cypher) + (self.check_plan(plan) if plan else [])
+        key = normalize_cypher(cypher)
+        with self._lock:
+            self.checked += 1
+            self._verdicts[key] = reasons
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_verdicts:
+                self._verdicts.popitem(last=False)
+        return reasons
+
+    def enforce(self, reasons: List[str]) -> None:
+        if reasons:
+            with self._lock:
+                self.rejected += 1
+            raise too_expensive(reasons)
+
+    # ---------- rules ----------
+    def check_text(self, cypher: str) -> List[str]:
+        if _UNBOUNDED_VAR_LENGTH.search(cypher):
+            return ["unbounded variable-length path (add an upper bound, e.g. *1..3)"]
+        return []
+
+    def check_plan(self, plan: Dict[str, Any]) -> List[str]:
+        reasons: List[str] = []
+        max_rows = 0.0
+        depth = 0
+        stack = [(plan, 1)]
+        while stack:
+            node, level = stack.pop()
+            depth = max(depth, level)
+            op = _operator(node)
+            args = _arguments(node)
+            if op in _BLOCKED_OPERATORS:
+                reasons.append(op)
+            elif op == "NodeByLabelScan":
+                details = str(args.get("Details") or "")
+                for label in self.blocked_label_scans:
+                    if re.search(r":\s*" + re.escape(label) + r"\b", details):
+                        reasons.append(f"NodeByLabelScan on {label} (no index used)")
+            try:
+                max_rows = max(max_rows, float(args.get("EstimatedRows") or 0))
+            except (TypeError, ValueError):
+                pass
+            stack.extend((child, level + 1) for child in node.get("children") or [])
+
+        if max_rows > self.max_estimated_rows:
+            reasons.append(f"estimated rows {max_rows:,.0f} > {self.max_estimated_rows:,.0f}")
+        if depth > self.max_depth:
+            reasons.append(f"plan depth {depth} > {self.max_depth}")
+        return list(dict.fromkeys(reasons))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"checked": self.checked, "rejected": self.rejected, "verdicts": len(self._verdicts)}
+
+
+# ------------------------------------------------------------
+# Per-tenant concurrency budget
+# ------------------------------------------------------------
+class TenantLimiter:
+    """
+    At most `max_concurrent` tool calls per tenant at a time; a call that cannot
+    get a slot within `wait_seconds` is answered with a "busy" error instead of queueing forever.
+
+    Calls without a tenant share one pool of `untagged_max_concurrent` slots, so a
+    deployment that does not send tenant IDs keeps its full concurrency. The tenant
+    ID is chosen by the client: it divides capacity fairly between cooperating
+    clients and is no access control. At most `max_tenants` tenants are tracked;
+    the least recently used idle one is forgotten first, and while all of them
+    are busy further new tenants share the untagged pool.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        wait_seconds: float = 10.0,
+        untagged_max_concurrent: int = 32,
+        max_tenants: int = 1000,
+    ) -> None:
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.wait_seconds = float(wait_seconds)
+        self.untagged_max_concurrent = max(1, int(untagged_max_concurrent))
+        self.max_tenants = max(1, int(max_tenants))
+        self._untagged = asyncio.Semaphore(self.untagged_max_concurrent)
+        self._semaphores: "OrderedDict[str, asyncio.Semaphore]" = OrderedDict()
+        self._active: Dict[Optional[str], int] = {}
+        self.rejected = 0
+
+    def _semaphore(self, tenant: Optional[str]) -> Tuple[Optional[str], asyncio.Semaphore, int]:
+        """(key, semaphore, limit) of a tenant; None is the shared untagged pool."""
+        if tenant:
+            sem = self._semaphores.get(tenant)
+            if sem is not None:
+                self._semaphores.move_to_end(tenant)
+                return tenant, sem, self.max_concurrent
+            if len(self._semaphores) >= self.max_tenants:
+                idle = next((t for t in self._semaphores if not self._active.get(t)), None)
+                if idle is not None:
+                    del self._semaphores[idle]
+                    self._active.pop(idle, None)
+            if len(self._semaphores) < self.max_tenants:
+                sem = self._semaphores[tenant] = asyncio.Semaphore(self.max_concurrent)
+                return tenant, sem, self.max_concurrent
+        return None, self._untagged, self.untagged_max_concurrent
+
+    @asynccontextmanager
+    async def slot(self, tenant: Optional[str]) -> AsyncIterator[None]:
+        key, sem, limit = self._semaphore(tenant)
+        # counted before waiting, so a tenant with queued calls is never evicted
+        self._active[key] = self._active.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.wait_seconds)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise QueryRejected(
+                    "tenant_busy",
+                    f"Zu viele gleichzeitige Anfragen (max. {limit}). Kurz warten und erneut versuchen.",
+                ) from None
+            try:
+                yield
+            finally:
+                sem.release()
+        finally:
+            self._active[key] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "untagged_max_concurrent": self.untagged_max_concurrent,
+            "tenants": len(self._semaphores),
+            "active": {(t or "untagged"): n for t, n in self._active.items() if n},
+            "rejected": self.rejected,
+        }
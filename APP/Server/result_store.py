@@ -0,0 +1,322 @@
+# result_store.py
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class HandleNotFound(KeyError):
+    """Result handle is unknown, expired or was evicted."""
+
+
+class _Stored:
+    __slots__ = ("rows", "columns", "size", "expires_at", "created_at", "owner")
+
+    def __init__(
+        self, rows: List[Dict[str, Any]], columns: List[str], size: int, expires_at: float, owner: Optional[str]
+    ) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.size = size
+        self.expires_at = expires_at
+        self.created_at = time.time()
+        self.owner = owner
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+_AGGREGATE_RE = re.compile(r"^\s*(count|count_distinct|sum|avg|min|max)\s*\(\s*(\*|[^()]+?)\s*\)\s*$", re.I)
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    columns: List[str] = []
+    seen = set()
+    for row in rows:
+        for k in row:
+            if k not in seen:
+                seen.add(k)
+                columns.append(k)
+    return columns
+
+
+def _size(rows: List[Dict[str, Any]]) -> int:
+    try:
+        return len(json.dumps(rows, default=str, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return len(str(rows))
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _hashable(v: Any) -> Any:
+    return json.dumps(v, sort_keys=True, default=str) if isinstance(v, (dict, list)) else v
+
+
+def _sorted(rows: List[Dict[str, Any]], column: str, descending: bool) -> List[Dict[str, Any]]:
+    """Sort by one column; None always last, mixed types compared as strings."""
+    present = [r for r in rows if r.get(column) is not None]
+    missing = [r for r in rows if r.get(column) is None]
+    try:
+        present.sort(key=lambda r: r[column], reverse=descending)
+    except TypeError:
+        present.sort(key=lambda r: str(r[column]), reverse=descending)
+    return present + missing
+
+
+def column_stats(rows: List[Dict[str, Any]], columns: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Per column: type, nulls, distinct values and min/max (plus mean for numbers)."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for c in columns:
+        values = [r.get(c) for r in rows]
+        present = [v for v in values if v is not None]
+        stat: Dict[str, Any] = {"nulls": len(values) - len(present)}
+        if present and all(_is_number(v) for v in present):
+            stat.update(type="number", min=min(present), max=max(present), mean=round(sum(present) / len(present), 4))
+        elif present and all(isinstance(v, str) for v in present):
+            # ISO dates/datetimes sort correctly as strings
+            stat.update(type="string", min=min(present), max=max(present))
+        elif present and all(isinstance(v, bool) for v in present):
+            stat.update(type="boolean", true=sum(1 for v in present if v))
+        else:
+            stat["type"] = "mixed" if present else "null"
+        stat["distinct"] = len({_hashable(v) for v in present})
+        stats[c] = stat
+    return stats
+
+
+# ------------------------------------------------------------
+# Store
+# ------------------------------------------------------------
+class ResultStore:
+    """
+    Full query results kept server-side under a handle, so only a summary
+    (row count, column stats, first rows) has to go through the LLM context.
+
+    Memory-bounded LRU: at most `max_bytes` (estimated JSON size) and
+    `max_handles` results; the least recently used handle is dropped first
+    and handles expire `ttl_seconds` after their last access. Stored rows are
+    read-only (they may be shared with the result cache). A handle belongs to
+    the tenant that stored it; other tenants get HandleNotFound.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_handles: int = 256,
+        ttl_seconds: float = 1800.0,
+        preview_rows: int = 20,
+        max_page_size: int = 1000,
+    ) -> None:
+        self.max_bytes = int(max_bytes)
+        self.max_handles = int(max_handles)
+        self.ttl_seconds = float(ttl_seconds)
+        self.preview_rows = int(preview_rows)
+        self.max_page_size = int(max_page_size)
+
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, _Stored]" = OrderedDict()
+        self._bytes = 0
+
+        self.stored = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---------- put / get ----------
+    def put(self, rows: List[Dict[str, Any]], owner: Optional[str] = None) -> Dict[str, Any]:
+        """Store `rows` of tenant `owner` and return the summary for the agent (with "handle": None if it does not fit)."""
+        columns = _columns(rows)
+        size = _size(rows)
+        handle: Optional[str] = None
+        if size <= self.max_bytes:
+            handle = uuid.uuid4().hex
+            with self._lock:
+                self._sweep_locked(time.monotonic())
+                self._results[handle] = _Stored(rows, columns, size, time.monotonic() + self.ttl_seconds, owner)
+                self._bytes += size
+                self.stored += 1
+                while len(self._results) > 1 and (self._bytes > self.max_bytes or len(self._results) > self.max_handles):
+                    _, evicted = self._results.popitem(last=False)
+                    self._bytes -= evicted.size
+                    self.evictions += 1
+        else:
+            with self._lock:
+                self.rejected += 1
+        return {
+            "handle": handle,
+            "row_count": len(rows),
+            "columns": columns,
+            "column_stats": column_stats(rows, columns),
+            "preview": rows[: self.preview_rows],
+            "bytes": size,
+        }
+
+    def _get(self, handle: str, owner: Optional[str]) -> _Stored:
+        now = time.monotonic()
+        with self._lock:
+            self._sweep_locked(now)
+            stored = self._results.get(handle)
+            if stored is None or stored.owner != owner:
+                raise HandleNotFound(handle)
+            self._results.move_to_end(handle)
+            stored.expires_at = now + self.ttl_seconds
+            return stored
+
+    def drop(self, handle: str) -> bool:
+        with self._lock:
+            stored = self._results.pop(handle, None)
+            if stored is None:
+                return False
+            self._bytes -= stored.size
+            return True
+
+    def _sweep_locked(self, now: float) -> None:
+        stale = [h for h, s in self._results.items() if s.expires_at <= now]
+        for h in stale:
+            self._bytes -= self._results.pop(h).size
+            self.expirations += 1
+
+    # ---------- reads ----------
+    def slice(
+        self,
+        handle: str,
+        offset: int = 0,
+        limit: int = 100,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        owner: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Rows [offset, offset + limit) of a stored result of tenant `owner`, optionally filtered, sorted and projected."""
+        stored = self._get(handle, owner)
+        self._check_columns(stored, list(columns or []) + list(where or {}) + ([order_by] if order_by else []))
+        rows = self._filter(stored.rows, where)
+        if order_by:
+            rows = _sorted(rows, order_by, descending)
+        offset = max(0, int(offset))
+        limit = max(1, min(int(limit), self.max_page_size))
+        page = rows[offset: offset + limit]
+        if columns:
+            page = [{c: r.get(c) for c in columns} for r in page]
+        return {
+            "handle": handle,
+            "columns": list(columns) if columns else stored.columns,
+            "rows": page,
+            "offset": offset,
+            "row_count": len(rows),
+            "has_more": offset + len(page) < len(rows),
+        }
+
+    def aggregate(
+        self,
+        handle: str,
+        aggregates: Dict[str, str],
+        group_by: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 100,
+        owner: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Group a stored result of tenant `owner` and compute aggregates, e.g.
+        aggregates={"trips": "count(*)", "avg_delay": "avg(delay_s)"}, group_by=["route_id"].
+        Supported: count, count_distinct, sum, avg, min, max.
+        """
+        stored = self._get(handle, owner)
+        specs: List[Tuple[str, str, str]] = []
+        for name, spec in (aggregates or {}).items():
+            m = _AGGREGATE_RE.match(str(spec))
+            if m is None:
+                raise ValueError(f"Invalid aggregate {name!r}: {spec!r} (expected e.g. 'sum(column)' or 'count(*)')")
+            op, column = m.group(1).lower(), m.group(2)
+            if column == "*" and op != "count":
+                raise ValueError(f"Invalid aggregate {name!r}: only count(*) may use *")
+            specs.append((name, op, column))
+        if not specs:
+            raise ValueError("At least one aggregate is required")
+        group_by = list(group_by or [])
+        self._check_columns(stored, group_by + list(where or {}) + [c for _, _, c in specs if c != "*"])
+
+        groups: "OrderedDict[Tuple[Any, ...], List[Dict[str, Any]]]" = OrderedDict()
+        for row in self._filter(stored.rows, where):
+            groups.setdefault(tuple(_hashable(row.get(c)) for c in group_by), []).append(row)
+
+        out: List[Dict[str, Any]] = []
+        for members in groups.values():
+            result = {c: members[0].get(c) for c in group_by}
+            for name, op, column in specs:
+                result[name] = _aggregate(op, column, members)
+            out.append(result)
+
+        if order_by is None:
+            order_by = specs[0][0]
+        elif order_by not in group_by and order_by not in aggregates:
+            raise ValueError(f"Unknown order_by {order_by!r}; use a group_by column or an aggregate name")
+        out = _sorted(out, order_by, descending)
+        limit = max(1, min(int(limit), self.max_page_size))
+        return {
+            "handle": handle,
+            "group_by": group_by,
+            "groups": len(out),
+            "rows": out[:limit],
+            "has_more": len(out) > limit,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "handles": len(self._results),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "stored": self.stored,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    # ---------- internals ----------
+    @staticmethod
+    def _check_columns(stored: _Stored, columns: List[str]) -> None:
+        unknown = [c for c in columns if c not in stored.columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s) {unknown}; available: {stored.columns}")
+
+    @staticmethod
+    def _filter(rows: List[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Equality filter; a list value means "one of"."""
+        if not where:
+            return rows
+        tests = [(c, {_hashable(x) for x in v} if isinstance(v, list) else {_hashable(v)}) for c, v in where.items()]
+        return [r for r in rows if all(_hashable(r.get(c)) in allowed for c, allowed in tests)]
+
+
+def _aggregate(op: str, column: str, rows: List[Dict[str, Any]]) -> Any:
+    if column == "*":
+        return len(rows)
+    values = [r.get(column) for r in rows if r.get(column) is not None]
+    if op == "count":
+        return len(values)
+    if op == "count_distinct":
+        return len({_hashable(v) for v in values})
+    if op in ("sum", "avg"):
+        numbers = [v for v in values if _is_number(v)]
+        if not numbers:
+            return None
+        total = sum(numbers)
+        return total if op == "sum" else round(total / len(numbers), 4)
+    if not values:
+        return None
+    try:
+        return min(values) if op == "min" else max(values)
+    except TypeError:
+        return (min if op == "min" else max)(values, key=str)
@@ -0,0 +1,252 @@
+# schema_introspection.py
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from neo4j.spatial import Point
+from neo4j.time import Date, DateTime, Duration, Time
+
+# run(cypher, params) -> list of plain dicts (Record.data(), driver types kept)
+Runner = Callable[[str, Optional[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+HIDDEN_LABELS = ("EtlMeta",)
+SAMPLE_SIZE = 20
+TOP_N = 10
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _type_name(v: Any) -> str:
+    if isinstance(v, bool):
+        return "BOOLEAN"
+    if isinstance(v, int):
+        return "INTEGER"
+    if isinstance(v, float):
+        return "FLOAT"
+    if isinstance(v, str):
+        return "STRING (YYYY-MM-DD)" if _ISO_DATE_RE.match(v) else "STRING"
+    if isinstance(v, (DateTime, dt.datetime)):
+        return "DATETIME"
+    if isinstance(v, (Date, dt.date)):
+        return "DATE"
+    if isinstance(v, (Time, dt.time)):
+        return "TIME"
+    if isinstance(v, (Duration, dt.timedelta)):
+        return "DURATION"
+    if isinstance(v, Point):
+        return "POINT"
+    if isinstance(v, (list, tuple)):
+        inner = {_type_name(x) for x in v}
+        return f"LIST<{inner.pop()}>" if len(inner) == 1 else "LIST"
+    return type(v).__name__.upper()
+
+
+def _property_types(samples: List[Dict[str, Any]]) -> Dict[str, str]:
+    types: Dict[str, set] = {}
+    for props in samples:
+        for k, v in (props or {}).items():
+            if v is not None:
+                types.setdefault(k, set()).add(_type_name(v))
+    return {k: " | ".join(sorted(t)) for k, t in sorted(types.items())}
+
+
+# ------------------------------------------------------------
+# Introspection (a handful of cheap queries: count store, index-ordered min/max, samples)
+# ------------------------------------------------------------
+async def introspect(run: Runner) -> Dict[str, Any]:
+    """Raw facts about the live graph; every query is bounded (LIMIT, count store or index order)."""
+    labels = [r["label"] for r in await run("CALL db.labels() YIELD label RETURN label", None)]
+    labels = [l for l in labels if l not in HIDDEN_LABELS]
+    rel_types = [r["relationshipType"] for r in await run("CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType", None)]
+
+    nodes: Dict[str, Any] = {}
+    for label in labels:
+        q = _quote(label)
+        count = (await run(f"MATCH (n:{q}) RETURN count(n) AS c", None))[0]["c"]
+        samples = await run(f"MATCH (n:{q}) WITH n LIMIT {SAMPLE_SIZE} RETURN properties(n) AS p", None)
+        nodes[label] = {"count": count, "properties": _property_types([s["p"] for s in samples])}
+
+    relationships: Dict[str, Any] = {}
+    for rel in rel_types:
+        q = _quote(rel)
+        count = (await run(f"MATCH ()-[r:{q}]->() RETURN count(r) AS c", None))[0]["c"]
+        samples = await run(
+            f"MATCH (a)-[r:{q}]->(b) WITH a, r, b LIMIT {SAMPLE_SIZE} "
+            "RETURN labels(a) AS from, labels(b) AS to, properties(r) AS p",
+            None,
+        )
+        ends = sorted({(s["from"][0] if s["from"] else "", s["to"][0] if s["to"] else "") for s in samples})
+        relationships[rel] = {
+            "count": count,
+            "pattern": " | ".join(f"(:{a})-[:{rel}]->(:{b})" for a, b in ends) or f"()-[:{rel}]->()",
+            "properties": _property_types([s["p"] for s in samples]),
+        }
+
+    indexes = await run(
+        "SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, state, owningConstraint "
+        "WHERE type <> 'LOOKUP' RETURN name, type, entityType, labelsOrTypes, properties, state, owningConstraint",
+        None,
+    )
+    constraints = await run(
+        "SHOW CONSTRAINTS YIELD name, type, labelsOrTypes, properties RETURN name, type, labelsOrTypes, properties",
+        None,
+    )
+
+    data: Dict[str, Any] = {}
+    if "Trip" in nodes and "date" in nodes["Trip"]["properties"]:
+        # ORDER BY on the indexed property -> ordered index scan, no full scan
+        first = await run("MATCH (t:Trip) WHERE t.date IS NOT NULL RETURN t.date AS d ORDER BY t.date ASC LIMIT 1", None)
+        last = await run("MATCH (t:Trip) WHERE t.date IS NOT NULL RETURN t.date AS d ORDER BY t.date DESC LIMIT 1", None)
+        data["trip_dates"] = {"min": _plain(first[0]["d"]) if first else None, "max": _plain(last[0]["d"]) if last else None}
+        if "DailyStats" in nodes:
+            data["trip_dates"]["days_with_data"] = nodes["DailyStats"]["count"]
+    if "Route" in nodes and "trip_sample_count" in nodes["Route"]["properties"]:
+        data["top_lines"] = await run(
+            "MATCH (r:Route) WHERE r.line IS NOT NULL "
+            "RETURN r.line AS line, count(r) AS routes, sum(r.trip_sample_count) AS trips "
+            f"ORDER BY trips DESC LIMIT {TOP_N}",
+            None,
+        )
+        data["top_routes"] = await run(
+            "MATCH (r:Route) RETURN r.route_id AS route_id, r.line AS line, r.trip_sample_count AS trips "
+            f"ORDER BY trips DESC LIMIT {TOP_N}",
+            None,
+        )
+    return {"nodes": nodes, "relationships": relationships, "indexes": indexes, "constraints": constraints, "data": data}
+
+
+def _plain(v: Any) -> Any:
+    return v.iso_format() if hasattr(v, "iso_format") else v
+
+
+# ------------------------------------------------------------
+# Compact summary for the agent
+# ------------------------------------------------------------
+def _index_entries(facts: Dict[str, Any]) -> List[Tuple[str, List[str], str]]:
+    """(label, properties, kind) of every online node index (uniqueness constraints included)."""
+    entries = []
+    for ix in facts["indexes"]:
+        if ix.get("entityType") not in (None, "NODE") or (ix.get("state") or "ONLINE") != "ONLINE":
+            continue
+        kind = "unique" if ix.get("owningConstraint") else str(ix.get("type") or "").lower()
+        for label in ix.get("labelsOrTypes") or []:
+            entries.append((label, list(ix.get("properties") or []), kind))
+    return entries
+
+
+def index_hints(facts: Dict[str, Any], large_label: int = 100_000) -> List[str]:
+    hints: List[str] = []
+    indexed: Dict[str, List[str]] = {}
+    for label, props, kind in _index_entries(facts):
+        indexed.setdefault(label, []).append(props[0] if len(props) == 1 else "(" + ", ".join(props) + ")")
+        if len(props) > 1:
+            hints.append(
+                f"{label}({', '.join(props)}) [{kind}]: nur mit Gleichheit auf allen Properties nutzbar, "
+                f"z.B. {{{', '.join(f'{p}: $' + p for p in props)}}}."
+            )
+    for label, info in facts["nodes"].items():
+        props = indexed.get(label)
+        if info["count"] >= large_label:
+            if props:
+                hints.append(
+                    f"{label} ({info['count']:,} Knoten): immer über {', '.join(sorted(set(props)))} filtern; "
+                    "Filter nur auf andere Properties scannen alle Knoten."
+                )
+            else:
+                hints.append(f"{label} ({info['count']:,} Knoten) hat keinen Index: nur über Beziehungen erreichen.")
+    dates = facts["data"].get("trip_dates")
+    if dates and dates.get("min"):
+        hints.append(
+            f"Trip-Daten nur von {dates['min']} bis {dates['max']}; Fragen außerhalb dieses Zeitraums haben keine Daten."
+        )
+        if facts["nodes"]["Trip"]["properties"].get("date", "").startswith("STRING"):
+            hints.append(
+                "t.date ist ein String: WHERE t.date >= '2022-01-01' AND t.date < '2022-02-01' nutzt den Index, "
+                "date(t.date) nicht."
+            )
+    return hints
+
+
+def summarize(facts: Dict[str, Any], notes: List[str]) -> Dict[str, Any]:
+    nodes = {
+        label: {"count": info["count"], "properties": info["properties"]}
+        for label, info in sorted(facts["nodes"].items())
+    }
+    relationships = {
+        rel: {"pattern": info["pattern"], "count": info["count"], "properties": info["properties"]}
+        for rel, info in sorted(facts["relationships"].items())
+    }
+    indexes = sorted({
+        f"{label}({', '.join(props)}) {kind}" for label, props, kind in _index_entries(facts)
+    })
+    constraints = sorted({
+        f"{':'.join(c.get('labelsOrTypes') or [])}({', '.join(c.get('properties') or [])}) {str(c.get('type') or '').lower()}"
+        for c in facts["constraints"]
+    })
+    return {
+        "nodes": nodes,
+        "relationships": relationships,
+        "indexes": indexes,
+        "constraints": constraints,
+        "data": facts["data"],
+        "hints": index_hints(facts),
+        "notes": notes,
+    }
+
+
+# ------------------------------------------------------------
+# Cache (refreshed when the ETL bumps the data version)
+# ------------------------------------------------------------
+class SchemaCache:
+    """
+    Keeps the summary of the last introspection. It is rebuilt when the graph
+    data version changes (ETL run) or after `ttl_seconds` (graphs without EtlMeta);
+    concurrent callers share one rebuild.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+        self._summary: Optional[Dict[str, Any]] = None
+        self._version: Any = None
+        self._built_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+        self.builds = 0
+        self.failures = 0
+
+    def fresh(self, version: Any) -> Optional[Dict[str, Any]]:
+        if self._summary is None or version != self._version:
+            return None
+        if time.monotonic() - self._built_at >= self.ttl_seconds:
+            return None
+        return self._summary
+
+    async def get(self, version: Any, build: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        summary = self.fresh(version)
+        if summary is not None:
+            return summary
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            summary = self.fresh(version)
+            if summary is not None:
+                return summary
+            try:
+                summary = await build()
+            except Exception:
+                self.failures += 1
+                raise
+            self._summary, self._version, self._built_at = summary, version, time.monotonic()
+            self.builds += 1
+            return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {"builds": self.builds, "failures": self.failures, "data_version": self._version}
@@ -1,14 +1,52 @@
 # server.py (refactored to use shared core library)
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Union
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
 from neo4j_tools_core import (
-    get_schema_core,
-    run_query_core,
+    close_async_driver,
+    close_cursor_core_async,
+    cursor_registry,
+    daily_brief_core_async,
+    encode_page,
+    encode_rows,
+    encode_summary,
+    fetch_page_core_async,
+    get_live_schema_core_async,
+    query_guard,
+    result_cache,
+    result_store,
+    single_flight,
+    open_cursor_core_async,
+    nearest_stops_core_async,
+    period_report_core_async,
+    route_health_core_async,
+    run_queries_core_async,
+    run_query_core_async,
+    run_query_to_handle_core_async,
+    stops_within_core_async,
+    should_store,
+    snapshot_compare_core_async,
+    snapshot_percentiles_core_async,
+    snapshot_top_k_core_async,
+    tenant_limiter,
+    warm_up_async,
 )
+from analytics_snapshot import SnapshotUnavailable
+from metrics import REGISTRY, observe_tool
+from query_cursors import CursorNotFound
+from query_guard import QueryRejected
+from result_store import HandleNotFound
+
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP(
     "neo4j-mcp-server",
@@ -16,20 +54,476 @@ mcp = FastMCP(
     json_response=True,
 )
 
+# Tool calls of one tenant share a concurrency budget (see TENANT_MAX_CONCURRENT_CALLS)
+TENANT_HEADER = "x-tenant-id"
+
+
+def _tenant(ctx: Optional[Context]) -> Optional[str]:
+    try:
+        request = ctx.request_context.request if ctx is not None else None
+    except ValueError:  # not inside a request
+        return None
+    headers = getattr(request, "headers", None)
+    return headers.get(TENANT_HEADER) if headers is not None else None
+
+
+def _instrumented(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Latency, outcome, rows and response size of a tool call -> /metrics."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException:
+            observe_tool(name, "error", time.perf_counter() - started)
+            raise
+        status = "rejected" if isinstance(result, dict) and "error" in result else "ok"
+        observe_tool(name, status, time.perf_counter() - started, result)
+        return result
+
+    return wrapper
+
+
+# Counters kept by the cache / single-flight / guard, read at scrape time
+REGISTRY.callback("mcp_result_cache_hits_total", "Result cache hits.", lambda: result_cache.hits, "counter")
+REGISTRY.callback("mcp_result_cache_misses_total", "Result cache misses.", lambda: result_cache.misses, "counter")
+REGISTRY.callback("mcp_result_cache_bytes", "Estimated size of the result cache.", lambda: result_cache.stats()["bytes"])
+REGISTRY.callback("mcp_single_flight_coalesced_total", "Executions saved by single-flight.", lambda: single_flight.coalesced, "counter")
+REGISTRY.callback("mcp_query_guard_rejected_total", "Queries rejected by the EXPLAIN guard.", lambda: query_guard.rejected, "counter")
+REGISTRY.callback("mcp_open_cursors", "Open server-side cursors.", lambda: cursor_registry.stats()["open"])
+REGISTRY.callback("mcp_result_handles", "Stored result handles.", lambda: result_store.stats()["handles"])
+REGISTRY.callback("mcp_result_store_bytes", "Estimated size of the stored results.", lambda: result_store.stats()["bytes"])
+REGISTRY.callback("mcp_result_store_evictions_total", "Result handles evicted to stay within the memory bound.", lambda: result_store.evictions, "counter")
+
+_SNAPSHOT_UNAVAILABLE = {
+    "error": "snapshot_unavailable",
+    "message": "Kein Analytics-Snapshot vorhanden. Für diese Frage run_query bzw. period_report nutzen.",
+}
+_HANDLE_NOT_FOUND = {"error": "handle_not_found", "message": "Ergebnis ist abgelaufen oder unbekannt. Query neu ausführen."}
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@mcp.custom_route("/results/{handle}", methods=["GET"])
+async def result_page(request: Request) -> JSONResponse:
+    """
+    Page of a stored result for the UI (not through the LLM):
+    ?offset=0&limit=100&order_by=col&descending=false&format=rows|columnar|dict
+    Only the tenant that stored the result (X-Tenant-Id header) can read it.
+    """
+    q = request.query_params
+    tenant = request.headers.get(TENANT_HEADER)
+    try:
+        async with tenant_limiter.slot(tenant):
+            page = result_store.slice(
+                request.path_params["handle"],
+                offset=int(q.get("offset", 0)),
+                limit=int(q.get("limit", 100)),
+                order_by=q.get("order_by") or None,
+                descending=q.get("descending", "false").lower() in ("1", "true", "yes"),
+                owner=tenant,
+            )
+        return JSONResponse(encode_page(page, q.get("format", "rows")))
+    except QueryRejected as exc:
+        return JSONResponse(exc.to_dict(), status_code=429)
+    except HandleNotFound:
+        return JSONResponse(_HANDLE_NOT_FOUND, status_code=404)
+    except ValueError as exc:
+        return JSONResponse({"error": "invalid_request", "message": str(exc)}, status_code=400)
+
 @mcp.tool()
-def get_schema() -> Dict[str, Any]:
-    """Statische Schema-Beschreibung (kein Neo4j-Call)."""
-    return get_schema_core()
+@_instrumented
+async def get_schema(ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """
+    Schema der Datenbank: Labels mit Anzahl und Property-Typen, Beziehungen, Indexe/Constraints,
+    Datumsbereich der Trips, größte Linien/Routen und Hinweise, welche Filter einen Index nutzen.
+    Wird pro ETL-Lauf einmal ermittelt und danach aus dem Cache geliefert.
+    """
+    async with tenant_limiter.slot(_tenant(ctx)):
+        return await get_live_schema_core_async()
 
 @mcp.tool()
-def run_query(
+@_instrumented
+async def run_query(
     cypher: str,
     parameters: Optional[Dict[str, Any]] = None,
     limit: int = 100,
     enforce_limit: bool = True,
-) -> List[Dict[str, Any]]:
-    """Führt eine Cypher-Query in Neo4j aus und gibt JSON-safe rows zurück."""
-    return run_query_core(cypher=cypher, parameters=parameters, limit=limit, enforce_limit=enforce_limit)
+    page_size: Optional[int] = None,
+    format: Literal["rows", "columnar", "dict"] = "rows",
+    store: Optional[bool] = None,
+    ctx: Optional[Context] = None,
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Führt eine Cypher-Query in Neo4j aus und gibt JSON-safe rows zurück.
+
+    Große Ergebnisse bleiben auf dem Server: mit store=True (limit wird dann ignoriert, bis zu
+    RESULT_STORE_MAX_ROWS Zeilen) oder automatisch ab RESULT_STORE_AUTO_ROWS Zeilen kommt statt der
+    Zeilen eine Zusammenfassung {"handle", "row_count", "columns", "column_stats", "preview"} zurück.
+    Details dann mit result_slice / result_aggregate(handle) statt die Query erneut auszuführen.
+    store=False liefert immer die Zeilen. format gilt dann für "preview".
+
+    Mit page_size (ohne LIMIT in der Query) wird das Ergebnis seitenweise geliefert:
+    {"columns", "rows", "offset", "has_more", "cursor"} – weitere Seiten mit fetch_page(cursor).
+    Ein Cursor lebt insgesamt höchstens QUERY_CURSOR_TIMEOUT_SECONDS (Standard 300 s) ab dem Start,
+    auch wenn fetch_page regelmäßig aufgerufen wird; danach kommt {"error": "query_timeout"}.
+
+    format="columnar" liefert {"columns", "data": [[...]]} statt einer Liste von Dicts,
+    format="dict" zusätzlich {"dictionaries": {spalte: [werte]}} – in "data" stehen dann Indizes
+    in diese Listen. Für große Ergebnisse deutlich kompakter.
+
+    Zu teure Queries (Kartesisches Produkt, Scan über alle Trips, unbegrenzte Pfade, zu viele
+    geschätzte Zeilen) werden vorab per EXPLAIN abgelehnt: {"error": "query_too_expensive",
+    "message", "reasons"}; Zeitüberschreitung: {"error": "query_timeout", "message"}.
+    Nur lesende Queries: Schreibzugriffe (CREATE, MERGE, SET, DELETE, ...) werden mit
+    {"error": "read_only", "message"} abgelehnt.
+    """
+    try:
+        tenant = _tenant(ctx)
+        async with tenant_limiter.slot(tenant):
+            if page_size:
+                page = await open_cursor_core_async(cypher=cypher, parameters=parameters, page_size=page_size, tenant=tenant)
+                return encode_page(page, format)
+            if store:
+                summary = await run_query_to_handle_core_async(
+                    cypher=cypher, parameters=parameters, enforce_limit=enforce_limit, tenant=tenant
+                )
+                return encode_summary(summary, format)
+            rows = await run_query_core_async(cypher=cypher, parameters=parameters, limit=limit, enforce_limit=enforce_limit)
+            if store is None and should_store(rows):
+                return encode_summary(result_store.put(rows, owner=tenant), format)
+            return encode_rows(rows, format)
+    except QueryRejected as exc:
+        return exc.to_dict()
+
+@mcp.tool()
+@_instrumented
+async def result_slice(
+    handle: str,
+    offset: int = 0,
+    limit: int = 50,
+    columns: Optional[List[str]] = None,
+    where: Optional[Dict[str, Any]] = None,
+    order_by: Optional[str] = None,
+    descending: bool = False,
+    format: Literal["rows", "columnar", "dict"] = "rows",
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Ausschnitt eines gespeicherten Ergebnisses (handle aus run_query), ohne Neo4j-Call.
+
+    where: Gleichheitsfilter {spalte: wert} (Liste = einer der Werte), order_by + descending sortiert,
+    columns wählt Spalten aus. Rückgabe: {"handle", "columns", "rows", "offset", "row_count", "has_more"}.
+    """
+    try:
+        tenant = _tenant(ctx)
+        async with tenant_limiter.slot(tenant):
+            page = result_store.slice(
+                handle, offset=offset, limit=limit, columns=columns, where=where, order_by=order_by,
+                descending=descending, owner=tenant,
+            )
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except HandleNotFound:
+        return dict(_HANDLE_NOT_FOUND)
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+    return encode_page(page, format)
+
+@mcp.tool()
+@_instrumented
+async def result_aggregate(
+    handle: str,
+    aggregates: Dict[str, str],
+    group_by: Optional[List[str]] = None,
+    where: Optional[Dict[str, Any]] = None,
+    order_by: Optional[str] = None,
+    descending: bool = True,
+    limit: int = 50,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Gruppiert ein gespeichertes Ergebnis (handle aus run_query) und berechnet Kennzahlen, ohne Neo4j-Call.
+
+    aggregates: {"name": "count(*)" | "count(spalte)" | "count_distinct(spalte)" | "sum(spalte)" |
+    "avg(spalte)" | "min(spalte)" | "max(spalte)"}, group_by: [spalten], where wie bei result_slice.
+    Sortiert standardmäßig absteigend nach der ersten Kennzahl.
+    Rückgabe: {"handle", "group_by", "groups", "rows", "has_more"}.
+    """
+    try:
+        tenant = _tenant(ctx)
+        async with tenant_limiter.slot(tenant):
+            return result_store.aggregate(
+                handle, aggregates, group_by=group_by, where=where, order_by=order_by, descending=descending,
+                limit=limit, owner=tenant,
+            )
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except HandleNotFound:
+        return dict(_HANDLE_NOT_FOUND)
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+@mcp.tool()
+@_instrumented
+async def run_queries(
+    statements: List[Dict[str, Any]],
+    snapshot: bool = False,
+    limit: int = 100,
+    format: Literal["rows", "columnar", "dict"] = "rows",
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Führt mehrere unabhängige Cypher-Queries in einem Aufruf aus (max. 10).
+
+    statements: [{"name": "trips", "cypher": "...", "parameters": {...}, "limit": 100}, ...]
+    (name, parameters und limit optional). Standard: parallel auf getrennten Sessions.
+    snapshot=True: nacheinander in einer Lese-Transaktion (konsistenter Datenstand, ohne Cache).
+
+    Rückgabe: {"mode", "ms", "results": {name: {"rows", "row_count", "ms"} oder {"error", "message", "ms"}}}.
+    Fehler einer Query betreffen nur deren Eintrag; im Snapshot-Modus bricht ein Datenbankfehler
+    die Transaktion ab, folgende Queries melden "transaction_aborted".
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            out = await run_queries_core_async(statements=statements, limit=limit, snapshot=snapshot)
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_statements", "message": str(exc)}
+    if format != "rows":
+        for result in out["results"].values():
+            if "rows" in result:
+                result["rows"] = encode_rows(result["rows"], format)
+    return out
+
+@mcp.tool()
+@_instrumented
+async def fetch_page(
+    cursor: str,
+    page_size: int = 100,
+    format: Literal["rows", "columnar", "dict"] = "rows",
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Nächste Seite eines Cursors aus run_query(page_size=...). Cursor laufen nach Inaktivität ab und
+    insgesamt nach QUERY_CURSOR_TIMEOUT_SECONDS ab dem Start ({"error": "query_timeout"}).
+    Bricht die Query ab, wird der Cursor geschlossen: {"error", "message"}.
+    """
+    try:
+        tenant = _tenant(ctx)
+        async with tenant_limiter.slot(tenant):
+            page = await fetch_page_core_async(cursor=cursor, page_size=page_size, tenant=tenant)
+            return encode_page(page, format)
+    except CursorNotFound:
+        return {"error": "cursor_not_found", "message": "Cursor ist abgelaufen oder vollständig gelesen. Query neu starten."}
+    except QueryRejected as exc:
+        return exc.to_dict()
+
+@mcp.tool()
+@_instrumented
+async def close_cursor(cursor: str, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """Schließt einen Cursor vorzeitig (gibt die Neo4j-Session frei)."""
+    return {"closed": await close_cursor_core_async(cursor, tenant=_tenant(ctx))}
+
+@mcp.tool()
+@_instrumented
+async def daily_brief(date: str, top: int = 5, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """
+    Tagesbericht aus vorberechneten Statistiken (date: 'YYYY-MM-DD'): Anzahl Trips,
+    Mittel/Median/P90 der Trip-Dauer, früheste/späteste Startzeit, busiest hour (lokale Uhrzeit wie gespeichert),
+    die langsamsten Routen und die Stops mit den längsten Haltezeiten. Schneller als eigene Cypher.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await daily_brief_core_async(date=date, top=top)
+    except QueryRejected as exc:
+        return exc.to_dict()
+
+@mcp.tool()
+@_instrumented
+async def route_health(route_id: str, date: str, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """
+    Health Card einer Route an einem Tag aus vorberechneten Statistiken: Trips,
+    Mittel/Median/P90, früheste/späteste Startzeit und Vergleich mit dem typischen Mittelwert der Route.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await route_health_core_async(route_id=route_id, date=date)
+    except QueryRejected as exc:
+        return exc.to_dict()
+
+@mcp.tool()
+@_instrumented
+async def period_report(date_from: str, date_to: str, top: int = 10, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """
+    Zeitraum-Bericht (z.B. Monat) aus vorberechneten Tagesstatistiken, beide Daten inklusive:
+    Trips gesamt, mittlere Trip-Dauer, Top-Routen nach Volumen, Stops mit längsten Haltezeiten.
+    Median/P90 über Zeiträume liefert dieses Tool nicht (dafür run_query).
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await period_report_core_async(date_from=date_from, date_to=date_to, top=top)
+    except QueryRejected as exc:
+        return exc.to_dict()
+
+@mcp.tool()
+@_instrumented
+async def nearest_stops(
+    lat: float, lon: float, k: int = 5, max_distance_m: float = 5000, ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Die k nächstgelegenen Stops zu einer Koordinate (WGS-84 Grad, max. 100), Luftlinie in Metern,
+    nächster zuerst; nur Stops innerhalb max_distance_m. Nutzt den Point-Index auf Stop.location.
+    Rückgabe: {"lat", "lon", "radius_m", "stops": [{"stop_id", "lau", "lat", "lon", "distance_m"}]}.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await nearest_stops_core_async(lat=lat, lon=lon, k=k, max_distance_m=max_distance_m)
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+@mcp.tool()
+@_instrumented
+async def stops_within(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int = 500, ctx: Optional[Context] = None
+) -> Dict[str, Any]:
+    """
+    Alle Stops in einem Rechteck (Südwest-Ecke min_lat/min_lon, Nordost-Ecke max_lat/max_lon, WGS-84 Grad).
+    Nutzt den Point-Index auf Stop.location. Für Segmente im Gebiet die stop_ids weiterverwenden
+    (TravelSegment.from_stop_id / to_stop_id, length_m, HAS_SEGMENT.segment_mean_speed_mps).
+    Rückgabe: {"bbox", "stop_count", "truncated", "stops": [{"stop_id", "lau", "lat", "lon"}]}.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await stops_within_core_async(
+                min_lat=min_lat, min_lon=min_lon, max_lat=max_lat, max_lon=max_lon, limit=limit
+            )
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+@mcp.tool()
+@_instrumented
+async def snapshot_percentiles(
+    table: Literal["trips", "dwell", "travel"],
+    date_from: str,
+    date_to: Optional[str] = None,
+    group_by: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    percentiles: Optional[List[float]] = None,
+    order_by: str = "count",
+    descending: bool = True,
+    min_count: int = 1,
+    top: int = 20,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Anzahl, Mittel, Min/Max und Perzentile (Standard: p50, p90) der Dauern in Sekunden aus dem
+    spaltenbasierten Snapshot (Millisekunden statt Graph-Aggregation). table: trips (Trip-Dauer),
+    dwell (Haltezeit je Stop-Ereignis) oder travel (Fahrzeit je Segment-Ereignis).
+
+    date_from/date_to: 'YYYY', 'YYYY-MM' oder 'YYYY-MM-DD', beide inklusive (date_to optional).
+    group_by: route_id, line, stop_id (dwell), segment_id (travel), trip_id (trips), day, month,
+    hour (Startstunde, lokale Uhrzeit wie gespeichert) oder weekday. filters: {"route_id": "2852", "line": [...], "hour": [7, 8]}.
+    order_by: count, mean, min, max, p50, p90, ... oder key. Gruppen mit weniger als min_count Werten fallen weg.
+    Rückgabe ohne group_by: {"stats"}, mit group_by: {"group_by", "groups", "rows", "has_more"}; plus "snapshot".
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await snapshot_percentiles_core_async(
+                table=table, date_from=date_from, date_to=date_to, group_by=group_by, filters=filters,
+                percentiles=percentiles, order_by=order_by, descending=descending, min_count=min_count, top=top,
+            )
+    except SnapshotUnavailable:
+        return dict(_SNAPSHOT_UNAVAILABLE)
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+@mcp.tool()
+@_instrumented
+async def snapshot_top_k(
+    table: Literal["trips", "dwell", "travel"],
+    date_from: str,
+    date_to: Optional[str] = None,
+    k: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    longest: bool = True,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Die k längsten (longest=False: kürzesten) Trips / Haltezeiten / Segment-Fahrten eines Zeitraums
+    aus dem Snapshot, mit IDs, Start-/Endzeit und Abstand zum Median des Zeitraums
+    (delta_vs_median_seconds, ratio_to_median). Für "ungewöhnlich lange Trips an Tag X" date_from = Tag.
+    filters wie bei snapshot_percentiles. Rückgabe: {"median_seconds", "rows", "snapshot"}.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await snapshot_top_k_core_async(
+                table=table, date_from=date_from, date_to=date_to, k=k, filters=filters, longest=longest
+            )
+    except SnapshotUnavailable:
+        return dict(_SNAPSHOT_UNAVAILABLE)
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+@mcp.tool()
+@_instrumented
+async def snapshot_compare(
+    table: Literal["trips", "dwell", "travel"],
+    period_a: List[str],
+    period_b: List[str],
+    group_by: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    min_count: int = 5,
+    top: int = 5,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """
+    Vergleicht Zeitraum A (Basis) mit Zeitraum B aus dem Snapshot: Anzahl, Mittel, Median, p90 und Deltas (B - A).
+    Zeitraum: ["2023-03-06", "2023-03-12"] oder ["2022"] / ["2023-02"].
+    Mit group_by (z.B. route_id): "improved"/"worsened" = Gruppen mit der größten Änderung des Mittelwerts
+    (mind. min_count Werte in beiden Zeiträumen) und "slowest_a"/"slowest_b" = langsamste Gruppen je Zeitraum.
+    """
+    try:
+        async with tenant_limiter.slot(_tenant(ctx)):
+            return await snapshot_compare_core_async(
+                table=table, period_a=period_a, period_b=period_b, group_by=group_by, filters=filters,
+                min_count=min_count, top=top,
+            )
+    except SnapshotUnavailable:
+        return dict(_SNAPSHOT_UNAVAILABLE)
+    except QueryRejected as exc:
+        return exc.to_dict()
+    except ValueError as exc:
+        return {"error": "invalid_request", "message": str(exc)}
+
+
+async def main() -> None:
+    # Driver + Pool im selben Event-Loop wie der HTTP-Server anlegen und vorwärmen
+    try:
+        await warm_up_async()
+    except Exception as exc:
+        logger.warning("Neo4j warm-up failed (%s); connections will be opened on demand.", exc)
+    sweeper = asyncio.create_task(cursor_registry.run_sweeper())
+    try:
+        await mcp.run_streamable_http_async()
+    finally:
+        sweeper.cancel()
+        await close_async_driver()
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http")
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Micro-benchmark for the row serializer in APP/Server/neo4j_tools_core.py.
+
+Builds a synthetic result of neo4j Records (trip-like rows with DateTime values)
+and compares the former recursive `to_json(record.data())` with the
+type-dispatched `record_to_json(record)`.
+
+    python Benchmarking/bench_serializer.py --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, List
+
+from neo4j import Record
+from neo4j.time import DateTime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "APP", "Server"))
+
+from neo4j_tools_core import record_to_json  # noqa: E402
+
+
+def legacy_to_json(v: Any) -> Any:
+    """The recursive converter as it was before the dispatch table."""
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+    if isinstance(v, (list, tuple)):
+        return [legacy_to_json(x) for x in v]
+    if isinstance(v, dict):
+        return {k: legacy_to_json(val) for k, val in v.items()}
+    if hasattr(v, "iso_format") and callable(getattr(v, "iso_format")):
+        try:
+            return v.iso_format()
+        except Exception:
+            pass
+    if hasattr(v, "isoformat") and callable(getattr(v, "isoformat")):
+        try:
+            return v.isoformat()
+        except Exception:
+            pass
+    try:
+        return legacy_to_json(dict(v))
+    except Exception:
+        return str(v)
+
+
+def make_records(n: int) -> List[Record]:
+    keys = ["trip_id", "route_id", "line", "start_time", "end_time", "duration_seconds", "stops"]
+    records = []
+    for i in range(n):
+        start = DateTime(2022, 3, 17, 7, i % 60, i % 60, tzinfo=None)
+        end = DateTime(2022, 3, 17, 8, i % 60, i % 60, tzinfo=None)
+        values = [f"QBUZZ:{i}:0", str(i % 400), f"QBUZZ:g{i % 40:03d}", start, end, float(i % 3000), [i, i + 1, i + 2]]
+        records.append(Record(zip(keys, values)))
+    return records
+
+
+def bench(name: str, fn: Callable[[Record], Any], records: List[Record], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for r in records:
+            fn(r)
+        best = min(best, time.perf_counter() - t0)
+    rate = len(records) / best
+    print(f"{name:<28} {best * 1000:9.1f} ms   {rate:12,.0f} rows/s")
+    return rate
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    records = make_records(args.rows)
+    assert legacy_to_json(records[0].data()) == record_to_json(records[0])
+
+    before = bench("legacy to_json(data())", lambda r: legacy_to_json(r.data()), records, args.repeat)
+    after = bench("record_to_json(record)", record_to_json, records, args.repeat)
+    print(f"speed-up: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Regression cases for the Cypher rewriter in APP/Server/cypher_rewriter.py and
+the read-only check in APP/Server/query_cache.py.
+
+Every rewrite case is an input query, the expected rewritten query and the
+expected parameters; every read-only case a query and whether it only reads.
+A mismatch is printed and the script exits with 1.
+
+    python Benchmarking/check_rewriter.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "APP", "Server"))
+
+from cypher_rewriter import rewrite_cypher  # noqa: E402
+from query_cache import is_read_only  # noqa: E402
+
+CASES: List[Tuple[str, str, Dict[str, Any]]] = [
+    (
+        "MATCH (t:Trip) WHERE date(t.date) >= date('2022-01-01') RETURN count(t) AS n",
+        "MATCH (t:Trip) WHERE t.date >= $rw_0 RETURN count(t) AS n",
+        {"rw_0": "2022-01-01"},
+    ),
+    (
+        "MATCH (t:Trip) WHERE date(t.date).year = 2022 RETURN count(t) AS n",
+        "MATCH (t:Trip) WHERE (t.date >= $rw_0 AND t.date < $rw_1) RETURN count(t) AS n",
+        {"rw_0": "2022-01-01", "rw_1": "2023-01-01"},
+    ),
+    (
+        "MATCH (t:Trip) WHERE toString(t.route_id) = '12' AND t.travel_time_seconds > 600 RETURN t LIMIT 10",
+        "MATCH (t:Trip) WHERE t.route_id = $rw_0 AND t.travel_time_seconds > $rw_1 RETURN t LIMIT 10",
+        {"rw_0": "12", "rw_1": 600},
+    ),
+    # var-length bounds, quantified path patterns and path selectors only take literals
+    (
+        "MATCH p = (a:Stop)-[:NEXT*1..3]->(b:Stop) RETURN p",
+        "MATCH p = (a:Stop)-[:NEXT*1..3]->(b:Stop) RETURN p",
+        {},
+    ),
+    (
+        "MATCH p = ((a:Stop)-[:X]->(b:Stop)){1,3} RETURN p",
+        "MATCH p = ((a:Stop)-[:X]->(b:Stop)){1,3} RETURN p",
+        {},
+    ),
+    (
+        "MATCH p = (a:Stop)-[:X]->{2,}(b:Stop) WHERE a.stop_id = 'A' RETURN length(p) > 2 AS long",
+        "MATCH p = (a:Stop)-[:X]->{2,}(b:Stop) WHERE a.stop_id = $rw_0 RETURN length(p) > $rw_1 AS long",
+        {"rw_0": "A", "rw_1": 2},
+    ),
+    (
+        "MATCH p = SHORTEST 2 (a:Stop {stop_id: 'A'})-[:X]-+(b:Stop) RETURN p SKIP 1 LIMIT 3",
+        "MATCH p = SHORTEST 2 (a:Stop {stop_id: $rw_0})-[:X]-+(b:Stop) RETURN p SKIP 1 LIMIT 3",
+        {"rw_0": "A"},
+    ),
+    (
+        "RETURN {a: 1, b: [2, 3.5]} AS m",
+        "RETURN {a: $rw_0, b: [$rw_1, $rw_2]} AS m",
+        {"rw_0": 1, "rw_1": 2, "rw_2": 3.5},
+    ),
+]
+
+# write keywords inside string literals, backtick names and comments are no writes
+READ_ONLY_CASES: List[Tuple[str, bool]] = [
+    ("MATCH (s:Stop) WHERE s.lau = 'Merge' RETURN s.stop_id", True),
+    ("MATCH (s:Stop {stop_id:'NL:Drop'}) RETURN s", True),
+    ("MATCH (s:Stop) RETURN s.name AS `create`", True),
+    ('MATCH (s:Stop) WHERE s.name = "it\\"s set" RETURN s', True),
+    ("MATCH (s:Stop) // delete later\nRETURN s /* set */", True),
+    ("MATCH (s:Stop) WHERE s.name = '//' SET s.x = 1", False),
+    ("CREATE (n:Stop {stop_id: 'A'})", False),
+    ("MATCH (n) DETACH DELETE n", False),
+]
+
+
+def main() -> int:
+    failed = 0
+    for cypher, expected, parameters in CASES:
+        result = rewrite_cypher(cypher)
+        if (result.cypher, result.parameters) != (expected, parameters):
+            failed += 1
+            print(f"FAIL {cypher}\n  expected: {expected} {parameters}\n  actual:   {result.cypher} {result.parameters}")
+    for cypher, read_only in READ_ONLY_CASES:
+        if is_read_only(cypher) != read_only:
+            failed += 1
+            print(f"FAIL is_read_only({cypher!r}) != {read_only}")
+    total = len(CASES) + len(READ_ONLY_CASES)
+    print(f"{total - failed}/{total} cases ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Recorded / replayed Neo4j stand-in for offline benchmarks.
+
+A cassette maps (normalized Cypher, parameters) to the columns and JSON-safe
+rows Neo4j returned. `ReplayStore` hands out sync and async session objects
+that implement the small part of the driver API used by neo4j_tools_core
+(`run`, `execute_read`, result iteration/`fetch`/`peek`/`single`/`consume`).
+
+Modes:
+- "replay": answer from the cassette, unknown queries raise ReplayMiss
+- "record": run against the real driver and store what came back
+- "seed":   answer with rows provided by the caller (`store.seed(rows)`) and
+            store them, e.g. the expected rows from benchmark_with_answers.json
+
+EXPLAIN queries (the server's cost guard) are never stored: replay/seed answer
+them with an empty result whose summary has no plan (the guard lets them pass),
+record asks the real driver and passes its plan through.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from neo4j import Record
+
+from query_cache import normalize_cypher
+
+
+class ReplayMiss(KeyError):
+    """Query is not in the cassette."""
+
+
+_EXPLAIN_RE = re.compile(r"(?i)\s*explain\b")
+
+
+def _is_explain(cypher: str) -> bool:
+    return _EXPLAIN_RE.match(cypher) is not None
+
+
+def cassette_key(cypher: str, parameters: Optional[Dict[str, Any]]) -> str:
+    payload = normalize_cypher(cypher) + "\n" + json.dumps(parameters or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _Summary:
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        self.result_available_after = entry.get("available_after_ms")
+        self.result_consumed_after = entry.get("consumed_after_ms")
+        self.plan = entry.get("plan")
+        self.profile = None
+        self.notifications: List[Any] = []
+
+
+class _Entry:
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        self.keys = list(entry.get("keys") or [])
+        self.records = [Record(zip(self.keys, values)) for values in entry.get("rows") or []]
+        self.summary = _Summary(entry)
+
+
+class ReplayResult:
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        e = _Entry(entry)
+        self._keys = e.keys
+        self._records = e.records
+        self._pos = 0
+        self._summary = e.summary
+
+    def keys(self) -> List[str]:
+        return self._keys
+
+    def __iter__(self) -> Iterator[Record]:
+        while self._pos < len(self._records):
+            self._pos += 1
+            yield self._records[self._pos - 1]
+
+    def single(self) -> Optional[Record]:
+        return self._records[0] if self._records else None
+
+    def consume(self) -> _Summary:
+        self._pos = len(self._records)
+        return self._summary
+
+
+class AsyncReplayResult(ReplayResult):
+    async def keys(self) -> List[str]:  # type: ignore[override]
+        return self._keys
+
+    def __aiter__(self) -> "AsyncReplayResult":
+        return self
+
+    async def __anext__(self) -> Record:
+        if self._pos >= len(self._records):
+            raise StopAsyncIteration
+        self._pos += 1
+        return self._records[self._pos - 1]
+
+    async def fetch(self, n: int) -> List[Record]:
+        out = self._records[self._pos:self._pos + n]
+        self._pos += len(out)
+        return out
+
+    async def peek(self) -> Optional[Record]:
+        return self._records[self._pos] if self._pos < len(self._records) else None
+
+    async def single(self) -> Optional[Record]:  # type: ignore[override]
+        return self._records[0] if self._records else None
+
+    async def consume(self) -> _Summary:  # type: ignore[override]
+        self._pos = len(self._records)
+        return self._summary
+
+
+def is_seeded(entry: Dict[str, Any]) -> bool:
+    """Entry holds the expected rows instead of a Neo4j result (older cassettes: no server timings)."""
+    if "seeded" in entry:
+        return bool(entry["seeded"])
+    return entry.get("available_after_ms") is None and entry.get("consumed_after_ms") is None
+
+
+class ReplayStore:
+    def __init__(self, path: Optional[str] = None, mode: str = "replay") -> None:
+        if mode not in ("replay", "record", "seed"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.misses = 0
+        self.seeded_hits = 0  # answers that came from seeded (expected) rows, not from Neo4j
+        self._seed_rows: Optional[List[Dict[str, Any]]] = None
+        self._real_sync: Optional[Callable[[], Any]] = None
+        self._real_async: Optional[Callable[..., Any]] = None
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+
+    # ---------- setup ----------
+    def use_real_driver(self, sync_factory: Callable[[], Any], async_factory: Callable[..., Any]) -> None:
+        """Sessions of the real driver, needed for mode="record"."""
+        self._real_sync = sync_factory
+        self._real_async = async_factory
+
+    def seed(self, rows: Optional[List[Dict[str, Any]]]) -> None:
+        """Rows to answer (and store) for the next query in mode="seed"."""
+        self._seed_rows = rows
+
+    def save(self) -> None:
+        if not self.path or not self.dirty:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        self.dirty = False
+
+    def session(self) -> "ReplaySession":
+        return ReplaySession(self)
+
+    def async_session(self, **_overrides: Any) -> "AsyncReplaySession":
+        return AsyncReplaySession(self)
+
+    # ---------- lookup ----------
+    def lookup(self, cypher: str, parameters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        key = cassette_key(cypher, parameters)
+        entry = self.entries.get(key)
+        if self.mode == "seed" and self._seed_rows is not None:
+            rows = self._seed_rows
+            keys = list(rows[0].keys()) if rows else (entry or {}).get("keys", [])
+            entry = self._store(key, cypher, parameters, keys, [[r.get(k) for k in keys] for r in rows], seeded=True)
+        if entry is None:
+            self.misses += 1
+            raise ReplayMiss(normalize_cypher(cypher)[:200])
+        if is_seeded(entry):
+            self.seeded_hits += 1
+        return entry
+
+    def _store(
+        self,
+        key: str,
+        cypher: str,
+        parameters: Optional[Dict[str, Any]],
+        keys: List[str],
+        rows: List[List[Any]],
+        available_after_ms: Optional[float] = None,
+        consumed_after_ms: Optional[float] = None,
+        seeded: bool = False,
+    ) -> Dict[str, Any]:
+        entry = {
+            "cypher": normalize_cypher(cypher),
+            "parameters": parameters or {},
+            "keys": keys,
+            "rows": rows,
+            "available_after_ms": available_after_ms,
+            "consumed_after_ms": consumed_after_ms,
+            "seeded": seeded,
+        }
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def record(self, cypher: str, parameters: Optional[Dict[str, Any]], keys: List[str], records: List[Any], summary: Any) -> Dict[str, Any]:
+        from neo4j_tools_core import record_to_json
+
+        rows = [list(record_to_json(r).values()) for r in records]
+        return self._store(
+            cassette_key(cypher, parameters), cypher, parameters, keys, rows,
+            getattr(summary, "result_available_after", None),
+            getattr(summary, "result_consumed_after", None),
+        )
+
+
+class ReplaySession:
+    def __init__(self, store: ReplayStore) -> None:
+        self.store = store
+
+    def __enter__(self) -> "ReplaySession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def run(self, cypher: Any, parameters: Optional[Dict[str, Any]] = None, **kwargs: Any) -> ReplayResult:
+        cypher = getattr(cypher, "text", cypher)
+        params = {**(parameters or {}), **kwargs}
+        if self.store.mode == "record":
+            with self.store._real_sync() as real:
+                result = real.run(cypher, params)
+                keys = list(result.keys())
+                records = list(result)
+                summary = result.consume()
+            if _is_explain(cypher):
+                return ReplayResult({"plan": summary.plan})
+            return ReplayResult(self.store.record(cypher, params, keys, records, summary))
+        if _is_explain(cypher):
+            return ReplayResult({})
+        return ReplayResult(self.store.lookup(cypher, params))
+
+    def execute_read(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return fn(self, *args, **kwargs)
+
+
+class AsyncReplaySession:
+    def __init__(self, store: ReplayStore) -> None:
+        self.store = store
+
+    async def __aenter__(self) -> "AsyncReplaySession":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        pass
+
+    async def run(self, cypher: Any, parameters: Optional[Dict[str, Any]] = None, **kwargs: Any) -> AsyncReplayResult:
+        cypher = getattr(cypher, "text", cypher)
+        params = {**(parameters or {}), **kwargs}
+        if self.store.mode == "record":
+            async with self.store._real_async() as real:
+                result = await real.run(cypher, params)
+                keys = list(await result.keys())
+                records = [r async for r in result]
+                summary = await result.consume()
+            if _is_explain(cypher):
+                return AsyncReplayResult({"plan": summary.plan})
+            return AsyncReplayResult(self.store.record(cypher, params, keys, records, summary))
+        if _is_explain(cypher):
+            return AsyncReplayResult({})
+        return AsyncReplayResult(self.store.lookup(cypher, params))
+
+    async def execute_read(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await fn(self, *args, **kwargs)
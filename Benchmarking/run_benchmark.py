@@ -0,0 +1,444 @@
+"""
+Replay Benchmarking/benchmark_with_answers.json against the tool layer or the agent.
+
+Modes:
+  tools   every query_N through run_query_core: latency p50/p95/p99, rows,
+          serialized bytes and whether the rows match correct_response_N
+          ("seeded" when the cassette answer is that expected response itself)
+  agent   every question through run_agent_turn (in-process MCP server):
+          wall time, LLM time vs tool time, number of tool calls
+
+Both modes run offline by default: Neo4j is replaced by a cassette
+(Benchmarking/replay_neo4j.py), seeded from the expected answers on first use,
+and the agent uses a scripted model that issues the benchmark's reference
+queries. `--live` talks to the configured Neo4j (add `--record` to refresh the
+cassette), `--model gpt-5.1` uses a real LLM.
+
+    python Benchmarking/run_benchmark.py tools --repeat 20 --out bench_tools.json
+    python Benchmarking/run_benchmark.py agent --out bench_agent.json
+    python Benchmarking/run_benchmark.py tools --baseline bench_tools.json   # exit 1 on regressions
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "APP", "Server"))
+sys.path.insert(0, os.path.join(ROOT, "APP", "Agent"))
+
+import neo4j_tools_core as core  # noqa: E402
+from replay_neo4j import ReplayMiss, ReplayStore  # noqa: E402
+
+DEFAULT_QUESTIONS = os.path.join(HERE, "benchmark_with_answers.json")
+DEFAULT_CASSETTE = os.path.join(HERE, "neo4j_cassette.json")
+QUERY_LIMIT = 1000
+
+
+# ============================================================
+# helpers
+# ============================================================
+def load_questions(path: str, only: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    if only:
+        questions = [q for q in questions if q["id"] in only]
+    return questions
+
+
+def queries_of(question: Dict[str, Any]) -> List[Tuple[int, str, Optional[List[Dict[str, Any]]]]]:
+    out = []
+    n = 1
+    while f"query_{n}" in question:
+        out.append((n, question[f"query_{n}"], question.get(f"correct_response_{n}")))
+        n += 1
+    return out
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    xs = sorted(values)
+    k = (len(xs) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def latency_stats(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "n": len(values),
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": max(values) if values else None,
+    }
+
+
+def _norm(v: Any) -> Any:
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, (int, float)):
+        return round(float(v), 6)
+    if isinstance(v, list):
+        return [_norm(x) for x in v]
+    if isinstance(v, dict):
+        return {k: _norm(x) for k, x in v.items()}
+    return v
+
+
+def compare_rows(actual: List[Dict[str, Any]], expected: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    """'exact', 'unordered' (same rows, other order) or 'mismatch'; None without reference."""
+    if expected is None:
+        return None
+    a, e = _norm(actual), _norm(expected)
+    if a == e:
+        return "exact"
+    key = lambda r: json.dumps(r, sort_keys=True, default=str)  # noqa: E731
+    if sorted(map(key, a)) == sorted(map(key, e)):
+        return "unordered"
+    return "mismatch"
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def install_store(args: argparse.Namespace) -> Optional[ReplayStore]:
+    """Replace the Neo4j sessions in neo4j_tools_core with the cassette stand-in."""
+    if args.live and not args.record:
+        return None
+    store = ReplayStore(args.cassette, mode="record" if args.record else "replay")
+    if args.record:
+        store.use_real_driver(core.get_session, core.get_async_session)
+    core.set_session_factories(store.session, store.async_session)
+    return store
+
+
+def seed_cassette(store: Optional[ReplayStore], questions: List[Dict[str, Any]]) -> int:
+    """Make sure every reference query is in the cassette (expected rows stand in for Neo4j)."""
+    if store is None or store.mode != "replay":
+        return 0
+    seeded = 0
+    for q in questions:
+        for _, cypher, expected in queries_of(q):
+            try:
+                core.run_query_core(cypher, limit=QUERY_LIMIT, use_cache=False)
+            except ReplayMiss:
+                store.mode = "seed"
+                store.seed(expected or [])
+                try:
+                    core.run_query_core(cypher, limit=QUERY_LIMIT, use_cache=False)
+                finally:
+                    store.seed(None)
+                    store.mode = "replay"
+                seeded += 1
+    store.save()
+    return seeded
+
+
+# ============================================================
+# mode: tools
+# ============================================================
+def _match(
+    rows: List[Dict[str, Any]], expected: Optional[List[Dict[str, Any]]], error: Optional[str], seeded: bool
+) -> Optional[str]:
+    """compare_rows, but "seeded" if the rows came from the expected answer itself (nothing was checked)."""
+    if error is not None:
+        return None
+    return "seeded" if seeded else compare_rows(rows, expected)
+
+
+def run_tools(args: argparse.Namespace, questions: List[Dict[str, Any]], store: Optional[ReplayStore]) -> Dict[str, Any]:
+    results = []
+    all_latencies: List[float] = []
+    for q in questions:
+        for n, cypher, expected in queries_of(q):
+            latencies: List[float] = []
+            rows: List[Dict[str, Any]] = []
+            error = None
+            seeded_before = store.seeded_hits if store is not None else 0
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                try:
+                    rows = core.run_query_core(cypher, limit=QUERY_LIMIT, use_cache=False)
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                    break
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            all_latencies.extend(latencies)
+            results.append({
+                "id": f"{q['id']}.{n}",
+                "latency": latency_stats(latencies),
+                "rows": len(rows),
+                "bytes": len(json.dumps(rows, ensure_ascii=False, separators=(",", ":"))),
+                "match": _match(rows, expected, error, store is not None and store.seeded_hits > seeded_before),
+                "error": error,
+            })
+        print(f"  {q['id']}: {len(queries_of(q))} queries", file=sys.stderr)
+
+    matched = [r for r in results if r["match"] in ("exact", "unordered")]
+    return {
+        "summary": {
+            "queries": len(results),
+            "errors": sum(1 for r in results if r["error"]),
+            "matched": len(matched),
+            "seeded": sum(1 for r in results if r["match"] == "seeded"),
+            "latency": latency_stats(all_latencies),
+            "total_bytes": sum(r["bytes"] for r in results),
+        },
+        "results": results,
+    }
+
+
+# ============================================================
+# mode: agent
+# ============================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mcp_server(port: int) -> str:
+    """Run the FastMCP app from APP/Server in a background thread (same process -> same stand-in)."""
+    from server import mcp
+
+    mcp.settings.host = "127.0.0.1"
+    mcp.settings.port = port
+    thread = threading.Thread(target=lambda: asyncio.run(mcp.run_streamable_http_async()), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                break
+        except OSError:
+            time.sleep(0.1)
+    return f"http://127.0.0.1:{port}/mcp"
+
+
+def make_scripted_model(calls: List[Dict[str, Any]], answer: str):
+    """Stub LLM: issues the given run_query calls one per step, then answers."""
+    from agents import Model, ModelResponse, Usage
+    from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+
+    class ScriptedModel(Model):
+        def __init__(self) -> None:
+            self.step = 0
+
+        async def get_response(self, *args: Any, **kwargs: Any) -> ModelResponse:
+            self.step += 1
+            if self.step <= len(calls):
+                output: List[Any] = [ResponseFunctionToolCall(
+                    arguments=json.dumps(calls[self.step - 1]),
+                    call_id=f"call_{self.step}",
+                    name="run_query",
+                    type="function_call",
+                    id=f"fc_{self.step}",
+                    status="completed",
+                )]
+            else:
+                output = [ResponseOutputMessage(
+                    id="msg_final",
+                    content=[ResponseOutputText(annotations=[], text=answer, type="output_text")],
+                    role="assistant",
+                    status="completed",
+                    type="message",
+                )]
+            return ModelResponse(output=output, usage=Usage(requests=1), response_id=None)
+
+        def stream_response(self, *args: Any, **kwargs: Any):
+            raise NotImplementedError("ScriptedModel does not stream")
+
+    return ScriptedModel()
+
+
+def make_timing_hooks():
+    from agents import RunHooks
+
+    class TimingHooks(RunHooks):
+        def __init__(self) -> None:
+            self.llm_ms = 0.0
+            self.tool_ms = 0.0
+            self.llm_calls = 0
+            self._llm_t0: Optional[float] = None
+            self._tool_t0: List[float] = []
+
+        async def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+            self._llm_t0 = time.perf_counter()
+
+        async def on_llm_end(self, *args: Any, **kwargs: Any) -> None:
+            if self._llm_t0 is not None:
+                self.llm_ms += (time.perf_counter() - self._llm_t0) * 1000.0
+                self.llm_calls += 1
+                self._llm_t0 = None
+
+        async def on_tool_start(self, *args: Any, **kwargs: Any) -> None:
+            self._tool_t0.append(time.perf_counter())
+
+        async def on_tool_end(self, *args: Any, **kwargs: Any) -> None:
+            if self._tool_t0:
+                self.tool_ms += (time.perf_counter() - self._tool_t0.pop()) * 1000.0
+
+    return TimingHooks()
+
+
+def run_agent(args: argparse.Namespace, questions: List[Dict[str, Any]], store: Optional[ReplayStore]) -> Dict[str, Any]:
+    from agents import SQLiteSession
+    from agent_runtime import AgentRuntime, run_agent_turn
+
+    mcp_url = args.mcp_url or start_mcp_server(args.port or _free_port())
+    runtime = AgentRuntime()
+    results = []
+    walls: List[float] = []
+    try:
+        for q in questions:
+            calls = [{"cypher": c, "limit": QUERY_LIMIT} for _, c, _ in queries_of(q)]
+            model: Any = args.model or make_scripted_model(calls, answer=f"{q['id']} done")
+            hooks = make_timing_hooks()
+            session = SQLiteSession(f"bench_{q['id']}")
+            error = None
+            trace: List[Dict[str, Any]] = []
+            t0 = time.perf_counter()
+            try:
+                _, trace = runtime.run(run_agent_turn(
+                    user_text=q["question"],
+                    session=session,
+                    mcp_url=mcp_url,
+                    model=model,
+                    runtime=runtime,
+                    hooks=hooks,
+                ))
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            wall = (time.perf_counter() - t0) * 1000.0
+            walls.append(wall)
+            results.append({
+                "id": q["id"],
+                "wall_ms": wall,
+                "llm_ms": hooks.llm_ms,
+                "tool_ms": hooks.tool_ms,
+                "llm_calls": hooks.llm_calls,
+                "tool_calls": sum(1 for t in trace if t.get("type") == "tool_call"),
+                "error": error,
+            })
+            print(f"  {q['id']}: {wall:.1f} ms", file=sys.stderr)
+    finally:
+        runtime.close()
+
+    return {
+        "summary": {
+            "questions": len(results),
+            "errors": sum(1 for r in results if r["error"]),
+            "wall": latency_stats(walls),
+            "llm_ms_total": sum(r["llm_ms"] for r in results),
+            "tool_ms_total": sum(r["tool_ms"] for r in results),
+            "tool_calls_total": sum(r["tool_calls"] for r in results),
+        },
+        "results": results,
+    }
+
+
+# ============================================================
+# baseline comparison
+# ============================================================
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, floor_ms: float) -> List[str]:
+    """Human-readable regressions (slower p50/wall beyond threshold, more bytes, lost matches)."""
+    def _p50(r: Dict[str, Any]) -> Optional[float]:
+        return r["latency"]["p50_ms"] if "latency" in r else r.get("wall_ms")
+
+    old = {r["id"]: r for r in baseline.get("results", [])}
+    problems = []
+    for r in current.get("results", []):
+        b = old.get(r["id"])
+        if b is None:
+            continue
+        new_t, old_t = _p50(r), _p50(b)
+        if new_t is not None and old_t is not None and new_t > old_t * (1 + threshold) and new_t - old_t > floor_ms:
+            problems.append(f"{r['id']}: {old_t:.2f} ms -> {new_t:.2f} ms")
+        if "bytes" in r and r["bytes"] > b.get("bytes", r["bytes"]) * (1 + threshold):
+            problems.append(f"{r['id']}: payload {b['bytes']} -> {r['bytes']} bytes")
+        if b.get("match") in ("exact", "unordered") and r.get("match") not in ("exact", "unordered", "seeded"):
+            problems.append(f"{r['id']}: result no longer matches ({r.get('match') or r.get('error')})")
+    return problems
+
+
+# ============================================================
+# main
+# ============================================================
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("mode", choices=["tools", "agent"])
+    ap.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    ap.add_argument("--only", nargs="*", help="question ids, e.g. Q01 Q08")
+    ap.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    ap.add_argument("--live", action="store_true", help="use the configured Neo4j instead of the cassette")
+    ap.add_argument("--record", action="store_true", help="with --live: store the live results in the cassette")
+    ap.add_argument("--repeat", type=int, default=10, help="tools mode: executions per query")
+    ap.add_argument("--model", help="agent mode: real model name instead of the scripted stub")
+    ap.add_argument("--mcp-url", help="agent mode: use a running MCP server instead of the in-process one")
+    ap.add_argument("--port", type=int, help="agent mode: port of the in-process MCP server")
+    ap.add_argument("--out", help="write the JSON report here (default: stdout)")
+    ap.add_argument("--baseline", help="previous report; exit code 1 if this run regressed")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative slow-down vs baseline")
+    ap.add_argument("--floor-ms", type=float, default=0.5, help="ignore slow-downs smaller than this")
+    args = ap.parse_args()
+    if args.record:
+        args.live = True
+
+    questions = load_questions(args.questions, args.only)
+    store = install_store(args)
+    seeded = seed_cassette(store, questions)
+
+    body = run_tools(args, questions, store) if args.mode == "tools" else run_agent(args, questions, store)
+    if store is not None:
+        store.save()
+
+    report = {
+        "meta": {
+            "mode": args.mode,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "neo4j": "live" if args.live else "replay",
+            "model": args.model or ("scripted" if args.mode == "agent" else None),
+            "repeat": args.repeat if args.mode == "tools" else 1,
+            "seeded_queries": seeded,
+        },
+        **body,
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare_reports(report, baseline, args.threshold, args.floor_ms)
+        for p in problems:
+            print(f"REGRESSION {p}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
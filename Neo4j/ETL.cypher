@@ -31,6 +31,36 @@ CREATE INDEX segment_from_to IF NOT EXISTS
 FOR (seg:TravelSegment)
 ON (seg.from_stop_id, seg.to_stop_id);
 
+CREATE INDEX trip_date IF NOT EXISTS
+FOR (t:Trip)
+ON (t.date);
+
+// Geo-Index für nearest_stops / stops_within (Schritt 2b)
+CREATE POINT INDEX stop_location IF NOT EXISTS
+FOR (s:Stop)
+ON (s.location);
+
+// Materialisierte Tagesstatistiken (Schritt 6)
+CREATE CONSTRAINT daily_stats_date_unique IF NOT EXISTS
+FOR (ds:DailyStats)
+REQUIRE ds.date IS UNIQUE;
+
+CREATE CONSTRAINT route_daily_stats_unique IF NOT EXISTS
+FOR (rs:RouteDailyStats)
+REQUIRE (rs.route_id, rs.date) IS UNIQUE;
+
+CREATE CONSTRAINT stop_daily_stats_unique IF NOT EXISTS
+FOR (ss:StopDailyStats)
+REQUIRE (ss.stop_id, ss.date) IS UNIQUE;
+
+CREATE INDEX route_daily_stats_date IF NOT EXISTS
+FOR (rs:RouteDailyStats)
+ON (rs.date);
+
+CREATE INDEX stop_daily_stats_date IF NOT EXISTS
+FOR (ss:StopDailyStats)
+ON (ss.date);
+
 ////////////////////////////////////////////////////////////////////////
 // 1. Travel Times laden – NUR Januar 2022
 ////////////////////////////////////////////////////////////////////////
@@ -228,6 +258,51 @@ CALL apoc.periodic.iterate(
   {batchSize:10000, parallel:false}
 );
 
+////////////////////////////////////////////////////////////////////////
+// 2b. Geo: Stop.location (WGS-84 point) aus geometry_wkt, Segmentlänge
+//     WKT "POINT (x y)": Werte im Bereich lon/lat -> WGS-84, sonst RD New
+//     (EPSG:28992, Meter) -> WGS-84 per Näherungspolynom (~1 m genau)
+////////////////////////////////////////////////////////////////////////
+
+CALL apoc.periodic.iterate(
+  "
+    MATCH (s:Stop)
+    WHERE s.geometry_wkt IS NOT NULL AND s.location IS NULL
+    RETURN s
+  ",
+  "
+    WITH s, apoc.text.regexGroups(s.geometry_wkt, '(-?[0-9.]+)[ ,]+(-?[0-9.]+)')[0] AS g
+    WHERE g IS NOT NULL
+    WITH s, toFloat(g[1]) AS x, toFloat(g[2]) AS y
+    WITH s, x, y, (x - 155000) * 1e-5 AS dx, (y - 463000) * 1e-5 AS dy
+    SET s.location = CASE
+      WHEN abs(x) <= 180 AND abs(y) <= 90 THEN point({longitude: x, latitude: y})
+      ELSE point({
+        latitude: 52.15517440 + (3235.65389 * dy - 32.58297 * dx^2 - 0.24750 * dy^2 - 0.84978 * dx^2 * dy
+                  - 0.06550 * dy^3 - 0.01709 * dx^2 * dy^2 - 0.00738 * dx + 0.00530 * dx^4
+                  - 0.00039 * dx^2 * dy^3 + 0.00033 * dx^4 * dy - 0.00012 * dx * dy) / 3600,
+        longitude: 5.38720621 + (5260.52916 * dx + 105.94684 * dx * dy + 2.45656 * dx * dy^2 - 0.81885 * dx^3
+                   + 0.05594 * dx * dy^3 - 0.05607 * dx^3 * dy + 0.01199 * dy - 0.00256 * dx^3 * dy^2
+                   + 0.00128 * dx * dy^4 + 0.00022 * dy^2 - 0.00022 * dx^2 + 0.00026 * dx^5) / 3600
+      })
+    END
+  ",
+  {batchSize:10000, parallel:false}
+);
+
+// Luftlinie zwischen den Stops (Meter) -> Geschwindigkeit in Schritt 4
+CALL apoc.periodic.iterate(
+  "
+    MATCH (a:Stop)<-[:FROM_STOP]-(seg:TravelSegment)-[:TO_STOP]->(b:Stop)
+    WHERE seg.length_m IS NULL AND a.location IS NOT NULL AND b.location IS NOT NULL
+    RETURN seg, a.location AS from_loc, b.location AS to_loc
+  ",
+  "
+    SET seg.length_m = point.distance(from_loc, to_loc)
+  ",
+  {batchSize:10000, parallel:false}
+);
+
 ////////////////////////////////////////////////////////////////////////
 // 3. Aggregat SERVES (Route -> Stop) aus DWELL_AT
 ////////////////////////////////////////////////////////////////////////
@@ -272,7 +347,8 @@ CALL apoc.periodic.iterate(
          reduce(total = 0.0, x IN times | total + coalesce(x,0)) AS total
     SET rel.segment_travel_sample_count       = cnt,
         rel.segment_total_travel_time_seconds = total,
-        rel.segment_mean_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END
+        rel.segment_mean_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END,
+        rel.segment_mean_speed_mps            = CASE WHEN total > 0 THEN seg.length_m * cnt / total END
   ",
   {batchSize:1000, parallel:false}
 );
@@ -297,3 +373,141 @@ CALL apoc.periodic.iterate(
   ",
   {batchSize:1000, parallel:false}
 );
+
+////////////////////////////////////////////////////////////////////////
+// 6. Materialisierte Tagesstatistiken (pro Tag, Route+Tag, Stop+Tag)
+//    -> gelesen von den MCP-Tools daily_brief / route_health / period_report
+//    busiest_hour: Stunde (lokale Uhrzeit wie gespeichert, ohne Umrechnung) mit den meisten Trip-Starts bzw. Dwell-Events
+////////////////////////////////////////////////////////////////////////
+
+// 6a. DailyStats
+CALL apoc.periodic.iterate(
+  "
+    MATCH (t:Trip)
+    RETURN DISTINCT t.date AS day
+  ",
+  "
+    MATCH (t:Trip {date: day})
+    WITH day,
+         count(t)                                   AS trips,
+         count(t.travel_time_seconds)               AS timed,
+         sum(t.travel_time_seconds)                 AS total,
+         avg(t.travel_time_seconds)                 AS mean,
+         percentileCont(t.travel_time_seconds, 0.5) AS median,
+         percentileCont(t.travel_time_seconds, 0.9) AS p90,
+         min(t.travel_time_seconds)                 AS min_duration,
+         max(t.travel_time_seconds)                 AS max_duration,
+         min(t.from_time)                           AS first_start,
+         max(t.from_time)                           AS last_start,
+         collect(t.from_time.hour)                  AS hours
+    WITH day, trips, timed, total, mean, median, p90, min_duration, max_duration, first_start, last_start,
+         reduce(best = [null, 0], h IN range(0, 23) |
+           CASE WHEN size([x IN hours WHERE x = h]) > best[1]
+                THEN [h, size([x IN hours WHERE x = h])] ELSE best END) AS busiest
+    MERGE (ds:DailyStats {date: day})
+    SET ds.trip_count              = trips,
+        ds.timed_trip_count        = timed,
+        ds.total_duration_seconds  = total,
+        ds.mean_duration_seconds   = mean,
+        ds.median_duration_seconds = median,
+        ds.p90_duration_seconds    = p90,
+        ds.min_duration_seconds    = min_duration,
+        ds.max_duration_seconds    = max_duration,
+        ds.first_start_time        = first_start,
+        ds.last_start_time         = last_start,
+        ds.busiest_hour            = busiest[0],
+        ds.busiest_hour_trips      = busiest[1]
+  ",
+  {batchSize:50, parallel:false}
+);
+
+// 6b. RouteDailyStats (Route)-[:HAS_DAILY_STATS]->(RouteDailyStats)
+CALL apoc.periodic.iterate(
+  "
+    MATCH (t:Trip)
+    RETURN DISTINCT t.date AS day
+  ",
+  "
+    MATCH (t:Trip {date: day})
+    WITH day, t.route_id AS route_id,
+         collect(DISTINCT t.line)[0]                AS line,
+         count(t)                                   AS trips,
+         count(t.travel_time_seconds)               AS timed,
+         sum(t.travel_time_seconds)                 AS total,
+         avg(t.travel_time_seconds)                 AS mean,
+         percentileCont(t.travel_time_seconds, 0.5) AS median,
+         percentileCont(t.travel_time_seconds, 0.9) AS p90,
+         min(t.travel_time_seconds)                 AS min_duration,
+         max(t.travel_time_seconds)                 AS max_duration,
+         min(t.from_time)                           AS first_start,
+         max(t.from_time)                           AS last_start,
+         collect(t.from_time.hour)                  AS hours
+    WITH day, route_id, line, trips, timed, total, mean, median, p90, min_duration, max_duration, first_start, last_start,
+         reduce(best = [null, 0], h IN range(0, 23) |
+           CASE WHEN size([x IN hours WHERE x = h]) > best[1]
+                THEN [h, size([x IN hours WHERE x = h])] ELSE best END) AS busiest
+    MATCH (r:Route {route_id: route_id})
+    MERGE (rs:RouteDailyStats {route_id: route_id, date: day})
+    SET rs.line                    = line,
+        rs.trip_count              = trips,
+        rs.timed_trip_count        = timed,
+        rs.total_duration_seconds  = total,
+        rs.mean_duration_seconds   = mean,
+        rs.median_duration_seconds = median,
+        rs.p90_duration_seconds    = p90,
+        rs.min_duration_seconds    = min_duration,
+        rs.max_duration_seconds    = max_duration,
+        rs.first_start_time        = first_start,
+        rs.last_start_time         = last_start,
+        rs.busiest_hour            = busiest[0],
+        rs.busiest_hour_trips      = busiest[1]
+    MERGE (r)-[:HAS_DAILY_STATS]->(rs)
+  ",
+  {batchSize:50, parallel:false}
+);
+
+// 6c. StopDailyStats (Stop)-[:HAS_DAILY_STATS]->(StopDailyStats) aus DWELL_AT
+CALL apoc.periodic.iterate(
+  "
+    MATCH (t:Trip)
+    RETURN DISTINCT t.date AS day
+  ",
+  "
+    MATCH (t:Trip {date: day})-[d:DWELL_AT]->(s:Stop)
+    WITH day, s,
+         count(d)                                  AS events,
+         sum(toFloat(d.dwell_time_seconds))        AS total,
+         avg(d.dwell_time_seconds)                 AS mean,
+         percentileCont(d.dwell_time_seconds, 0.5) AS median,
+         percentileCont(d.dwell_time_seconds, 0.9) AS p90,
+         max(d.dwell_time_seconds)                 AS max_dwell,
+         min(d.from_time)                          AS first_event,
+         max(d.from_time)                          AS last_event,
+         collect(d.from_time.hour)                 AS hours
+    WITH day, s, events, total, mean, median, p90, max_dwell, first_event, last_event,
+         reduce(best = [null, 0], h IN range(0, 23) |
+           CASE WHEN size([x IN hours WHERE x = h]) > best[1]
+                THEN [h, size([x IN hours WHERE x = h])] ELSE best END) AS busiest
+    MERGE (ss:StopDailyStats {stop_id: s.stop_id, date: day})
+    SET ss.dwell_event_count     = events,
+        ss.total_dwell_seconds   = total,
+        ss.mean_dwell_seconds    = mean,
+        ss.median_dwell_seconds  = median,
+        ss.p90_dwell_seconds     = p90,
+        ss.max_dwell_seconds     = max_dwell,
+        ss.first_event_time      = first_event,
+        ss.last_event_time       = last_event,
+        ss.busiest_hour          = busiest[0],
+        ss.busiest_hour_events   = busiest[1]
+    MERGE (s)-[:HAS_DAILY_STATS]->(ss)
+  ",
+  {batchSize:50, parallel:false}
+);
+
+////////////////////////////////////////////////////////////////////////
+// 99. Daten-Version hochzählen (invalidiert den Query-Cache im MCP-Server)
+////////////////////////////////////////////////////////////////////////
+
+MERGE (m:EtlMeta {name: 'graph'})
+SET m.data_version = coalesce(m.data_version, 0) + 1,
+    m.loaded_at    = datetime();
@@ -0,0 +1,1024 @@
+"""
+Parallel, batched Python loader for the travel / dwell time CSVs.
+
+Builds the same graph as ETL.cypher (steps 0-6 and 99) but
+- streams the CSVs in chunks and dedups Stop, Route, Trip and TravelSegment in memory,
+- writes new nodes first, then relationships and events as `UNWIND` batches,
+- runs the batches on a thread pool; each worker owns a partition of the key
+  the relationships pile up on (segment, stop, route), so concurrent transactions
+  do not fight over the same nodes (deadlocks that still happen are retried by execute_write),
+- parses the stop WKT geometries into native WGS-84 points (`Stop.location`, point index)
+  and precomputes the straight-line length of each segment (`TravelSegment.length_m`),
+- computes trip totals and the SERVES / HAS_SEGMENT / Route aggregates in memory,
+- recomputes the daily statistics only for the loaded dates,
+- with `--snapshot`, exports the columnar analytics snapshot read by the MCP server.
+
+Loads are incremental: a `(:LoadManifest {city})` node records the service dates
+already ingested, rows of those dates are skipped, and the aggregates of the
+touched routes, stops and segments are updated from running counts/totals
+(O(new events) instead of re-reading every event). Re-running the same load is
+a no-op. `--full` ignores the manifest and recomputes all aggregates from the graph.
+
+With `--admin-csv DIR` nothing is written to Neo4j; instead the header-annotated
+CSVs for an offline `neo4j-admin database import full` are produced (cold loads).
+Afterwards run `--stats-only` once against the started database.
+
+    python Neo4j/bulk_loader.py --city GM0047 --workers 4
+    python Neo4j/bulk_loader.py --city GM0047 --date-from 2024-01-01 --date-to 2024-01-02   # append one day
+    python Neo4j/bulk_loader.py --city GM0047 --admin-csv Neo4j/admin_import
+    python Neo4j/bulk_loader.py --stats-only
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(HERE, "..", "APP", "Server")  # analytics_snapshot.py (--snapshot)
+
+load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE")
+
+TripKey = Tuple[str, str]  # (trip_id, date)
+
+
+# ============================================================
+# Cypher (same model and property names as ETL.cypher)
+# ============================================================
+SCHEMA = [
+    "CREATE CONSTRAINT stop_id_unique IF NOT EXISTS FOR (s:Stop) REQUIRE s.stop_id IS UNIQUE",
+    "CREATE CONSTRAINT route_id_unique IF NOT EXISTS FOR (r:Route) REQUIRE r.route_id IS UNIQUE",
+    "CREATE CONSTRAINT trip_unique IF NOT EXISTS FOR (t:Trip) REQUIRE (t.trip_id, t.date) IS UNIQUE",
+    "CREATE CONSTRAINT segment_id_unique IF NOT EXISTS FOR (seg:TravelSegment) REQUIRE seg.segment_id IS UNIQUE",
+    "CREATE INDEX route_line IF NOT EXISTS FOR (r:Route) ON (r.line)",
+    "CREATE INDEX trip_route IF NOT EXISTS FOR (t:Trip) ON (t.route_id)",
+    "CREATE INDEX segment_from_to IF NOT EXISTS FOR (seg:TravelSegment) ON (seg.from_stop_id, seg.to_stop_id)",
+    "CREATE INDEX trip_date IF NOT EXISTS FOR (t:Trip) ON (t.date)",
+    "CREATE POINT INDEX stop_location IF NOT EXISTS FOR (s:Stop) ON (s.location)",
+    "CREATE CONSTRAINT daily_stats_date_unique IF NOT EXISTS FOR (ds:DailyStats) REQUIRE ds.date IS UNIQUE",
+    "CREATE CONSTRAINT route_daily_stats_unique IF NOT EXISTS FOR (rs:RouteDailyStats) REQUIRE (rs.route_id, rs.date) IS UNIQUE",
+    "CREATE CONSTRAINT stop_daily_stats_unique IF NOT EXISTS FOR (ss:StopDailyStats) REQUIRE (ss.stop_id, ss.date) IS UNIQUE",
+    "CREATE INDEX route_daily_stats_date IF NOT EXISTS FOR (rs:RouteDailyStats) ON (rs.date)",
+    "CREATE INDEX stop_daily_stats_date IF NOT EXISTS FOR (ss:StopDailyStats) ON (ss.date)",
+    "CREATE CONSTRAINT load_manifest_city_unique IF NOT EXISTS FOR (m:LoadManifest) REQUIRE m.city IS UNIQUE",
+]
+
+# ---------- nodes ----------
+STOPS_CYPHER = """
+UNWIND $rows AS row
+MERGE (s:Stop {stop_id: row.stop_id})
+  ON CREATE SET s.lau = row.lau, s.geometry_wkt = row.geometry_wkt, s.location = point(row.location)
+"""
+
+ROUTES_CYPHER = """
+UNWIND $rows AS row
+MERGE (r:Route {route_id: row.route_id})
+  ON CREATE SET r.line = row.line, r.lau = row.lau
+"""
+
+TRIPS_CYPHER = """
+UNWIND $rows AS row
+MERGE (t:Trip {trip_id: row.trip_id, date: row.date})
+  ON CREATE SET t.line = row.line, t.route_id = row.route_id, t.lau = row.lau
+"""
+
+SEGMENTS_CYPHER = """
+UNWIND $rows AS row
+MERGE (seg:TravelSegment {segment_id: row.segment_id})
+  ON CREATE SET seg.from_stop_id = row.from_stop_id, seg.to_stop_id = row.to_stop_id, seg.lau = row.lau,
+                seg.length_m = row.length_m
+"""
+
+# ---------- structural relationships ----------
+HAS_TRIP_CYPHER = """
+UNWIND $rows AS row
+MATCH (r:Route {route_id: row.route_id})
+MATCH (t:Trip {trip_id: row.trip_id, date: row.date})
+MERGE (r)-[:HAS_TRIP]->(t)
+"""
+
+FROM_STOP_CYPHER = """
+UNWIND $rows AS row
+MATCH (seg:TravelSegment {segment_id: row.segment_id})
+MATCH (s:Stop {stop_id: row.from_stop_id})
+MERGE (s)<-[:FROM_STOP]-(seg)
+"""
+
+TO_STOP_CYPHER = """
+UNWIND $rows AS row
+MATCH (seg:TravelSegment {segment_id: row.segment_id})
+MATCH (s:Stop {stop_id: row.to_stop_id})
+MERGE (seg)-[:TO_STOP]->(s)
+"""
+
+HAS_SEGMENT_CYPHER = """
+UNWIND $rows AS row
+MATCH (r:Route {route_id: row.route_id})
+MATCH (seg:TravelSegment {segment_id: row.segment_id})
+MERGE (r)-[:HAS_SEGMENT]->(seg)
+"""
+
+# ---------- events ----------
+TRAVELS_ON_CYPHER = """
+UNWIND $rows AS row
+MATCH (t:Trip {trip_id: row.trip_id, date: row.date})
+MATCH (seg:TravelSegment {segment_id: row.segment_id})
+MERGE (t)-[e:TRAVELS_ON {date: row.date, from_time: row.from_time, to_time: row.to_time,
+                         from_stop_id: row.from_stop_id, to_stop_id: row.to_stop_id}]->(seg)
+  ON CREATE SET e.travel_time_seconds = row.seconds
+"""
+
+DWELL_AT_CYPHER = """
+UNWIND $rows AS row
+MATCH (t:Trip {trip_id: row.trip_id, date: row.date})
+MATCH (s:Stop {stop_id: row.stop_id})
+MERGE (t)-[d:DWELL_AT {date: row.date, from_time: row.from_time, to_time: row.to_time, stop_id: row.stop_id}]->(s)
+  ON CREATE SET d.dwell_time_seconds = row.seconds
+"""
+
+# ---------- aggregates (steps 1b, 3, 4, 5), applied as deltas of the new events ----------
+TRIP_TOTALS_CYPHER = """
+UNWIND $rows AS row
+MATCH (t:Trip {trip_id: row.trip_id, date: row.date})
+SET t.travel_time_seconds = row.total, t.from_time = row.from_time, t.to_time = row.to_time
+"""
+
+SERVES_CYPHER = """
+UNWIND $rows AS row
+MATCH (r:Route {route_id: row.route_id})
+MATCH (s:Stop {stop_id: row.stop_id})
+MERGE (r)-[srv:SERVES]->(s)
+WITH srv, coalesce(srv.dwell_sample_count, 0) + row.cnt AS cnt,
+     coalesce(srv.total_dwell_time_seconds, 0.0) + row.total AS total
+SET srv.dwell_sample_count       = cnt,
+    srv.total_dwell_time_seconds = total,
+    srv.mean_dwell_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END
+"""
+
+# ETL step 4 counts every TRAVELS_ON event of the segment (all routes) on each HAS_SEGMENT edge.
+# The running totals live on the segment; graphs built by ETL.cypher are seeded from an edge.
+HAS_SEGMENT_STATS_CYPHER = """
+UNWIND $rows AS row
+MATCH (seg:TravelSegment {segment_id: row.segment_id})
+OPTIONAL MATCH (:Route)-[old:HAS_SEGMENT]->(seg)
+WHERE old.segment_travel_sample_count IS NOT NULL
+WITH seg, row, head(collect(old)) AS old
+WITH seg,
+     coalesce(seg.travel_sample_count, old.segment_travel_sample_count, 0) + row.cnt AS cnt,
+     coalesce(seg.total_travel_time_seconds, old.segment_total_travel_time_seconds, 0.0) + row.total AS total
+SET seg.travel_sample_count       = cnt,
+    seg.total_travel_time_seconds = total
+WITH seg, cnt, total
+MATCH (:Route)-[rel:HAS_SEGMENT]->(seg)
+SET rel.segment_travel_sample_count       = cnt,
+    rel.segment_total_travel_time_seconds = total,
+    rel.segment_mean_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END,
+    rel.segment_mean_speed_mps            = CASE WHEN total > 0 THEN seg.length_m * cnt / total END
+"""
+
+ROUTE_STATS_CYPHER = """
+UNWIND $rows AS row
+MATCH (r:Route {route_id: row.route_id})
+WITH r, coalesce(r.trip_sample_count, 0) + row.cnt AS cnt,
+     coalesce(r.total_trip_travel_time_seconds, 0.0) + row.total AS total
+SET r.trip_sample_count              = cnt,
+    r.total_trip_travel_time_seconds = total,
+    r.mean_trip_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END
+"""
+
+# ---------- aggregates recomputed from the whole graph (--full) ----------
+FULL_AGGREGATES = [
+    """
+    MATCH (t:Trip)-[e:TRAVELS_ON]->(:TravelSegment)
+    WITH t, sum(toFloat(coalesce(e.travel_time_seconds, 0))) AS total,
+         min(e.from_time) AS first_departure, max(e.to_time) AS last_arrival
+    CALL {
+      WITH t, total, first_departure, last_arrival
+      SET t.travel_time_seconds = total, t.from_time = first_departure, t.to_time = last_arrival
+    } IN TRANSACTIONS OF 10000 ROWS
+    """,
+    """
+    MATCH (r:Route)-[:HAS_TRIP]->(:Trip)-[d:DWELL_AT]->(s:Stop)
+    WITH r, s, count(d.dwell_time_seconds) AS cnt, sum(toFloat(coalesce(d.dwell_time_seconds, 0))) AS total
+    CALL {
+      WITH r, s, cnt, total
+      MERGE (r)-[srv:SERVES]->(s)
+      SET srv.dwell_sample_count       = cnt,
+          srv.total_dwell_time_seconds = total,
+          srv.mean_dwell_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END
+    } IN TRANSACTIONS OF 10000 ROWS
+    """,
+    """
+    MATCH (seg:TravelSegment)<-[e:TRAVELS_ON]-(:Trip)
+    WITH seg, count(e.travel_time_seconds) AS cnt, sum(toFloat(coalesce(e.travel_time_seconds, 0))) AS total
+    CALL {
+      WITH seg, cnt, total
+      SET seg.travel_sample_count = cnt, seg.total_travel_time_seconds = total
+      WITH seg, cnt, total
+      MATCH (:Route)-[rel:HAS_SEGMENT]->(seg)
+      SET rel.segment_travel_sample_count       = cnt,
+          rel.segment_total_travel_time_seconds = total,
+          rel.segment_mean_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END,
+          rel.segment_mean_speed_mps            = CASE WHEN total > 0 THEN seg.length_m * cnt / total END
+    } IN TRANSACTIONS OF 1000 ROWS
+    """,
+    """
+    MATCH (r:Route)-[:HAS_TRIP]->(t:Trip)
+    WHERE t.travel_time_seconds IS NOT NULL
+    WITH r, count(*) AS cnt, sum(t.travel_time_seconds) AS total
+    CALL {
+      WITH r, cnt, total
+      SET r.trip_sample_count              = cnt,
+          r.total_trip_travel_time_seconds = total,
+          r.mean_trip_travel_time_seconds  = CASE WHEN cnt > 0 THEN total / cnt ELSE 0 END
+    } IN TRANSACTIONS OF 1000 ROWS
+    """,
+]
+
+# ---------- daily statistics (step 6, restricted to $dates) ----------
+_BUSIEST = """reduce(best = [null, 0], h IN range(0, 23) |
+           CASE WHEN size([x IN hours WHERE x = h]) > best[1]
+                THEN [h, size([x IN hours WHERE x = h])] ELSE best END) AS busiest"""
+
+DAILY_STATS_CYPHER = f"""
+UNWIND $dates AS day
+MATCH (t:Trip {{date: day}})
+WITH day,
+     count(t)                                   AS trips,
+     count(t.travel_time_seconds)               AS timed,
+     sum(t.travel_time_seconds)                 AS total,
+     avg(t.travel_time_seconds)                 AS mean,
+     percentileCont(t.travel_time_seconds, 0.5) AS median,
+     percentileCont(t.travel_time_seconds, 0.9) AS p90,
+     min(t.travel_time_seconds)                 AS min_duration,
+     max(t.travel_time_seconds)                 AS max_duration,
+     min(t.from_time)                           AS first_start,
+     max(t.from_time)                           AS last_start,
+     collect(t.from_time.hour)                  AS hours
+WITH day, trips, timed, total, mean, median, p90, min_duration, max_duration, first_start, last_start,
+     {_BUSIEST}
+MERGE (ds:DailyStats {{date: day}})
+SET ds.trip_count              = trips,
+    ds.timed_trip_count        = timed,
+    ds.total_duration_seconds  = total,
+    ds.mean_duration_seconds   = mean,
+    ds.median_duration_seconds = median,
+    ds.p90_duration_seconds    = p90,
+    ds.min_duration_seconds    = min_duration,
+    ds.max_duration_seconds    = max_duration,
+    ds.first_start_time        = first_start,
+    ds.last_start_time         = last_start,
+    ds.busiest_hour            = busiest[0],
+    ds.busiest_hour_trips      = busiest[1]
+"""
+
+ROUTE_DAILY_STATS_CYPHER = f"""
+UNWIND $dates AS day
+MATCH (t:Trip {{date: day}})
+WITH day, t.route_id AS route_id,
+     collect(DISTINCT t.line)[0]                AS line,
+     count(t)                                   AS trips,
+     count(t.travel_time_seconds)               AS timed,
+     sum(t.travel_time_seconds)                 AS total,
+     avg(t.travel_time_seconds)                 AS mean,
+     percentileCont(t.travel_time_seconds, 0.5) AS median,
+     percentileCont(t.travel_time_seconds, 0.9) AS p90,
+     min(t.travel_time_seconds)                 AS min_duration,
+     max(t.travel_time_seconds)                 AS max_duration,
+     min(t.from_time)                           AS first_start,
+     max(t.from_time)                           AS last_start,
+     collect(t.from_time.hour)                  AS hours
+WITH day, route_id, line, trips, timed, total, mean, median, p90, min_duration, max_duration, first_start, last_start,
+     {_BUSIEST}
+MATCH (r:Route {{route_id: route_id}})
+MERGE (rs:RouteDailyStats {{route_id: route_id, date: day}})
+SET rs.line                    = line,
+    rs.trip_count              = trips,
+    rs.timed_trip_count        = timed,
+    rs.total_duration_seconds  = total,
+    rs.mean_duration_seconds   = mean,
+    rs.median_duration_seconds = median,
+    rs.p90_duration_seconds    = p90,
+    rs.min_duration_seconds    = min_duration,
+    rs.max_duration_seconds    = max_duration,
+    rs.first_start_time        = first_start,
+    rs.last_start_time         = last_start,
+    rs.busiest_hour            = busiest[0],
+    rs.busiest_hour_trips      = busiest[1]
+MERGE (r)-[:HAS_DAILY_STATS]->(rs)
+"""
+
+STOP_DAILY_STATS_CYPHER = f"""
+UNWIND $dates AS day
+MATCH (t:Trip {{date: day}})-[d:DWELL_AT]->(s:Stop)
+WITH day, s,
+     count(d)                                  AS events,
+     sum(toFloat(d.dwell_time_seconds))        AS total,
+     avg(d.dwell_time_seconds)                 AS mean,
+     percentileCont(d.dwell_time_seconds, 0.5) AS median,
+     percentileCont(d.dwell_time_seconds, 0.9) AS p90,
+     max(d.dwell_time_seconds)                 AS max_dwell,
+     min(d.from_time)                          AS first_event,
+     max(d.from_time)                          AS last_event,
+     collect(d.from_time.hour)                 AS hours
+WITH day, s, events, total, mean, median, p90, max_dwell, first_event, last_event,
+     {_BUSIEST}
+MERGE (ss:StopDailyStats {{stop_id: s.stop_id, date: day}})
+SET ss.dwell_event_count     = events,
+    ss.total_dwell_seconds   = total,
+    ss.mean_dwell_seconds    = mean,
+    ss.median_dwell_seconds  = median,
+    ss.p90_dwell_seconds     = p90,
+    ss.max_dwell_seconds     = max_dwell,
+    ss.first_event_time      = first_event,
+    ss.last_event_time       = last_event,
+    ss.busiest_hour          = busiest[0],
+    ss.busiest_hour_events   = busiest[1]
+MERGE (s)-[:HAS_DAILY_STATS]->(ss)
+"""
+
+ALL_DATES_CYPHER = "MATCH (t:Trip) RETURN DISTINCT t.date AS day ORDER BY day"
+
+# ---------- load manifest ----------
+MANIFEST_CYPHER = """
+MATCH (m:LoadManifest {city: $city})
+RETURN coalesce(m.dates, []) AS dates, coalesce(m.pending, []) AS pending
+"""
+
+MANIFEST_INIT_CYPHER = """
+MERGE (m:LoadManifest {city: $city})
+  ON CREATE SET m.dates = $dates, m.ranges = $ranges, m.pending = [], m.runs = 0
+"""
+
+# dates whose aggregates are being applied; cleared by MANIFEST_COMMIT_CYPHER
+MANIFEST_PENDING_CYPHER = """
+MERGE (m:LoadManifest {city: $city})
+SET m.pending = $dates
+"""
+
+MANIFEST_COMMIT_CYPHER = """
+MERGE (m:LoadManifest {city: $city})
+SET m.dates     = $dates,
+    m.ranges    = $ranges,
+    m.pending   = [],
+    m.runs      = coalesce(m.runs, 0) + 1,
+    m.loaded_at = datetime()
+"""
+
+BUMP_VERSION_CYPHER = """
+MERGE (m:EtlMeta {name: 'graph'})
+SET m.data_version = coalesce(m.data_version, 0) + 1,
+    m.loaded_at    = datetime()
+"""
+
+DATA_VERSION_CYPHER = "MATCH (m:EtlMeta {name: 'graph'}) RETURN m.data_version AS version"
+
+
+# ============================================================
+# CSV parsing
+# ============================================================
+def read_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Stream a CSV as lists of at most `chunk_size` rows."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        chunk: List[Dict[str, str]] = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def parse_time(value: str) -> datetime:
+    """'2022-01-01 12:55:23+0000' -> aware UTC datetime (as `datetime(replace(left(v, 19), ' ', 'T'))`)."""
+    return datetime.fromisoformat(value[:19].replace(" ", "T")).replace(tzinfo=timezone.utc)
+
+
+def parse_event(row: Dict[str, str], date_from: str, date_to: str) -> Optional[Tuple[str, datetime, datetime, int]]:
+    """(service date, from, to, non-negative seconds) or None if the row is outside [date_from, date_to)."""
+    raw = (row.get("date") or "").strip()
+    if not raw:
+        return None
+    day = date.fromisoformat(raw[:10]).isoformat()
+    if not (date_from <= day < date_to):
+        return None
+    start, end = parse_time(row["from_time"]), parse_time(row["to_time"])
+    seconds = int((end - start).total_seconds())
+    return day, start, end, max(seconds, 0)
+
+
+def date_ranges(dates: List[str]) -> List[str]:
+    """['2022-01-01', '2022-01-02', '2022-01-05'] -> ['2022-01-01..2022-01-02', '2022-01-05..2022-01-05']"""
+    ranges: List[str] = []
+    start = prev = None
+    for day in sorted(set(dates)):
+        d = date.fromisoformat(day)
+        if prev is not None and (d - prev).days == 1:
+            prev = d
+            continue
+        if start is not None:
+            ranges.append(f"{start.isoformat()}..{prev.isoformat()}")
+        start = prev = d
+    if start is not None:
+        ranges.append(f"{start.isoformat()}..{prev.isoformat()}")
+    return ranges
+
+
+# ------------------------------------------------------------
+# Stop geometries (same conversion as ETL step 2b)
+# ------------------------------------------------------------
+_WKT_POINT_RE = re.compile(r"POINT\s*Z?\s*\(\s*(-?[0-9.eE+-]+)[\s,]+(-?[0-9.eE+-]+)", re.I)
+
+# RD New (EPSG:28992) -> WGS-84, Schreutelkamp & Strang van Hees: (p, q, coefficient) for dX^p * dY^q
+_RD_LAT = [(0, 1, 3235.65389), (2, 0, -32.58297), (0, 2, -0.24750), (2, 1, -0.84978), (0, 3, -0.06550),
+           (2, 2, -0.01709), (1, 0, -0.00738), (4, 0, 0.00530), (2, 3, -0.00039), (4, 1, 0.00033), (1, 1, -0.00012)]
+_RD_LON = [(1, 0, 5260.52916), (1, 1, 105.94684), (1, 2, 2.45656), (3, 0, -0.81885), (1, 3, 0.05594),
+           (3, 1, -0.05607), (0, 1, 0.01199), (3, 2, -0.00256), (1, 4, 0.00128), (0, 2, 0.00022),
+           (2, 0, -0.00022), (5, 0, 0.00026)]
+
+EARTH_RADIUS_M = 6378140.0  # radius Neo4j uses for point.distance on WGS-84 points
+
+
+def rd_to_wgs84(x: float, y: float) -> Tuple[float, float]:
+    """RD New metres -> (latitude, longitude), accurate to about 1 m within the Netherlands."""
+    dx, dy = (x - 155000.0) * 1e-5, (y - 463000.0) * 1e-5
+    lat = 52.15517440 + sum(k * dx ** p * dy ** q for p, q, k in _RD_LAT) / 3600.0
+    lon = 5.38720621 + sum(k * dx ** p * dy ** q for p, q, k in _RD_LON) / 3600.0
+    return lat, lon
+
+
+def parse_location(wkt: Optional[str]) -> Optional[Tuple[float, float]]:
+    """'POINT (lon lat)' or 'POINT (x y)' in RD New -> (latitude, longitude); None if not a point."""
+    m = _WKT_POINT_RE.search(wkt or "")
+    if m is None:
+        return None
+    x, y = float(m.group(1)), float(m.group(2))
+    if abs(x) <= 180 and abs(y) <= 90:
+        return y, x
+    return rd_to_wgs84(x, y)
+
+
+def distance_m(a: Optional[Tuple[float, float]], b: Optional[Tuple[float, float]]) -> Optional[float]:
+    """Haversine distance of two (latitude, longitude) points, like `point.distance`."""
+    if a is None or b is None:
+        return None
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _point_map(location: Optional[Tuple[float, float]]) -> Optional[Dict[str, float]]:
+    return {"latitude": location[0], "longitude": location[1]} if location else None
+
+
+def _admin_point(location: Optional[Tuple[float, float]]) -> Optional[str]:
+    return f"{{latitude:{location[0]},longitude:{location[1]}}}" if location else None
+
+
+# ============================================================
+# Throughput report
+# ============================================================
+class StageStats:
+    """Rows and wall time per stage; prints rows/sec at the end."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, rows: int, seconds: float) -> None:
+        self.rows[stage] = self.rows.get(stage, 0) + rows
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def timed(self, stage: str, fn: Callable[[], int]) -> int:
+        t0 = time.perf_counter()
+        rows = fn()
+        self.add(stage, rows, time.perf_counter() - t0)
+        return rows
+
+    def report(self) -> str:
+        lines = [f"{'stage':<16}{'rows':>12}{'seconds':>10}{'rows/s':>12}"]
+        for stage, rows in self.rows.items():
+            secs = self.seconds[stage]
+            rate = rows / secs if secs > 0 else 0.0
+            lines.append(f"{stage:<16}{rows:>12,}{secs:>10.1f}{rate:>12,.0f}")
+        return "\n".join(lines)
+
+
+# ============================================================
+# Loader
+# ============================================================
+class _TripAgg:
+    __slots__ = ("line", "route_id", "lau", "total", "from_time", "to_time", "timed")
+
+    def __init__(self, line: str, route_id: str, lau: str) -> None:
+        self.line, self.route_id, self.lau = line, route_id, lau
+        self.total = 0.0
+        self.from_time: Optional[datetime] = None
+        self.to_time: Optional[datetime] = None
+        self.timed = False
+
+    def add_travel(self, start: datetime, end: datetime, seconds: int) -> None:
+        self.total += seconds
+        self.from_time = start if self.from_time is None or start < self.from_time else self.from_time
+        self.to_time = end if self.to_time is None or end > self.to_time else self.to_time
+        self.timed = True
+
+
+class BulkLoader:
+    def __init__(
+        self,
+        driver: Any = None,
+        workers: int = 4,
+        batch_size: int = 10_000,
+        database: Optional[str] = NEO4J_DATABASE,
+        admin_dir: Optional[str] = None,
+    ) -> None:
+        self.driver = driver
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.database = database
+        self.admin_dir = admin_dir
+        self.stats = StageStats()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        # in-memory dedup (first occurrence wins, like ON CREATE SET)
+        self.stops: Dict[str, Tuple[str, str, Optional[Tuple[float, float]]]] = {}
+        self.routes: Dict[str, Tuple[str, str]] = {}
+        self.trips: Dict[TripKey, _TripAgg] = {}
+        self.segments: Dict[str, Tuple[str, str, str]] = {}
+        self.has_trip: Set[Tuple[str, str, str]] = set()
+        self.route_segments: Set[Tuple[str, str]] = set()
+        self.events: Set[int] = set()
+        self.dates: Set[str] = set()  # service dates of this run
+        self.skip_dates: Set[str] = set()  # already ingested (load manifest)
+
+        # running aggregates
+        self.serves: Dict[Tuple[str, str], List[float]] = {}
+        self.segment_travel: Dict[str, List[float]] = {}
+
+        self._admin_files: Dict[str, Any] = {}
+
+    # ---------- Neo4j ----------
+    def _session(self):
+        return self.driver.session(database=self.database) if self.database else self.driver.session()
+
+    def _run_partition(self, cypher: str, rows: List[Dict[str, Any]]) -> int:
+        with self._session() as session:
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                session.execute_write(lambda tx, b=batch: tx.run(cypher, rows=b).consume())
+        return len(rows)
+
+    def write(self, stage: str, cypher: str, rows: List[Dict[str, Any]], partition: Optional[str] = None) -> None:
+        """UNWIND `rows` in batches; with `partition`, rows sharing that key always go to the same worker."""
+        if not rows:
+            return
+        if partition is None:
+            parts = [rows[i::self.workers] for i in range(self.workers)]
+        else:
+            parts = [[] for _ in range(self.workers)]
+            for row in rows:
+                parts[hash(row[partition]) % self.workers].append(row)
+        t0 = time.perf_counter()
+        done = sum(f.result() for f in [self.pool.submit(self._run_partition, cypher, p) for p in parts if p])
+        self.stats.add(stage, done, time.perf_counter() - t0)
+
+    def run(self, cypher: str, **params: Any) -> List[Dict[str, Any]]:
+        with self._session() as session:
+            return [r.data() for r in session.run(cypher, params)]
+
+    def ensure_schema(self) -> None:
+        for statement in SCHEMA:
+            self.run(statement)
+
+    # ---------- neo4j-admin CSVs ----------
+    _ADMIN_HEADERS = {
+        "stops": ["stop_id:ID(Stop)", "lau", "geometry_wkt", "location:point{crs:WGS-84}", ":LABEL"],
+        "routes": ["route_id:ID(Route)", "line", "lau", "trip_sample_count:long",
+                   "total_trip_travel_time_seconds:double", "mean_trip_travel_time_seconds:double", ":LABEL"],
+        "trips": [":ID(Trip)", "trip_id", "date", "line", "route_id", "lau", "travel_time_seconds:double",
+                  "from_time:datetime", "to_time:datetime", ":LABEL"],
+        "segments": ["segment_id:ID(TravelSegment)", "from_stop_id", "to_stop_id", "lau", "length_m:double", ":LABEL"],
+        "has_trip": [":START_ID(Route)", ":END_ID(Trip)", ":TYPE"],
+        "from_stop": [":START_ID(TravelSegment)", ":END_ID(Stop)", ":TYPE"],
+        "to_stop": [":START_ID(TravelSegment)", ":END_ID(Stop)", ":TYPE"],
+        "has_segment": [":START_ID(Route)", ":END_ID(TravelSegment)", "segment_travel_sample_count:long",
+                        "segment_total_travel_time_seconds:double", "segment_mean_travel_time_seconds:double",
+                        "segment_mean_speed_mps:double", ":TYPE"],
+        "serves": [":START_ID(Route)", ":END_ID(Stop)", "dwell_sample_count:long",
+                   "total_dwell_time_seconds:double", "mean_dwell_time_seconds:double", ":TYPE"],
+        "travels_on": [":START_ID(Trip)", ":END_ID(TravelSegment)", "date", "from_time:datetime", "to_time:datetime",
+                       "from_stop_id", "to_stop_id", "travel_time_seconds:long", ":TYPE"],
+        "dwell_at": [":START_ID(Trip)", ":END_ID(Stop)", "date", "from_time:datetime", "to_time:datetime",
+                     "stop_id", "dwell_time_seconds:long", ":TYPE"],
+    }
+
+    def _admin(self, name: str) -> Any:
+        if name not in self._admin_files:
+            f = open(os.path.join(self.admin_dir, f"{name}.csv"), "w", encoding="utf-8", newline="")
+            writer = csv.writer(f)
+            writer.writerow(self._ADMIN_HEADERS[name])
+            self._admin_files[name] = (f, writer)
+        return self._admin_files[name][1]
+
+    def _admin_rows(self, stage: str, name: str, rows: List[List[Any]]) -> None:
+        t0 = time.perf_counter()
+        self._admin(name).writerows(rows)
+        self.stats.add(stage, len(rows), time.perf_counter() - t0)
+
+    # ---------- per chunk ----------
+    def _new_entities(self, stops: Dict, routes: Dict, trips: Dict, segments: Dict) -> None:
+        """Write the nodes first seen in this chunk, then their structural relationships."""
+        if self.admin_dir:
+            self._admin_rows("nodes", "stops", [
+                [k, lau, wkt, _admin_point(loc), "Stop"] for k, (lau, wkt, loc) in stops.items()
+            ])
+            self._admin_rows("nodes", "segments", [
+                [k, f, t, lau, self._segment_length(f, t), "TravelSegment"] for k, (f, t, lau) in segments.items()
+            ])
+            self._admin_rows("relationships", "from_stop", [[k, f, "FROM_STOP"] for k, (f, _, _) in segments.items()])
+            self._admin_rows("relationships", "to_stop", [[k, t, "TO_STOP"] for k, (_, t, _) in segments.items()])
+            return  # routes / trips / HAS_TRIP are written at the end, once their aggregates are known
+
+        self.write("nodes", STOPS_CYPHER, [
+            {"stop_id": k, "lau": lau, "geometry_wkt": wkt, "location": _point_map(loc)}
+            for k, (lau, wkt, loc) in stops.items()
+        ])
+        self.write("nodes", ROUTES_CYPHER, [{"route_id": k, "line": line, "lau": lau} for k, (line, lau) in routes.items()])
+        self.write("nodes", TRIPS_CYPHER, [
+            {"trip_id": tid, "date": day, "line": t.line, "route_id": t.route_id, "lau": t.lau}
+            for (tid, day), t in trips.items()
+        ])
+        self.write("nodes", SEGMENTS_CYPHER, [
+            {"segment_id": k, "from_stop_id": f, "to_stop_id": to, "lau": lau, "length_m": self._segment_length(f, to)}
+            for k, (f, to, lau) in segments.items()
+        ])
+        seg_rows = [{"segment_id": k, "from_stop_id": f, "to_stop_id": to} for k, (f, to, _) in segments.items()]
+        self.write("relationships", FROM_STOP_CYPHER, seg_rows, partition="from_stop_id")
+        self.write("relationships", TO_STOP_CYPHER, seg_rows, partition="to_stop_id")
+
+    @staticmethod
+    def _remember(store: Dict, new: Dict, key: Any, value: Any) -> None:
+        if key not in store:
+            store[key] = value
+            new[key] = value
+
+    def _remember_stop(self, new: Dict, stop_id: str, lau: str, wkt: str) -> None:
+        if stop_id not in self.stops:
+            self._remember(self.stops, new, stop_id, (lau, wkt, parse_location(wkt)))
+
+    def _segment_length(self, from_stop: str, to_stop: str) -> Optional[float]:
+        return distance_m(self.stops[from_stop][2], self.stops[to_stop][2])
+
+    def load_travel_chunk(self, chunk: List[Dict[str, str]], date_from: str, date_to: str) -> None:
+        t0 = time.perf_counter()
+        stops: Dict[str, Tuple[str, str, Optional[Tuple[float, float]]]] = {}
+        routes: Dict[str, Tuple[str, str]] = {}
+        trips: Dict[TripKey, _TripAgg] = {}
+        segments: Dict[str, Tuple[str, str, str]] = {}
+        has_trip: List[Dict[str, str]] = []
+        has_segment: List[Dict[str, str]] = []
+        events: List[Dict[str, Any]] = []
+
+        for row in chunk:
+            parsed = parse_event(row, date_from, date_to)
+            if parsed is None:
+                continue
+            day, start, end, seconds = parsed
+            if day in self.skip_dates:
+                continue
+            lau, line, route_id, trip_id = row["lau"], row["line"], str(row["route"]), row["trip"]
+            from_stop, to_stop = row["from_stop"], row["to_stop"]
+            segment_id = f"{from_stop}|{to_stop}"
+            self._remember_stop(stops, from_stop, lau, row["from_geometry"])
+            self._remember_stop(stops, to_stop, lau, row["to_geometry"])
+            self._remember(self.routes, routes, route_id, (line, lau))
+            self._remember(self.trips, trips, (trip_id, day), _TripAgg(line, route_id, lau))
+            self._remember(self.segments, segments, segment_id, (from_stop, to_stop, lau))
+            if (route_id, trip_id, day) not in self.has_trip:
+                self.has_trip.add((route_id, trip_id, day))
+                has_trip.append({"route_id": route_id, "trip_id": trip_id, "date": day})
+            if (route_id, segment_id) not in self.route_segments:
+                self.route_segments.add((route_id, segment_id))
+                has_segment.append({"route_id": route_id, "segment_id": segment_id})
+
+            event_key = hash(("T", trip_id, day, start, end, from_stop, to_stop))
+            if event_key in self.events:
+                continue
+            self.events.add(event_key)
+            self.dates.add(day)
+            self.trips[(trip_id, day)].add_travel(start, end, seconds)
+            agg = self.segment_travel.setdefault(segment_id, [0, 0.0])
+            agg[0] += 1
+            agg[1] += seconds
+            events.append({
+                "trip_id": trip_id, "date": day, "segment_id": segment_id, "from_time": start, "to_time": end,
+                "from_stop_id": from_stop, "to_stop_id": to_stop, "seconds": seconds,
+            })
+        self.stats.add("parse", len(chunk), time.perf_counter() - t0)
+
+        self._new_entities(stops, routes, trips, segments)
+        if self.admin_dir:
+            self._admin_rows("events", "travels_on", [
+                [f"{e['trip_id']}|{e['date']}", e["segment_id"], e["date"], e["from_time"].isoformat(),
+                 e["to_time"].isoformat(), e["from_stop_id"], e["to_stop_id"], e["seconds"], "TRAVELS_ON"]
+                for e in events
+            ])
+            return
+        self.write("relationships", HAS_TRIP_CYPHER, has_trip, partition="route_id")
+        self.write("relationships", HAS_SEGMENT_CYPHER, has_segment, partition="segment_id")
+        self.write("events", TRAVELS_ON_CYPHER, events, partition="segment_id")
+
+    def load_dwell_chunk(self, chunk: List[Dict[str, str]], date_from: str, date_to: str) -> None:
+        t0 = time.perf_counter()
+        stops: Dict[str, Tuple[str, str, Optional[Tuple[float, float]]]] = {}
+        routes: Dict[str, Tuple[str, str]] = {}
+        trips: Dict[TripKey, _TripAgg] = {}
+        has_trip: List[Dict[str, str]] = []
+        events: List[Dict[str, Any]] = []
+
+        for row in chunk:
+            parsed = parse_event(row, date_from, date_to)
+            if parsed is None:
+                continue
+            day, start, end, seconds = parsed
+            if day in self.skip_dates:
+                continue
+            lau, line, route_id, trip_id, stop_id = row["lau"], row["line"], str(row["route"]), row["trip"], row["stop"]
+            self._remember_stop(stops, stop_id, lau, row["geometry"])
+            self._remember(self.routes, routes, route_id, (line, lau))
+            self._remember(self.trips, trips, (trip_id, day), _TripAgg(line, route_id, lau))
+            if (route_id, trip_id, day) not in self.has_trip:
+                self.has_trip.add((route_id, trip_id, day))
+                has_trip.append({"route_id": route_id, "trip_id": trip_id, "date": day})
+
+            event_key = hash(("D", trip_id, day, start, end, stop_id))
+            if event_key in self.events:
+                continue
+            self.events.add(event_key)
+            self.dates.add(day)
+            agg = self.serves.setdefault((route_id, stop_id), [0, 0.0])
+            agg[0] += 1
+            agg[1] += seconds
+            events.append({
+                "trip_id": trip_id, "date": day, "stop_id": stop_id, "from_time": start, "to_time": end,
+                "seconds": seconds,
+            })
+        self.stats.add("parse", len(chunk), time.perf_counter() - t0)
+
+        self._new_entities(stops, routes, trips, {})
+        if self.admin_dir:
+            self._admin_rows("events", "dwell_at", [
+                [f"{e['trip_id']}|{e['date']}", e["stop_id"], e["date"], e["from_time"].isoformat(),
+                 e["to_time"].isoformat(), e["stop_id"], e["seconds"], "DWELL_AT"]
+                for e in events
+            ])
+            return
+        self.write("relationships", HAS_TRIP_CYPHER, has_trip, partition="route_id")
+        self.write("events", DWELL_AT_CYPHER, events, partition="stop_id")
+
+    # ---------- after all chunks ----------
+    def _route_totals(self) -> Dict[str, List[float]]:
+        totals: Dict[str, List[float]] = {}
+        for route_id, trip_id, day in self.has_trip:
+            trip = self.trips[(trip_id, day)]
+            if trip.timed:
+                agg = totals.setdefault(route_id, [0, 0.0])
+                agg[0] += 1
+                agg[1] += trip.total
+        return totals
+
+    def write_aggregates(self) -> None:
+        """Trip totals (1b), SERVES (3), HAS_SEGMENT (4) and route means (5) from the in-memory aggregates."""
+        route_totals = self._route_totals()
+        if self.admin_dir:
+            self._write_admin_aggregates(route_totals)
+            return
+        self.write("aggregates", TRIP_TOTALS_CYPHER, [
+            {"trip_id": tid, "date": day, "total": t.total, "from_time": t.from_time, "to_time": t.to_time}
+            for (tid, day), t in self.trips.items() if t.timed
+        ])
+        self.write("aggregates", SERVES_CYPHER, [
+            {"route_id": r, "stop_id": s, "cnt": int(cnt), "total": total} for (r, s), (cnt, total) in self.serves.items()
+        ], partition="stop_id")
+        self.write("aggregates", HAS_SEGMENT_STATS_CYPHER, [
+            {"segment_id": seg, "cnt": int(cnt), "total": total} for seg, (cnt, total) in self.segment_travel.items()
+        ])
+        self.write("aggregates", ROUTE_STATS_CYPHER, [
+            {"route_id": r, "cnt": int(cnt), "total": total} for r, (cnt, total) in route_totals.items()
+        ])
+
+    def _write_admin_aggregates(self, route_totals: Dict[str, List[float]]) -> None:
+        def mean(cnt: float, total: float) -> float:
+            return total / cnt if cnt > 0 else 0.0
+
+        routes = []
+        for route_id, (line, lau) in self.routes.items():
+            cnt, total = route_totals.get(route_id, (None, None))
+            routes.append([route_id, line, lau, cnt, total, mean(cnt, total) if cnt is not None else None, "Route"])
+        self._admin_rows("nodes", "routes", routes)
+        self._admin_rows("nodes", "trips", [
+            [f"{tid}|{day}", tid, day, t.line, t.route_id, t.lau,
+             t.total if t.timed else None,
+             t.from_time.isoformat() if t.from_time else None,
+             t.to_time.isoformat() if t.to_time else None, "Trip"]
+            for (tid, day), t in self.trips.items()
+        ])
+        self._admin_rows("relationships", "has_trip", [[r, f"{tid}|{day}", "HAS_TRIP"] for r, tid, day in self.has_trip])
+        self._admin_rows("aggregates", "has_segment", [
+            [r, seg, *self._segment_stats(seg), "HAS_SEGMENT"] for r, seg in self.route_segments
+        ])
+        self._admin_rows("aggregates", "serves", [
+            [r, s, int(cnt), total, mean(cnt, total), "SERVES"] for (r, s), (cnt, total) in self.serves.items()
+        ])
+
+    def _segment_stats(self, segment_id: str) -> List[Any]:
+        cnt, total = self.segment_travel.get(segment_id, (0, 0.0))
+        f, t, _ = self.segments[segment_id]
+        length = self._segment_length(f, t)
+        speed = length * cnt / total if length is not None and total > 0 else None
+        return [int(cnt), total, total / cnt if cnt > 0 else 0.0, speed]
+
+    def write_daily_stats(self, dates: List[str], days_per_batch: int = 10) -> None:
+        """Step 6 for the given dates only; batches of days run in parallel."""
+        batches = [dates[i:i + days_per_batch] for i in range(0, len(dates), days_per_batch)]
+
+        def _one(batch: List[str]) -> int:
+            with self._session() as session:
+                for cypher in (DAILY_STATS_CYPHER, ROUTE_DAILY_STATS_CYPHER, STOP_DAILY_STATS_CYPHER):
+                    session.execute_write(lambda tx, c=cypher: tx.run(c, dates=batch).consume())
+            return len(batch)
+
+        self.stats.timed("daily_stats", lambda: sum(f.result() for f in [self.pool.submit(_one, b) for b in batches]))
+
+    def rebuild_aggregates(self) -> None:
+        """Steps 1b, 3, 4 and 5 over the whole graph (after --full or an interrupted run)."""
+        def _all() -> int:
+            for statement in FULL_AGGREGATES:
+                self.run(statement)
+            return len(FULL_AGGREGATES)
+
+        self.stats.timed("aggregates", _all)
+
+    # ---------- load manifest ----------
+    def read_manifest(self, city: str) -> Tuple[List[str], List[str]]:
+        """(ingested dates, pending dates); a graph loaded without manifest counts its trip dates as ingested."""
+        rows = self.run(MANIFEST_CYPHER, city=city)
+        if rows:
+            return list(rows[0]["dates"]), list(rows[0]["pending"])
+        dates = [r["day"] for r in self.run(ALL_DATES_CYPHER)]
+        self.run(MANIFEST_INIT_CYPHER, city=city, dates=dates, ranges=date_ranges(dates))
+        return dates, []
+
+    def mark_pending(self, city: str, dates: List[str]) -> None:
+        self.run(MANIFEST_PENDING_CYPHER, city=city, dates=dates)
+
+    def commit_manifest(self, city: str, dates: List[str]) -> None:
+        dates = sorted(set(dates))
+        self.run(MANIFEST_COMMIT_CYPHER, city=city, dates=dates, ranges=date_ranges(dates))
+
+    def bump_version(self) -> None:
+        self.run(BUMP_VERSION_CYPHER)
+
+    def export_snapshot(self, path: Optional[str]) -> None:
+        """Columnar analytics snapshot for the MCP server tools (needs numpy)."""
+        sys.path.insert(0, SERVER_DIR)
+        import analytics_snapshot
+
+        t0 = time.perf_counter()
+        version = self.run(DATA_VERSION_CYPHER)
+        with self._session() as session:
+            meta = analytics_snapshot.export_snapshot(
+                session, path or analytics_snapshot.DEFAULT_DIR, data_version=version[0]["version"] if version else None
+            )
+        self.stats.add("snapshot", sum(t["rows"] for t in meta["tables"].values()), time.perf_counter() - t0)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+        for f, _ in self._admin_files.values():
+            f.close()
+        self._admin_files.clear()
+
+
+# ============================================================
+# CLI
+# ============================================================
+def _admin_command(admin_dir: str) -> str:
+    def files(*names: str) -> str:
+        return ",".join(os.path.join(admin_dir, f"{n}.csv") for n in names)
+
+    return (
+        "neo4j-admin database import full neo4j --overwrite-destination "
+        f"--nodes={files('stops')} --nodes={files('routes')} --nodes={files('trips')} --nodes={files('segments')} "
+        + " ".join(f"--relationships={files(n)}" for n in
+                   ("has_trip", "from_stop", "to_stop", "has_segment", "serves", "travels_on", "dwell_at"))
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--city", default="GM0047")
+    ap.add_argument("--import-dir", default=os.path.join(HERE, "import"))
+    ap.add_argument("--date-from", default="2022-01-01", help="first service date (inclusive)")
+    ap.add_argument("--date-to", default="2024-01-01", help="last service date (exclusive)")
+    ap.add_argument("--chunk-size", type=int, default=100_000, help="CSV rows per chunk")
+    ap.add_argument("--batch-size", type=int, default=10_000, help="rows per UNWIND transaction")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--admin-csv", metavar="DIR", help="write neo4j-admin import CSVs instead of loading")
+    ap.add_argument("--skip-stats", action="store_true", help="do not rebuild the daily statistics")
+    ap.add_argument("--stats-only", action="store_true", help="only rebuild the daily statistics for all dates")
+    ap.add_argument("--full", action="store_true",
+                    help="ignore the load manifest and recompute all aggregates from the graph")
+    ap.add_argument("--snapshot", nargs="?", const="", metavar="DIR",
+                    help="export the analytics snapshot for the MCP server at the end "
+                         "(default DIR: APP/Server/analytics_snapshot)")
+    args = ap.parse_args()
+    if args.admin_csv and (args.stats_only or args.full or args.snapshot is not None):
+        ap.error("--stats-only / --full / --snapshot need a running database, not --admin-csv")
+
+    travel_csv = os.path.join(args.import_dir, "travel_times", f"travel_time_{args.city}.csv")
+    dwell_csv = os.path.join(args.import_dir, "dwell_times", f"dwell_time_{args.city}.csv")
+
+    driver = None
+    if not args.admin_csv:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    else:
+        os.makedirs(args.admin_csv, exist_ok=True)
+
+    loader = BulkLoader(driver, workers=args.workers, batch_size=args.batch_size, admin_dir=args.admin_csv)
+    t0 = time.perf_counter()
+    try:
+        ingested: List[str] = []
+        if driver is not None:
+            loader.ensure_schema()
+            ingested, pending = loader.read_manifest(args.city)
+            if pending and not (args.full or args.stats_only):
+                sys.exit(f"an earlier load stopped while updating aggregates for {date_ranges(pending)}; "
+                         "re-run with --full")
+            if not args.full:
+                loader.skip_dates = set(ingested)
+        if args.stats_only:
+            dates = [r["day"] for r in loader.run(ALL_DATES_CYPHER)]
+            ingested = []
+        else:
+            for path, load_chunk in ((travel_csv, loader.load_travel_chunk), (dwell_csv, loader.load_dwell_chunk)):
+                if not os.path.exists(path):
+                    sys.exit(f"missing CSV: {path}")
+                chunks = read_chunks(path, args.chunk_size)
+                while True:
+                    t_read = time.perf_counter()
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    loader.stats.add("read", len(chunk), time.perf_counter() - t_read)
+                    load_chunk(chunk, args.date_from, args.date_to)
+                    print(f"{os.path.basename(path)}: {loader.stats.rows['read']:,} rows read", file=sys.stderr)
+            dates = sorted(loader.dates)
+            if driver is not None and not dates:
+                print(f"nothing new: {args.date_from}..{args.date_to} is already loaded "
+                      f"({', '.join(date_ranges(ingested)) or '-'})")
+            elif driver is None:
+                loader.write_aggregates()
+            else:
+                loader.mark_pending(args.city, dates)
+                if args.full:
+                    loader.rebuild_aggregates()
+                else:
+                    loader.write_aggregates()
+        if driver is not None and dates:
+            if not args.skip_stats:
+                loader.write_daily_stats(dates)
+            loader.commit_manifest(args.city, ingested + dates)
+            loader.bump_version()
+        if driver is not None and args.snapshot is not None:
+            loader.export_snapshot(args.snapshot)
+    finally:
+        loader.close()
+        if driver is not None:
+            driver.close()
+
+    print(loader.stats.report())
+    print(f"total {time.perf_counter() - t0:.1f}s")
+    if args.admin_csv:
+        print("\nimport with (database stopped):\n  " + _admin_command(args.admin_csv))
+        print("then start Neo4j and run:\n  python Neo4j/bulk_loader.py --stats-only")
+
+
+if __name__ == "__main__":
+    main()